@@ -1,4 +1,9 @@
 from .l1c.native_file import NativeFile as L1cNativeFile
 from .l2.native_file import NativeFile as L2NativeFile
 from .pc.native_file import NativeFile as PCNativeFile
-from .pc.pcc import PCC
\ No newline at end of file
+from .pc.pcc import PCC
+from .pc.pair import PCPair
+from .pc.writer import NativeWriter as PCWriter
+from .generic.index_cache import IndexCache
+from .dataset import Dataset
+from .catalog import Catalog
@@ -0,0 +1,480 @@
+"""
+iasi_nat_reader: An enhanced library to read IASI L1C, L2, and PCC files
+Copyright (C) 2024 Ronglian Zhou
+
+This library is free software; you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License as published by the Free Software Foundation; either
+version 3.0 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+
+
+A catalog of many native files (e.g. years of granules), built from their
+MPHR and the GRH of their records only, which finds the files and the MDRs
+of a region and a time window without reading any MDR
+"""
+
+import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
+import numpy as np
+
+from .generic.grh import GRH
+from .generic.index_cache import IndexCache
+from .generic.mphr import MPHR
+from .generic.record import scan_records
+from .generic.spatial_index import EARTH_RADIUS, wrap_longitude
+from .l1c.native_file import NativeFile as L1cNativeFile
+from .l2.native_file import NativeFile as L2NativeFile
+from .pc.native_file import NativeFile as PCNativeFile
+
+EPOCH = np.datetime64('2000-01-01T00:00:00', 'ms')
+MS_PER_DAY = 86400000
+# distance (km) from the sub-satellite track covering the swath of IASI
+# (about 1100 km on each side) and the size of the FOVs
+SWATH_MARGIN = 1200.0
+# beyond this, the track is not a great circle arc and the files get global boxes
+MAX_TRACK_DURATION = np.timedelta64(10, 'm')
+WORLD = (-180.0, -90.0, 180.0, 90.0)
+
+# the location field of the MDRs, and the positions of lon and lat in it
+LOCATION = {
+    L1cNativeFile: ('GGeoSondLoc', 0, 1),
+    PCNativeFile: ('GGeoSondLoc', 0, 1),
+    L2NativeFile: ('EARTH_LOCATION', 1, 0),
+}
+
+file_dtype = np.dtype(
+    [
+        ('size', np.int64),
+        ('mtime', np.int64),
+        ('start', 'M8[ms]'),
+        ('stop', 'M8[ms]'),
+        ('n_mdrs', np.int32),
+    ]
+)
+mdr_dtype = np.dtype(
+    [
+        ('file', np.int32),
+        ('mdr', np.int32),
+        ('start', 'M8[ms]'),
+        ('stop', 'M8[ms]'),
+        ('lon_min', np.float32),
+        ('lat_min', np.float32),
+        ('lon_max', np.float32),
+        ('lat_max', np.float32),
+    ]
+)
+
+
+def native_file_class(filename: str, mphr: MPHR) -> type:
+    """
+    The NativeFile class of a file: PC if its name holds PCS or PCR (as
+    `pc.NativeFile` expects), otherwise L2 or L1C by the processing level
+    of its MPHR
+    """
+    name = os.path.basename(filename)
+    if 'PCS' in name or 'PCR' in name:
+        return PCNativeFile
+    if mphr.processing_level.strip() == '02':
+        return L2NativeFile
+    return L1cNativeFile
+
+
+def sensing_time(value: str) -> np.datetime64:
+    """
+    A time of the MPHR (YYYYMMDDhhmmssZ) as a datetime64
+    """
+    value = value.strip()
+    return np.datetime64(
+        f'{value[0:4]}-{value[4:6]}-{value[6:8]}T{value[8:10]}:{value[10:12]}:{value[12:14]}',
+        'ms',
+    )
+
+
+def grh_times(day: np.ndarray, msec: np.ndarray) -> np.ndarray:
+    """
+    The start or stop times of records from the day and msec of their GRH
+    """
+    return EPOCH + (day.astype(np.int64) * MS_PER_DAY + msec.astype(np.int64)).astype(
+        'timedelta64[ms]'
+    )
+
+
+def track_points(
+    mphr: MPHR, start: np.datetime64, stop: np.datetime64, times: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The sub-satellite points at some times, interpolated along the great
+    circle between the sub-satellite points of the MPHR at the start and at
+    the end of the sensing
+    """
+    lat0, lon0, lat1, lon1 = np.radians(
+        [
+            mphr.subsat_latitude_start.magnitude,
+            mphr.subsat_longitude_start.magnitude,
+            mphr.subsat_latitude_end.magnitude,
+            mphr.subsat_longitude_end.magnitude,
+        ]
+    )
+    p0 = np.array([np.cos(lat0) * np.cos(lon0), np.cos(lat0) * np.sin(lon0), np.sin(lat0)])
+    p1 = np.array([np.cos(lat1) * np.cos(lon1), np.cos(lat1) * np.sin(lon1), np.sin(lat1)])
+    omega = np.arccos(np.clip(p0 @ p1, -1, 1))
+    fraction = ((times - start) / (stop - start))[:, None]
+    if omega < 1e-9:
+        points = np.broadcast_to(p0, (len(times), 3))
+    else:
+        points = (
+            np.sin((1 - fraction) * omega) * p0 + np.sin(fraction * omega) * p1
+        ) / np.sin(omega)
+    lat = np.degrees(np.arcsin(np.clip(points[:, 2], -1, 1)))
+    lon = np.degrees(np.arctan2(points[:, 1], points[:, 0]))
+    return lon, lat
+
+
+def track_boxes(
+    mphr: MPHR, start: np.datetime64, stop: np.datetime64, mdr_start: np.ndarray,
+    mdr_stop: np.ndarray,
+) -> np.ndarray:
+    """
+    Conservative boxes (lon_min, lat_min, lon_max, lat_max) of MDRs: the
+    track of the satellite during every MDR (see `track_points`) widened by
+    SWATH_MARGIN. The boxes are global when the MPHR has no sub-satellite
+    points or when the file is longer than MAX_TRACK_DURATION.
+    """
+    boxes = np.empty((len(mdr_start), 4))
+    boxes[:] = WORLD
+    subsat = (
+        mphr.subsat_latitude_start,
+        mphr.subsat_longitude_start,
+        mphr.subsat_latitude_end,
+        mphr.subsat_longitude_end,
+    )
+    if any(value is None for value in subsat) or not (
+        np.timedelta64(0, 'ms') < stop - start <= MAX_TRACK_DURATION
+    ):
+        return boxes
+
+    lon_a, lat_a = track_points(mphr, start, stop, mdr_start)
+    lon_b, lat_b = track_points(mphr, start, stop, mdr_stop)
+    margin = np.degrees(SWATH_MARGIN / EARTH_RADIUS)
+    lat_min = np.minimum(lat_a, lat_b) - margin
+    lat_max = np.maximum(lat_a, lat_b) + margin
+    polar = (lat_min <= -90) | (lat_max >= 90)
+
+    # the longitudes within margin of the track, at the latitude the farthest
+    # from the equator
+    cos_lat = np.cos(np.radians(np.maximum(np.abs(lat_min), np.abs(lat_max))))
+    sin_margin = np.sin(np.radians(margin))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dlon = np.degrees(np.arcsin(np.clip(sin_margin / cos_lat, -1, 1)))
+    move = wrap_longitude(lon_b - lon_a)
+    lon_min = wrap_longitude(lon_a + np.minimum(move, 0) - dlon)
+    lon_max = wrap_longitude(lon_a + np.maximum(move, 0) + dlon)
+    full = polar | (np.abs(move) + 2 * dlon >= 360)
+
+    boxes[:, 0] = np.where(full, -180, lon_min)
+    boxes[:, 1] = np.maximum(lat_min, -90)
+    boxes[:, 2] = np.where(full, 180, lon_max)
+    boxes[:, 3] = np.minimum(lat_max, 90)
+    return boxes
+
+
+def location_boxes(lon: np.ndarray, lat: np.ndarray) -> np.ndarray:
+    """
+    The boxes (lon_min, lat_min, lon_max, lat_max) of the FOVs of MDRs, of
+    shape (n_mdrs, n_fov). The box of a MDR crossing the antimeridian has
+    lon_min > lon_max, and the box of a MDR without location is NaN.
+    """
+    boxes = np.full((len(lon), 4), np.nan)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # MDRs without location
+        lon = wrap_longitude(lon)
+        boxes[:, 0], boxes[:, 2] = np.nanmin(lon, axis=1), np.nanmax(lon, axis=1)
+        boxes[:, 1], boxes[:, 3] = np.nanmin(lat, axis=1), np.nanmax(lat, axis=1)
+        # the same longitudes in [0, 360), narrower if the MDR crosses the antimeridian
+        shifted = lon % 360
+        shifted_min, shifted_max = np.nanmin(shifted, axis=1), np.nanmax(shifted, axis=1)
+    crossing = shifted_max - shifted_min < boxes[:, 2] - boxes[:, 0]
+    boxes[crossing, 0] = wrap_longitude(shifted_min[crossing])
+    boxes[crossing, 2] = wrap_longitude(shifted_max[crossing])
+    return boxes
+
+
+def read_locations(filename: str, native_file: type, n_mdrs: int) -> tuple:
+    """
+    The longitudes and the latitudes of the FOVs of the valid MDRs of a file,
+    decoding only the location field of its MDRs
+    """
+    name, lon_pos, lat_pos = LOCATION[native_file]
+    with native_file(filename, mdr_record_idx=[], mmap=True) as native:
+        location = [bundle[name] for bundle in native.iter_mdrs(100, [name])]
+    location = np.concatenate(location) if location else np.empty((0, 1, 2))
+    location = location.reshape(n_mdrs, -1, location.shape[-1])
+    return location[..., lon_pos], location[..., lat_pos]
+
+
+def index_file(
+    filename: str,
+    native_file: type = None,
+    exact: bool = False,
+    index_cache: IndexCache = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The entry of a file (see `file_dtype`) and the entries of its valid MDRs
+    (see `mdr_dtype`, with a file number of 0), read from the MPHR and the
+    GRH of its records
+
+    Args:
+        - *filename*: the path of the native file
+        - *native_file*: the NativeFile class of the file (see
+          `native_file_class` if None)
+        - *exact*: if True, the boxes of the MDRs are the ones of their FOVs
+          (only the location field of the MDRs is decoded), otherwise they are
+          the conservative boxes of the track of the satellite (see
+          `track_boxes`). PCR files, which have no location, always get the
+          boxes of the track.
+        - *index_cache*: an IndexCache where the record index is looked up
+    """
+    size = os.path.getsize(filename)
+    with open(filename, 'rb') as f:
+        if index_cache is None:
+            index = scan_records(f, size)
+        else:
+            index = index_cache.get_index(f, filename, size)
+        if len(index) == 0 or index['record_class'][0] != 1:
+            raise ValueError(f'{filename} does not start with a MPHR')
+        f.seek(int(index['offset'][0]))
+        mphr = MPHR.read(f, GRH.read(f))
+
+    if native_file is None:
+        native_file = native_file_class(filename, mphr)
+    mdr_index = index[native_file.valid_mdrs(index)]
+
+    entry = np.zeros((), dtype=file_dtype)
+    entry['size'] = size
+    entry['mtime'] = os.stat(filename).st_mtime_ns
+    entry['start'] = sensing_time(mphr.sensing_start)
+    entry['stop'] = sensing_time(mphr.sensing_end)
+    entry['n_mdrs'] = len(mdr_index)
+
+    mdrs = np.zeros(len(mdr_index), dtype=mdr_dtype)
+    mdrs['mdr'] = np.arange(len(mdr_index))
+    mdrs['start'] = grh_times(
+        mdr_index['record_start_time_day'], mdr_index['record_start_time_msec']
+    )
+    mdrs['stop'] = grh_times(mdr_index['record_stop_time_day'], mdr_index['record_stop_time_msec'])
+
+    if exact and native_file in LOCATION and not (
+        native_file is PCNativeFile and 'PCR' in os.path.basename(filename)
+    ):
+        boxes = location_boxes(*read_locations(filename, native_file, len(mdr_index)))
+    else:
+        boxes = track_boxes(mphr, entry['start'], entry['stop'], mdrs['start'], mdrs['stop'])
+    for i, name in enumerate(('lon_min', 'lat_min', 'lon_max', 'lat_max')):
+        mdrs[name] = boxes[:, i]
+    return entry, mdrs
+
+
+def lon_overlap(
+    lon_min: np.ndarray, lon_max: np.ndarray, q_min: float, q_max: float
+) -> np.ndarray:
+    """
+    Whether ranges of longitudes overlap the range [q_min, q_max], all of
+    them crossing the antimeridian when their min is greater than their max
+    """
+    width = np.where(lon_max >= lon_min, lon_max - lon_min, lon_max - lon_min + 360)
+    q_width = q_max - q_min if q_max >= q_min else q_max - q_min + 360
+    return ((q_min - lon_min) % 360 <= width) | ((lon_min - q_min) % 360 <= q_width)
+
+
+class Catalog:
+    """
+    The times and the footprints of the MDRs of many native files, possibly
+    of several products, kept in two compact tables: `files` (see
+    `file_dtype`) with the paths in `filenames`, and `mdrs` (see
+    `mdr_dtype`), with the start and stop times of every valid MDR (from its
+    GRH) and the box of its FOVs. Building it reads only the MPHR and the
+    GRH of the records of every file (see `index_file`), several files at a
+    time, and the catalog is saved as a single .npz file.
+
+    Example:
+        >>> catalog = Catalog.build('/data/2024*/IASI_xxx_1C_*.nat', workers=16)
+        >>> catalog.save('catalog.npz')
+        >>> catalog = Catalog.load('catalog.npz')
+        >>> found = catalog.query(bbox=(-10, 35, 5, 45), start='2024-01-01', stop='2024-01-08')
+        >>> for filename, mdrs in found.items():
+        ...     with L1cNativeFile(filename, mdr_record_idx=[]) as native:
+        ...         for bundle in native.iter_mdrs(10, ['GS1cSpect'], mdrs=mdrs):
+        ...             process(bundle['GS1cSpect'])
+    """
+
+    def __init__(
+        self,
+        filenames: list[str] = (),
+        files: np.ndarray = None,
+        mdrs: np.ndarray = None,
+    ) -> None:
+        self.filenames = list(filenames)
+        self.files = np.zeros(0, dtype=file_dtype) if files is None else files
+        self.mdrs = np.zeros(0, dtype=mdr_dtype) if mdrs is None else mdrs
+
+    def __len__(self) -> int:
+        return len(self.filenames)
+
+    @classmethod
+    def build(cls, files: str | list[str], **kwargs) -> 'Catalog':
+        """
+        The catalog of some files (see `update` for the arguments)
+        """
+        return cls().update(files, **kwargs)
+
+    @classmethod
+    def load(cls, path: os.PathLike) -> 'Catalog':
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['filenames'].tolist(), data['files'], data['mdrs'])
+
+    def save(self, path: os.PathLike) -> None:
+        path = os.fspath(path)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(
+                f, filenames=np.array(self.filenames, dtype=str), files=self.files, mdrs=self.mdrs
+            )
+        os.replace(tmp, path)
+
+    def update(
+        self,
+        files: str | list[str],
+        native_file: type = None,
+        exact: bool = False,
+        workers: int = 8,
+        index_cache: 'str | os.PathLike | IndexCache' = None,
+    ) -> 'Catalog':
+        """
+        Add files to the catalog, or index them again if they have changed
+        since they were added (other size or modification time). The files
+        are indexed by workers threads, as indexing them is mostly waiting
+        for the disk.
+
+        Args:
+            - *files*: a list of paths, or a glob pattern
+            - *native_file*, *exact*, *index_cache*: see `index_file`
+            - *workers*: the number of files indexed at the same time
+
+        Returns:
+            The catalog itself
+        """
+        if isinstance(files, str):
+            files = sorted(glob(files))
+        if index_cache is not None and not isinstance(index_cache, IndexCache):
+            index_cache = IndexCache(index_cache)
+
+        positions = {filename: i for i, filename in enumerate(self.filenames)}
+        todo = []
+        for filename in map(os.fspath, files):
+            i = positions.get(filename)
+            if i is not None:
+                stat = os.stat(filename)
+                entry = self.files[i]
+                if entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+                    continue
+            todo.append(filename)
+        if not todo:
+            return self
+
+        def index(filename):
+            return index_file(filename, native_file, exact, index_cache)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(index, todo))
+
+        numbers = []
+        new_files = []
+        for filename, (entry, _) in zip(todo, results):
+            if filename in positions:
+                self.files[positions[filename]] = entry
+            else:
+                positions[filename] = len(self.filenames)
+                self.filenames.append(filename)
+                new_files.append(entry)
+            numbers.append(positions[filename])
+        self.files = np.concatenate([self.files, np.array(new_files, dtype=file_dtype)])
+
+        mdrs = [self.mdrs[~np.isin(self.mdrs['file'], numbers)]]
+        for number, (_, file_mdrs) in zip(numbers, results):
+            file_mdrs['file'] = number
+            mdrs.append(file_mdrs)
+        self.mdrs = np.concatenate(mdrs)
+        return self
+
+    def remove_missing(self) -> 'Catalog':
+        """
+        Remove the files which do not exist anymore
+
+        Returns:
+            The catalog itself
+        """
+        kept = np.array([os.path.exists(filename) for filename in self.filenames], dtype=bool)
+        numbers = np.full(len(self.filenames), -1, dtype=np.int32)
+        numbers[kept] = np.arange(np.count_nonzero(kept))
+        self.filenames = [filename for filename, k in zip(self.filenames, kept) if k]
+        self.files = self.files[kept]
+        self.mdrs = self.mdrs[kept[self.mdrs['file']]]
+        self.mdrs['file'] = numbers[self.mdrs['file']]
+        return self
+
+    def select(
+        self, bbox: tuple = None, start: np.datetime64 | str = None,
+        stop: np.datetime64 | str = None,
+    ) -> np.ndarray:
+        """
+        The entries of `mdrs` of the MDRs which may have FOVs in a box
+        (lon_min, lat_min, lon_max, lat_max) in degrees, which crosses the
+        antimeridian if lon_min > lon_max, and which overlap the time window
+        [start, stop]. Any of them may be None.
+        """
+        mdrs = self.mdrs
+        selected = np.ones(len(mdrs), dtype=bool)
+        if start is not None:
+            selected &= mdrs['stop'] >= np.datetime64(start, 'ms')
+        if stop is not None:
+            selected &= mdrs['start'] <= np.datetime64(stop, 'ms')
+        if bbox is not None:
+            lon_min, lat_min, lon_max, lat_max = bbox
+            selected &= (mdrs['lat_max'] >= lat_min) & (mdrs['lat_min'] <= lat_max)
+            # only a span of 360 degrees or more holds all the longitudes
+            if lon_max - lon_min < 360:
+                lon_min, lon_max = wrap_longitude(np.array([lon_min, lon_max], dtype=np.float64))
+                selected &= lon_overlap(
+                    mdrs['lon_min'].astype(np.float64), mdrs['lon_max'].astype(np.float64),
+                    lon_min, lon_max,
+                )
+        return mdrs[selected]
+
+    def query(
+        self, bbox: tuple = None, start: np.datetime64 | str = None,
+        stop: np.datetime64 | str = None,
+    ) -> dict[str, np.ndarray]:
+        """
+        The files with MDRs in a region and a time window (see `select`), and
+        the positions of these MDRs among the valid MDRs of every file (see
+        `NativeFile.mdr_index`), to be read with `NativeFile.iter_mdrs`
+        """
+        mdrs = self.select(bbox, start, stop)
+        mdrs = mdrs[np.lexsort((mdrs['mdr'], mdrs['file']))]
+        numbers, first = np.unique(mdrs['file'], return_index=True)
+        return {
+            self.filenames[number]: positions
+            for number, positions in zip(numbers, np.split(mdrs['mdr'], first[1:]))
+        }
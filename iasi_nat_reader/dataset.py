@@ -0,0 +1,262 @@
+"""
+iasi_nat_reader: An enhanced library to read IASI L1C, L2, and PCC files
+Copyright (C) 2024 Ronglian Zhou
+
+This library is free software; you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License as published by the Free Software Foundation; either
+version 3.0 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+
+Read many native files (e.g. all the granules of an orbit or of a day) as a
+single dataset, whose variables are read only when they are sliced
+"""
+
+from glob import glob
+from operator import index as as_index
+from typing import Callable
+import numpy as np
+
+from .generic.parameters import SNOT, PN
+from .l1c.native_file import NativeFile as L1cNativeFile
+from .l2.native_file import NativeFile as L2NativeFile
+from .pc.native_file import NativeFile as PCNativeFile
+
+N_FOV = SNOT * PN  # number of FOVs in a MDR
+
+
+def _sounder_location(index: int) -> Callable:
+    def load(mdrs):
+        return type(mdrs[0]).stack(mdrs, 'GGeoSondLoc')[..., index].reshape(-1)
+
+    return load
+
+
+def _sounder_time(mdrs) -> np.ndarray:
+    date = type(mdrs[0]).stack(mdrs, 'GEPSDatIasi')
+    days = np.repeat(date[..., 0].reshape(-1), PN).astype(np.int64)
+    msec = np.repeat(date[..., 1].reshape(-1), PN).astype(np.int64)
+    start_time = np.datetime64('2000-01-01T00:00:00')
+    return start_time + days.astype('timedelta64[D]') + msec.astype('timedelta64[ms]')
+
+
+def _l1c_radiances(mdrs) -> np.ndarray:
+    spectra = type(mdrs[0]).stack(mdrs, 'GS1cSpect')
+    return spectra.reshape(len(mdrs) * N_FOV, -1)
+
+
+def _l2_location(index: int) -> Callable:
+    def load(mdrs):
+        return type(mdrs[0]).stack(mdrs, 'EARTH_LOCATION')[..., index].reshape(-1)
+
+    return load
+
+
+def _rows(key, n_rows: int) -> tuple[np.ndarray, bool]:
+    """
+    The rows selected by the first index of a DatasetArray (an integer, a
+    slice, an array of indices or a boolean mask) among n_rows, and whether
+    the index is an integer, without allocating an array of all the rows
+    """
+    if key is Ellipsis:
+        key = slice(None)
+    if isinstance(key, slice):
+        return np.arange(*key.indices(n_rows), dtype=np.int64), False
+    if np.ndim(key) == 0 and not isinstance(key, (bool, np.bool_)):
+        row = as_index(key)
+        if not -n_rows <= row < n_rows:
+            raise IndexError(f'index {row} is out of bounds for {n_rows} rows')
+        return np.array([row % n_rows], dtype=np.int64), True
+
+    key = np.asarray(key)
+    if key.dtype == bool:
+        if key.shape != (n_rows,):
+            raise IndexError(f'boolean index of shape {key.shape} for {n_rows} rows')
+        return np.flatnonzero(key), False
+    if key.ndim != 1 or (key.size and key.dtype.kind not in 'iu'):
+        raise IndexError('the rows are selected by a 1-D array of integers')
+    rows = key.astype(np.int64)
+    if rows.size and (rows.min() < -n_rows or rows.max() >= n_rows):
+        raise IndexError(f'index out of bounds for {n_rows} rows')
+    return rows % max(n_rows, 1), False
+
+
+# The variables of every product: functions returning the rows (one per FOV)
+# of a list of MDRs of the same file
+VARIABLES = {
+    L1cNativeFile: {
+        'radiances': _l1c_radiances,
+        'lat': _sounder_location(1),
+        'lon': _sounder_location(0),
+        'time': _sounder_time,
+    },
+    PCNativeFile: {
+        'lat': _sounder_location(1),
+        'lon': _sounder_location(0),
+        'time': _sounder_time,
+    },
+    L2NativeFile: {
+        'lat': _l2_location(0),
+        'lon': _l2_location(1),
+    },
+}
+
+
+class Dataset:
+    """
+    Many native files of the same product seen as one dataset. Every file
+    keeps its own GIADR, and the variables (e.g. `radiances`, `lat`, `lon`,
+    `time`) are arrays spanning all the files with one row per FOV, which
+    are read only for the MDRs holding the rows that are sliced.
+
+    Args:
+        - *files*: a list of paths, or a glob pattern (the matching files are
+          sorted by name), of at least one file with valid MDRs
+        - *native_file*: the NativeFile class of the product (the files of
+          PCNativeFile must be PCS files: PCR files have no location)
+        - *kwargs*: passed to every NativeFile. The files are memory mapped
+          unless mmap=False is given.
+
+    Example:
+        >>> dataset = Dataset('/data/20240101/IASI_xxx_1C_*.nat')
+        >>> rad = dataset.radiances[100000:101000]  # (1000, 8461)
+        >>> lat = np.asarray(dataset.lat)
+    """
+
+    def __init__(
+        self,
+        files: str | list[str],
+        native_file: type = L1cNativeFile,
+        **kwargs,
+    ) -> None:
+        if isinstance(files, str):
+            files = sorted(glob(files))
+        if native_file not in VARIABLES:
+            raise ValueError(f'{native_file} is not a supported NativeFile class')
+        self.filenames = list(files)
+        if not self.filenames:
+            raise ValueError('no native file in the dataset')
+
+        kwargs.setdefault('mmap', True)
+        self.native_file = native_file
+        self.files = []
+        try:
+            for filename in self.filenames:
+                self.files.append(native_file(filename, **kwargs))
+                if native_file is PCNativeFile and self.files[-1].mdr_flag != 'PCS':
+                    raise ValueError(f'{filename} is a PCR file, only PCS files have locations')
+            if not any(native.mdrs for native in self.files):
+                raise ValueError('no valid MDR in the files of the dataset')
+        except Exception:
+            self.close()
+            raise
+
+        n_mdrs = [len(native.mdrs) for native in self.files]
+        # index of the first MDR of every file in the dataset
+        self.mdr_offsets = np.concatenate([[0], np.cumsum(n_mdrs)]).astype(np.int64)
+
+    def __enter__(self) -> 'Dataset':
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def close(self):
+        for native in self.files:
+            native.close()
+        self.files = []
+
+    @property
+    def n_mdrs(self) -> int:
+        return int(self.mdr_offsets[-1])
+
+    @property
+    def n_fovs(self) -> int:
+        return self.n_mdrs * N_FOV
+
+    @property
+    def variables(self) -> list[str]:
+        return list(VARIABLES[self.native_file])
+
+    def __getitem__(self, name: str) -> 'DatasetArray':
+        if name not in VARIABLES[self.native_file]:
+            raise KeyError(name)
+        return DatasetArray(self, VARIABLES[self.native_file][name])
+
+    def __getattr__(self, name: str) -> 'DatasetArray':
+        # not self.native_file, which is missing before __init__ (e.g. when
+        # unpickling) and would call __getattr__ again
+        native_file = self.__dict__.get('native_file')
+        if name.startswith('_') or name not in VARIABLES.get(native_file, ()):
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+        return self[name]
+
+
+class DatasetArray:
+    """
+    A variable of a Dataset: an array with one row per FOV of all the files.
+    Indexing it (the first index selects the rows, and may be an integer, a
+    slice, an array of indices or a boolean mask) reads only the MDRs that
+    hold the selected rows, even across the boundaries of the files.
+    """
+
+    def __init__(self, dataset: Dataset, load: Callable) -> None:
+        self.dataset = dataset
+        self.load = load
+
+    def __len__(self) -> int:
+        return self.dataset.n_fovs
+
+    @property
+    def shape(self) -> tuple:
+        return (len(self),) + self[0:1].shape[1:]
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[:]
+        return values if dtype is None else values.astype(dtype)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        rows, scalar = _rows(key[0], len(self))
+
+        mdr_offsets = self.dataset.mdr_offsets
+        mdr = rows // N_FOV
+        file = np.searchsorted(mdr_offsets, mdr, side='right') - 1
+
+        output = None
+        for f in np.unique(file):
+            selected = file == f
+            local_mdr = mdr[selected] - mdr_offsets[f]
+            needed = np.unique(local_mdr)
+            mdrs = self.dataset.files[f].mdrs
+            values = self.load([mdrs[i] for i in needed])
+
+            pos = np.searchsorted(needed, local_mdr) * N_FOV + rows[selected] % N_FOV
+            chunk = values[pos]
+            if output is None:
+                output = np.empty((len(rows),) + chunk.shape[1:], dtype=chunk.dtype)
+            elif np.result_type(output, chunk) != output.dtype:
+                output = output.astype(np.result_type(output, chunk))
+            output[selected] = chunk
+
+        if output is None:
+            # no rows selected: the shape and dtype come from the first MDR
+            native = next(native for native in self.dataset.files if native.mdrs)
+            sample = self.load(native.mdrs[:1])
+            output = np.empty((0,) + sample.shape[1:], dtype=sample.dtype)
+
+        if scalar:
+            return output[0][key[1:]]
+        return output[(slice(None),) + key[1:]]
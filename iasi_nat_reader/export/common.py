@@ -0,0 +1,125 @@
+"""
+iasi_nat_reader: An enhanced library to read IASI L1C, L2, and PCC files
+Copyright (C) 2024 Ronglian Zhou
+
+This library is free software; you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License as published by the Free Software Foundation; either
+version 3.0 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+
+Helpers shared by the exporters of the native files
+"""
+
+import zlib
+import numpy as np
+
+from ..generic.mphr import MPHR
+from ..l1c.native_file import NativeFile as L1cNativeFile
+from ..l2.native_file import NativeFile as L2NativeFile
+from ..pc.native_file import NativeFile as PCNativeFile
+
+PRODUCTS = {L1cNativeFile: 'L1C', L2NativeFile: 'L2'}
+PC_GIADR_NAMES = [f'NBS{band}P{part}' for band in (1, 2, 3) for part in (1, 2, 3)] + [
+    'FirstChannel',
+    'NbrChannels',
+    'ScoreQuantisationFactor',
+    'ResidualQuantisationFactor',
+]
+
+
+def product_name(native) -> str:
+    """
+    The product of a NativeFile: L1C, L2, PCS or PCR
+    """
+    if isinstance(native, PCNativeFile):
+        return native.mdr_flag
+    for native_file, name in PRODUCTS.items():
+        if isinstance(native, native_file):
+            return name
+    raise ValueError(f'{type(native)} is not a supported NativeFile class')
+
+
+def mphr_items(mphr: MPHR) -> dict[str, str]:
+    """
+    The keywords of a MPHR and their values, as written in the file
+    """
+    return dict(mphr.items)
+
+
+def product_attributes(native) -> dict[str, object]:
+    """
+    The attributes describing the product of an export: its name, the
+    keywords of its MPHR and, for the PC products, the GIADR needed to
+    reconstruct the radiances (FirstChannel is 0-based, as read)
+    """
+    attributes = {'product': product_name(native), **mphr_items(native.get_mphr())}
+    if isinstance(native, PCNativeFile):
+        giadr = native.get_giadr()
+        for name in PC_GIADR_NAMES:
+            attributes[name] = np.asarray(getattr(giadr, name))
+    return attributes
+
+
+def stack_values(values: np.ndarray | list) -> np.ndarray | None:
+    """
+    The values of a field of a batch of MDRs (see `NativeFile.iter_mdrs`) as
+    one array of shape (n, ...). The fields which are returned as lists (the
+    custom fields and the fields whose shape changes from a MDR to another,
+    e.g. the error data of L2) are stacked, padded with zeros to the largest
+    shape of the batch. None if the values are not numbers (e.g. the bit
+    fields decoded as tuples and dicts).
+    """
+    if isinstance(values, np.ndarray):
+        return values
+    try:
+        arrays = [np.asarray(value) for value in values]
+    except ValueError:
+        return None
+    if any(array.dtype.kind not in 'biuf' for array in arrays):
+        return None
+    shape = tuple(np.max([array.shape for array in arrays], axis=0)) if arrays[0].ndim else ()
+    stacked = np.zeros((len(arrays),) + shape, dtype=np.result_type(*arrays))
+    for i, array in enumerate(arrays):
+        stacked[(i,) + tuple(slice(0, size) for size in array.shape)] = array
+    return stacked
+
+
+def cast_values(values: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    """
+    Cast the values of a batch to the dtype of the exported field. The
+    integer fields are decoded as floats when some of their values are fill
+    values (NaN, see `generic_read`): in an integer field, the NaN become
+    the fill value again (the lowest signed or the highest unsigned integer).
+    """
+    dtype = np.dtype(dtype)
+    if dtype.kind in 'iu' and values.dtype.kind == 'f':
+        info = np.iinfo(dtype)
+        values = np.where(np.isnan(values), info.min if dtype.kind == 'i' else info.max, values)
+    return values.astype(dtype, copy=False)
+
+
+def encode_chunk(block: np.ndarray, chunks: tuple, shuffle: bool, level: int | None) -> bytes:
+    """
+    A chunk as stored by the HDF5 filters (shuffle, then deflate) or by a
+    zlib Zarr compressor (without shuffle). Blocks at the edges of the array
+    are padded with zeros to the full chunk.
+    """
+    if block.shape != chunks:
+        padded = np.zeros(chunks, dtype=block.dtype)
+        padded[tuple(slice(0, size) for size in block.shape)] = block
+        block = padded
+    data = np.ascontiguousarray(block)
+    if shuffle and data.itemsize > 1:
+        data = data.view(np.uint8).reshape(-1, data.itemsize).T
+    data = data.tobytes()
+    return data if level is None else zlib.compress(data, level)
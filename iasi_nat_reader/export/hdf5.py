@@ -0,0 +1,208 @@
+"""
+iasi_nat_reader: An enhanced library to read IASI L1C, L2, and PCC files
+Copyright (C) 2024 Ronglian Zhou
+
+This library is free software; you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License as published by the Free Software Foundation; either
+version 3.0 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+Export the MDRs of a native file to HDF5, with chunks of one (or a few)
+scan lines which split the spectra in groups of channels, so that a scan
+line or a few channels can be read without reading the whole file
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from itertools import product
+import numpy as np
+from h5py import File, Dataset
+
+from .common import cast_values, encode_chunk, product_attributes, stack_values
+
+
+def chunk_shape(
+    shape: tuple, itemsize: int, channel_chunk: int = 256, chunk_bytes: int = 1 << 20
+) -> tuple:
+    """
+    The chunks of a field of shape (n_mdrs, ...): the last axis of the
+    fields with more than one axis per MDR (e.g. the channels of the
+    spectra) is split in groups of channel_chunk, and the chunks hold as
+    many MDRs as fit in chunk_bytes, at least one.
+    """
+    row = [max(size, 1) for size in shape[1:]]
+    if len(row) > 1 and row[-1] > channel_chunk:
+        row[-1] = channel_chunk
+    n_rows = chunk_bytes // (itemsize * int(np.prod(row)))
+    return (int(np.clip(n_rows, 1, max(shape[0], 1))),) + tuple(row)
+
+
+def pad_values(values: np.ndarray, shape: tuple) -> np.ndarray:
+    """
+    The rows of values padded with zeros to the row shape of a dataset
+    """
+    if values.shape[1:] == shape:
+        return values
+    return stack_values(list(values) + [np.zeros(shape, values.dtype)])[:-1]
+
+
+def write_chunks(
+    dataset: Dataset,
+    values: np.ndarray,
+    start: int,
+    pool: ThreadPoolExecutor,
+    shuffle: bool,
+    level: int | None,
+) -> None:
+    """
+    Write the rows start:start + len(values) of a dataset, which start on a
+    chunk boundary and end on a chunk boundary or at the end of the dataset,
+    compressing the chunks in the threads of the pool (zlib releases the
+    GIL) and writing them as they are, bypassing the filters
+    """
+    chunks = dataset.chunks
+    grid = [range(0, size, chunk) for size, chunk in zip(values.shape, chunks)]
+    encoded = []
+    for corner in product(*grid):
+        block = values[tuple(slice(c, c + k) for c, k in zip(corner, chunks))]
+        future = pool.submit(encode_chunk, block, chunks, shuffle, level)
+        encoded.append(((start + corner[0],) + corner[1:], future))
+    for offsets, future in encoded:
+        dataset.id.write_direct_chunk(offsets, future.result())
+
+
+def write_rows(
+    dataset: Dataset,
+    pending: list,
+    pool: ThreadPoolExecutor,
+    shuffle: bool,
+    level: int | None,
+    last: bool = False,
+) -> None:
+    """
+    Write the whole rows of chunks of the rows buffered in pending, a list
+    [first row, arrays of rows], and keep the other rows buffered. All the
+    rows are written if last is True.
+    """
+    start, parts = pending
+    if not parts:
+        return
+    values = np.concatenate([pad_values(part, dataset.shape[1:]) for part in parts])
+    n = len(values)
+    if not last and start + n < dataset.shape[0]:
+        n -= n % dataset.chunks[0]
+    if n:
+        write_chunks(dataset, values[:n], start, pool, shuffle, level)
+    pending[:] = [start + n, [values[n:]] if n < len(values) else []]
+
+
+def to_hdf5(
+    native,
+    filename: os.PathLike,
+    fields: list[str] = None,
+    batch: int = 10,
+    dtype: np.dtype | None = None,
+    compression: str | None = 'gzip',
+    compression_opts: int | None = 4,
+    shuffle: bool = True,
+    channel_chunk: int = 256,
+    workers: int = 1,
+) -> None:
+    """
+    Write the decoded fields of all the valid MDRs of a NativeFile (L1C, L2
+    or PC) to a HDF5 file, with one dataset of shape (n_mdrs, ...) per
+    field and the keywords of the MPHR (and the GIADR of PC products) as
+    attributes of the file. The MDRs are read and written batch by batch
+    (see `NativeFile.iter_mdrs`), so the memory in use does not depend on
+    the size of the file, which may be opened with mdr_record_idx=[].
+
+    The fields whose shape changes from a MDR to another (e.g. the error
+    data of L2) are padded with zeros to their largest shape, and the fields
+    which are not decoded to numbers (e.g. the bit fields) are left out. The
+    dtype of a field is the one of its first batch, so an integer field may
+    hold the fill values of the native file (see `cast_values`).
+
+    Args:
+        - *native*: the NativeFile to export
+        - *filename*: the path of the HDF5 file
+        - *fields*: the names of the fields to export (all of them if None)
+        - *batch*: the number of MDRs read at a time
+        - *dtype*: the dtype of the floating point fields (e.g. np.float32
+          to halve the size of the radiances), unchanged if None
+        - *compression*, *compression_opts*, *shuffle*: the filters of the
+          datasets (see `h5py.Group.create_dataset`)
+        - *channel_chunk*: the number of channels (the last axis) of the
+          chunks of the multi-dimensional fields (see `chunk_shape`)
+        - *workers*: the number of threads compressing the chunks, which are
+          then written directly. The MDRs of a field are buffered until they
+          fill whole chunks along the MDR axis (see `chunk_shape`). Only with
+          compression='gzip' or None.
+
+    Example:
+        >>> with L1cNativeFile('path_to_iasi_l1c_file', mdr_record_idx=[]) as native:
+        ...     to_hdf5(native, 'l1c.h5', dtype=np.float32, workers=4)
+        >>> with File('l1c.h5') as f:
+        ...     rad = f['GS1cSpect'][:, :, :, 1000:1256]  # only 1/33 of the file is read
+    """
+    if workers > 1 and compression not in ('gzip', None):
+        raise ValueError(f'only gzip chunks can be compressed in threads, not {compression}')
+    n_mdrs = len(native.mdr_index)
+    shuffle = shuffle and compression is not None
+    level = compression_opts if compression == 'gzip' else None
+    if compression == 'gzip' and level is None:
+        level = 4
+
+    with File(filename, 'w') as f, (
+        ThreadPoolExecutor(workers) if workers > 1 else nullcontext()
+    ) as pool:
+        f.attrs.update(product_attributes(native))
+        # name -> [first row, rows] not written yet by the threads
+        pending = {}
+        start = 0
+        for bundle in native.iter_mdrs(batch, fields):
+            for name, values in bundle.items():
+                values = stack_values(values)
+                if values is None:
+                    continue
+                if dtype is not None and values.dtype.kind == 'f':
+                    values = values.astype(dtype)
+
+                if name not in f:
+                    shape = (n_mdrs,) + values.shape[1:]
+                    f.create_dataset(
+                        name,
+                        shape=shape,
+                        maxshape=(n_mdrs,) + (None,) * (len(shape) - 1),
+                        dtype=values.dtype,
+                        chunks=chunk_shape(shape, values.dtype.itemsize, channel_chunk),
+                        compression=compression,
+                        compression_opts=compression_opts if compression else None,
+                        shuffle=shuffle,
+                    )
+                dataset = f[name]
+                values = cast_values(values, dataset.dtype)
+
+                shape = tuple(np.maximum(dataset.shape[1:], values.shape[1:]))
+                if shape != dataset.shape[1:]:
+                    dataset.resize((n_mdrs,) + shape)
+                values = pad_values(values, shape)
+
+                if pool is not None:
+                    rows = pending.setdefault(name, [start, []])
+                    rows[1].append(values)
+                    write_rows(dataset, rows, pool, shuffle, level)
+                else:
+                    dataset[start : start + len(values)] = values
+            start += len(next(iter(bundle.values())))
+        for name, rows in pending.items():
+            write_rows(f[name], rows, pool, shuffle, level, last=True)
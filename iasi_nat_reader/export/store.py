@@ -0,0 +1,320 @@
+"""
+iasi_nat_reader: An enhanced library to read IASI L1C, L2, and PCC files
+Copyright (C) 2024 Ronglian Zhou
+
+This library is free software; you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License as published by the Free Software Foundation; either
+version 3.0 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+Export the MDRs of native files to directories of chunks, laid out as Zarr
+(v2) stores: every field is a directory holding its metadata (.zarray)
+and one zlib compressed file per chunk of a few MDRs, so that many
+processes can write and read them at the same time without any lock
+"""
+
+import os
+import json
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import numpy as np
+
+from ..l1c.native_file import NativeFile as L1cNativeFile
+from .common import cast_values, encode_chunk, product_attributes, stack_values
+
+# the NativeFile opened by every worker, by (class, filename)
+_worker_files = {}
+
+
+def store_chunks(shape: tuple, mdrs_per_chunk: int, channel_chunk: int) -> tuple:
+    """
+    The chunks of a field of shape (n_mdrs, ...): mdrs_per_chunk MDRs, with
+    the last axis of the fields with more than one axis per MDR (e.g. the
+    channels of the spectra) split in groups of channel_chunk
+    """
+    row = [max(size, 1) for size in shape[1:]]
+    if len(row) > 1 and row[-1] > channel_chunk:
+        row[-1] = channel_chunk
+    return (mdrs_per_chunk,) + tuple(row)
+
+
+def write_json(path: str, content: dict) -> None:
+    with open(path, 'w') as f:
+        json.dump(content, f, indent=4)
+
+
+def json_value(value):
+    """
+    A value that can be written as JSON (the arrays become lists)
+    """
+    return value.tolist() if isinstance(value, (np.ndarray, np.generic)) else value
+
+
+def field_arrays(mdrs: list, fields: list[str] | None, dtype: np.dtype | None) -> dict[str, tuple]:
+    """
+    The shape of every field of the MDRs of a file, not decoded (see
+    `NativeFile.lazy_mdrs`), without the MDR axis: the largest one if it
+    changes from a MDR to another, and the dtype of its decoded values. Only
+    the first MDR of every layout of a field is decoded. The fields which are
+    not decoded to numbers (e.g. the bit fields) are left out.
+    """
+    mdr_class = type(mdrs[0])
+    if fields is None:
+        fields = [name for name in mdr_class.fields if name in mdrs[0].layout.fields]
+
+    arrays = {}
+    for name in fields:
+        # decode the first MDR of every layout of the field
+        samples = {}
+        for mdr in mdrs:
+            samples.setdefault(mdr.layout.fields.get(name), mdr)
+        values = [stack_values(mdr_class.stack([mdr], name)) for mdr in samples.values()]
+        if any(value is None for value in values):
+            continue
+        shape = tuple(int(size) for size in np.max([value.shape[1:] for value in values], axis=0))
+        value_dtype = np.result_type(*values)
+        if dtype is not None and value_dtype.kind == 'f':
+            value_dtype = np.dtype(dtype)
+        arrays[name] = (shape, value_dtype)
+    return arrays
+
+
+def _open_worker_file(native_file: type, filename: str, kwargs: dict):
+    key = (native_file, filename)
+    if key not in _worker_files:
+        _worker_files[key] = native_file(filename, mdr_record_idx=[], **kwargs)
+    return _worker_files[key]
+
+
+def _write_chunk_group(
+    native_file: type,
+    filename: str,
+    kwargs: dict,
+    path: str,
+    arrays: dict[str, dict],
+    group: int,
+    level: int | None,
+) -> None:
+    """
+    Read the MDRs of a group of chunks and write the chunks of all fields
+    """
+    native = _open_worker_file(native_file, filename, kwargs)
+    n_rows = next(iter(arrays.values()))['chunks'][0]
+    start = group * n_rows
+    bundle = next(native.iter_mdrs(n_rows, list(arrays), slice(start, start + n_rows)))
+
+    for name, meta in arrays.items():
+        shape, chunks = tuple(meta['shape']), tuple(meta['chunks'])
+        values = cast_values(stack_values(bundle[name]), meta['dtype'])
+        if values.shape[1:] != shape[1:]:
+            values = stack_values(list(values) + [np.zeros(shape[1:], values.dtype)])[:-1]
+
+        grid = [range(0, size, chunk) for size, chunk in zip(shape[1:], chunks[1:])]
+        for corner in product(*grid):
+            block = values[
+                (slice(None),) + tuple(slice(c, c + k) for c, k in zip(corner, chunks[1:]))
+            ]
+            position = (group,) + tuple(c // k for c, k in zip(corner, chunks[1:]))
+            chunk_path = os.path.join(path, name, '.'.join(str(i) for i in position))
+            with open(f'{chunk_path}.{os.getpid()}.tmp', 'wb') as f:
+                f.write(encode_chunk(block, chunks, False, level))
+            os.replace(f'{chunk_path}.{os.getpid()}.tmp', chunk_path)
+
+
+def to_store(
+    filename: os.PathLike,
+    path: os.PathLike,
+    native_file: type = L1cNativeFile,
+    fields: list[str] = None,
+    mdrs_per_chunk: int = 10,
+    channel_chunk: int = 256,
+    dtype: np.dtype | None = None,
+    level: int | None = 4,
+    workers: int = None,
+    **kwargs,
+) -> None:
+    """
+    Write the decoded fields of all the valid MDRs of a native file (L1C, L2
+    or PC) to a directory of chunks, with one array of shape (n_mdrs, ...)
+    per field and the keywords of the MPHR (and the GIADR of PC products) as
+    attributes (.zattrs). The chunks of every group of mdrs_per_chunk MDRs
+    are written by a worker of a pool of processes, which reads only these
+    MDRs. The store can be read with `ChunkStore` (or with zarr).
+
+    The fields whose shape changes from a MDR to another (e.g. the error
+    data of L2) are padded with zeros to their largest shape, and the fields
+    which are not decoded to numbers (e.g. the bit fields) are left out. The
+    dtype of a field is the one of the first MDR, so an integer field may
+    hold the fill values of the native file (see `cast_values`).
+
+    Args:
+        - *filename*: the path of the native file
+        - *path*: the directory of the store
+        - *native_file*: the NativeFile class of the product
+        - *fields*: the names of the fields to export (all of them if None)
+        - *mdrs_per_chunk*: the number of MDRs of every chunk
+        - *channel_chunk*: the number of channels (the last axis) of the
+          chunks of the multi-dimensional fields (see `store_chunks`)
+        - *dtype*: the dtype of the floating point fields (e.g. np.float32
+          to halve the size of the radiances), unchanged if None
+        - *level*: the zlib compression level (not compressed if None)
+        - *workers*: the number of processes (the number of CPUs if None);
+          with workers=1 the chunks are written by this process
+        - *kwargs*: passed to every NativeFile (e.g. index_cache), but not
+          mdr_record_idx
+
+    Example:
+        >>> to_store('path_to_iasi_l1c_file', 'l1c_store', dtype=np.float32)
+        >>> rad = ChunkStore('l1c_store')['GS1cSpect'][:, :, :, 1000:1256]
+    """
+    filename, path = os.fspath(filename), os.fspath(path)
+    if 'mdr_record_idx' in kwargs:
+        raise TypeError('to_store exports all the valid MDRs, mdr_record_idx is not supported')
+    # the MDRs are only mapped, and decoded once per layout to find the shapes
+    with native_file(filename, mdr_record_idx=[], **{**kwargs, 'mmap': True}) as native:
+        n_mdrs = len(native.mdr_index)
+        if n_mdrs == 0:
+            raise ValueError(f'{filename} has no valid MDR')
+        arrays = {}
+        for name, (shape, value_dtype) in field_arrays(native.lazy_mdrs(), fields, dtype).items():
+            shape = (n_mdrs,) + shape
+            arrays[name] = {
+                'zarr_format': 2,
+                'shape': list(shape),
+                'chunks': list(store_chunks(shape, mdrs_per_chunk, channel_chunk)),
+                'dtype': value_dtype.str,
+                'compressor': None if level is None else {'id': 'zlib', 'level': level},
+                'fill_value': 0,
+                'order': 'C',
+                'filters': None,
+                'dimension_separator': '.',
+            }
+        attributes = {key: json_value(value) for key, value in product_attributes(native).items()}
+
+    os.makedirs(path, exist_ok=True)
+    write_json(os.path.join(path, '.zgroup'), {'zarr_format': 2})
+    write_json(os.path.join(path, '.zattrs'), attributes)
+    for name, meta in arrays.items():
+        os.makedirs(os.path.join(path, name), exist_ok=True)
+        write_json(os.path.join(path, name, '.zarray'), meta)
+
+    groups = range(-(-n_mdrs // mdrs_per_chunk))
+    args = (native_file, filename, kwargs, path, arrays)
+    if workers == 1:
+        for group in groups:
+            _write_chunk_group(*args, group, level)
+        _worker_files.clear()
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(_write_chunk_group, *args, group, level) for group in groups]
+        for future in futures:
+            future.result()
+
+
+class ChunkStore:
+    """
+    A store written by `to_store`: its arrays (one per field) are read only
+    for the chunks that the selection touches.
+
+    Example:
+        >>> store = ChunkStore('l1c_store')
+        >>> store.attrs['SPACECRAFT_ID']
+        >>> lon_lat = store['GGeoSondLoc'][100:120]  # reads 2 or 3 chunks
+    """
+
+    def __init__(self, path: os.PathLike) -> None:
+        self.path = os.fspath(path)
+        with open(os.path.join(self.path, '.zattrs')) as f:
+            self.attrs = json.load(f)
+
+    def keys(self) -> list[str]:
+        return sorted(
+            name
+            for name in os.listdir(self.path)
+            if os.path.exists(os.path.join(self.path, name, '.zarray'))
+        )
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.keys()
+
+    def __getitem__(self, name: str) -> 'StoreArray':
+        if not os.path.exists(os.path.join(self.path, name, '.zarray')):
+            raise KeyError(name)
+        return StoreArray(os.path.join(self.path, name))
+
+
+class StoreArray:
+    """
+    An array of a ChunkStore. Indexing it (with integers, slices or arrays of
+    indices on every axis) reads and decompresses only the chunks holding
+    the selected values. As with h5py (or the oindex of zarr), the arrays of
+    indices select along every axis independently.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(os.path.join(path, '.zarray')) as f:
+            meta = json.load(f)
+        self.shape = tuple(meta['shape'])
+        self.chunks = tuple(meta['chunks'])
+        self.dtype = np.dtype(meta['dtype'])
+        self.compressed = meta['compressor'] is not None
+        self.fill_value = meta['fill_value']
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[...]
+        return values if dtype is None else values.astype(dtype)
+
+    def read_chunk(self, position: tuple) -> np.ndarray:
+        """
+        The values of a chunk, given by its position in the grid of chunks
+        """
+        chunk_path = os.path.join(self.path, '.'.join(str(i) for i in position))
+        if not os.path.exists(chunk_path):
+            return np.full(self.chunks, self.fill_value, dtype=self.dtype)
+        with open(chunk_path, 'rb') as f:
+            data = f.read()
+        if self.compressed:
+            data = zlib.decompress(data)
+        return np.frombuffer(data, dtype=self.dtype).reshape(self.chunks)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if Ellipsis in key:
+            i = key.index(Ellipsis)
+            key = key[:i] + (slice(None),) * (self.ndim - len(key) + 1) + key[i + 1 :]
+        key = key + (slice(None),) * (self.ndim - len(key))
+
+        # the selected indices of every axis, and the chunks they touch
+        indices = [np.atleast_1d(np.arange(size)[k]) for size, k in zip(self.shape, key)]
+        output = np.empty([len(index) for index in indices], dtype=self.dtype)
+        touched = [np.unique(index // chunk) for index, chunk in zip(indices, self.chunks)]
+        for position in product(*touched):
+            inside, local = [], []
+            for index, chunk, c in zip(indices, self.chunks, position):
+                mask = index // chunk == c
+                inside.append(mask)
+                local.append(index[mask] - c * chunk)
+            output[np.ix_(*inside)] = self.read_chunk(position)[np.ix_(*local)]
+
+        # the axes indexed by an integer are dropped
+        scalar = [np.ndim(k) == 0 and not isinstance(k, slice) for k in key]
+        return output[tuple(0 if is_scalar else slice(None) for is_scalar in scalar)]
@@ -0,0 +1,262 @@
+"""
+iasi_nat_reader: An enhanced library to read IASI L1C, L2, and PCC files
+Copyright (C) 2024 Ronglian Zhou
+
+This library is free software; you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License as published by the Free Software Foundation; either
+version 3.0 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+Export the fields of the MDRs that have one value per FOV (location,
+angles, times, flags, cloud fractions, ...) as a table with one row per
+FOV, written to Parquet (with pyarrow) or to npz
+"""
+
+import os
+import numpy as np
+
+from ..generic.parameters import SNOT, PN
+from .common import product_name, stack_values
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+N_FOV = SNOT * PN  # number of FOVs in a MDR
+
+# the named columns of every product: (field, index on its last axis)
+SOUNDER_COLUMNS = {
+    'lon': ('GGeoSondLoc', 0),
+    'lat': ('GGeoSondLoc', 1),
+    'sat_zenith': ('GGeoSondAnglesMETOP', 0),
+    'sat_azimuth': ('GGeoSondAnglesMETOP', 1),
+    'sun_zenith': ('GGeoSondAnglesSUN', 0),
+    'sun_azimuth': ('GGeoSondAnglesSUN', 1),
+}
+NAMED_COLUMNS = {
+    'L1C': SOUNDER_COLUMNS,
+    'PCS': SOUNDER_COLUMNS,
+    'L2': {
+        'lat': ('EARTH_LOCATION', 0),
+        'lon': ('EARTH_LOCATION', 1),
+        'sat_zenith': ('ANGULAR_RELATION', 1),
+        'sat_azimuth': ('ANGULAR_RELATION', 3),
+        'sun_zenith': ('ANGULAR_RELATION', 0),
+        'sun_azimuth': ('ANGULAR_RELATION', 2),
+    },
+}
+
+EPOCH = np.datetime64('2000-01-01T00:00:00', 'ms')
+
+
+def fov_rows(values: np.ndarray) -> np.ndarray | None:
+    """
+    The values of a field of n MDRs as an array of shape (n * N_FOV, ...):
+    the fields with one value per FOV are flattened, and the fields with one
+    value per scan position (SNOT) or per MDR are repeated. None for the
+    other fields.
+    """
+    n, shape = len(values), values.shape[1:]
+    if shape[:2] == (SNOT, PN):
+        return values.reshape((n * N_FOV,) + shape[2:])
+    if shape[:1] == (N_FOV,):
+        return values.reshape((n * N_FOV,) + shape[1:])
+    if shape[:1] == (SNOT,):
+        return np.repeat(values.reshape((n * SNOT,) + shape[1:]), PN, axis=0)
+    if shape == ():
+        return np.repeat(values, N_FOV, axis=0)
+    return None
+
+
+def fov_values(shape: tuple) -> int:
+    """
+    The number of values per FOV of a field of a MDR of the given shape:
+    the values per FOV, per scan position (SNOT) or per MDR (see `fov_rows`)
+    """
+    shape = tuple(shape)
+    if shape[:2] == (SNOT, PN):
+        return int(np.prod(shape[2:]))
+    if shape[:1] in ((N_FOV,), (SNOT,)):
+        return int(np.prod(shape[1:]))
+    return int(np.prod(shape))
+
+
+def fov_fields(mdr, max_columns: int) -> list[str]:
+    """
+    The fields of a MDR (not decoded, see `NativeFile.lazy_mdrs`) with at
+    most max_columns values per FOV, i.e. the ones that may be columns of a
+    FOV table. Their shapes are the ones of the layout of the MDR, except for
+    the custom fields (bitfields, ...), which are decoded in this MDR when
+    their layout does not already rule them out.
+    """
+    fields = []
+    for name, (shape, _, _) in mdr.layout.fields.items():
+        if fov_values(shape) > max_columns and (
+            name not in mdr.custom_fields or tuple(shape[:2]) == (SNOT, PN)
+        ):
+            continue
+        if name in mdr.custom_fields:
+            values = stack_values([getattr(mdr, name)])
+            if values is None or fov_values(values.shape[1:]) > max_columns:
+                continue
+        fields.append(name)
+    return fields
+
+
+def batch_columns(
+    bundle: dict, named_columns: dict[str, tuple], max_columns: int
+) -> dict[str, np.ndarray]:
+    """
+    The columns of the rows of a batch of MDRs (see `fov_table`)
+    """
+    columns = {}
+    for column, (name, index) in named_columns.items():
+        columns[column] = fov_rows(stack_values(bundle[name]))[:, index]
+
+    # the time of the sounder is given by the time column
+    named_fields = {name for name, _ in named_columns.values()} | {'GEPSDatIasi'}
+    for name, values in bundle.items():
+        if name in named_fields:
+            continue
+        values = stack_values(values)
+        rows = None if values is None else fov_rows(values)
+        if rows is None or int(np.prod(rows.shape[1:])) > max_columns:
+            continue
+        if rows.ndim == 1:
+            columns[name] = rows
+            continue
+        for i, position in enumerate(np.ndindex(*rows.shape[1:])):
+            columns[name + ''.join(f'_{j}' for j in position)] = rows.reshape(len(rows), -1)[:, i]
+    return columns
+
+
+def fov_table(
+    native, fields: list[str] = None, batch: int = 100, max_columns: int = 12
+) -> dict[str, np.ndarray]:
+    """
+    The fields of the MDRs of a L1C, L2 or PCS NativeFile with one value per
+    FOV, as a table with one row per FOV (n_mdrs * SNOT * PN rows): a dict
+    of 1-D columns. The MDRs are read batch by batch (see
+    `NativeFile.iter_mdrs`), and every batch is written in the preallocated
+    columns.
+
+    The columns are:
+        - *mdr*, *snot*, *pn*: the position of the FOV (among the valid
+          MDRs), its scan position and its pixel number
+        - *time*: the time of the FOV (of its scan position for L1C and PCS,
+          of its MDR for L2), as datetime64[ms]
+        - *lat*, *lon*, *sat_zenith*, *sat_azimuth*, *sun_zenith*,
+          *sun_azimuth*
+        - one column per field with one value per FOV, per scan position or
+          per MDR (repeated for every FOV), named as the field. The fields
+          with a few values per FOV (at most max_columns, e.g. the 3 cloud
+          formations) have one column per value, named FIELD_i.
+
+    Args:
+        - *native*: the NativeFile, which may be opened with mdr_record_idx=[]
+        - *fields*: the names of the fields of the columns (if None, the
+          ones with at most max_columns values per FOV, found in the first
+          MDR so that the other fields are never decoded); the ones of the
+          location and the angles are always read
+        - *batch*: the number of MDRs read at a time
+        - *max_columns*: the largest number of columns of a field
+
+    Example:
+        >>> with L2NativeFile('path_to_iasi_l2_file', mdr_record_idx=[]) as l2:
+        ...     table = fov_table(l2)
+        >>> clear = table['lat'][table['FLG_CLDFRM'] == 0]
+    """
+    product = product_name(native)
+    if product not in NAMED_COLUMNS:
+        raise ValueError(f'no FOV table for the {product} products')
+    named_columns = NAMED_COLUMNS[product]
+    index = native.mdr_index
+    if fields is None:
+        # decoding the spectra, the images or the profiles would dominate
+        fields = fov_fields(native.lazy_mdrs([0])[0], max_columns) if len(index) else []
+    fields = list(dict.fromkeys([name for name, _ in named_columns.values()] + list(fields)))
+    if product != 'L2' and 'GEPSDatIasi' not in fields:
+        fields.append('GEPSDatIasi')
+    n_rows = len(index) * N_FOV
+    mdr = np.repeat(np.arange(len(index), dtype=np.int32), N_FOV)
+    fov = np.tile(np.arange(N_FOV, dtype=np.uint8), len(index))
+    if product == 'L2':
+        msec = index['record_start_time_day'].astype(np.int64) * 86400000
+        msec += index['record_start_time_msec']
+        time = EPOCH + np.repeat(msec, N_FOV).astype('timedelta64[ms]')
+    else:
+        time = np.empty(n_rows, dtype='datetime64[ms]')
+    table = {'mdr': mdr, 'snot': fov // PN, 'pn': fov % PN, 'time': time}
+
+    start = 0
+    for bundle in native.iter_mdrs(batch, fields):
+        columns = batch_columns(bundle, named_columns, max_columns)
+        stop = start + len(next(iter(columns.values())))
+        if product != 'L2':
+            date = fov_rows(stack_values(bundle['GEPSDatIasi'])).astype(np.int64)
+            msec = date[:, 0] * 86400000 + date[:, 1]
+            time[start:stop] = EPOCH + msec.astype('timedelta64[ms]')
+
+        for name, values in columns.items():
+            if name not in table:
+                table[name] = np.zeros(n_rows, dtype=values.dtype)
+            elif np.result_type(table[name], values) != table[name].dtype:
+                # e.g. integers decoded as floats when they have fill values
+                table[name] = table[name].astype(np.result_type(table[name], values))
+            table[name][start:stop] = values
+        start = stop
+    return table
+
+
+def write_fov_table(
+    table: dict[str, np.ndarray], filename: os.PathLike, format: str | None = None
+) -> str:
+    """
+    Write a FOV table (see `fov_table`) to a Parquet file, or to a npz file
+    of one array per column, and return its path, whose extension is the one
+    of the format
+
+    Args:
+        - *table*: the columns of the table
+        - *filename*: the path of the file, with or without extension
+        - *format*: 'parquet' or 'npz' (parquet if pyarrow is installed,
+          npz otherwise if None)
+    """
+    if format is None:
+        format = 'npz' if pa is None else 'parquet'
+    path = os.path.splitext(os.fspath(filename))[0] + '.' + format
+    if format == 'parquet':
+        if pa is None:
+            raise ImportError('pyarrow is needed to write Parquet files')
+        pq.write_table(pa.table(table), path)
+    elif format == 'npz':
+        np.savez(path, **table)
+    else:
+        raise ValueError(f'unknown format {format}, not parquet or npz')
+    return path
+
+
+def read_fov_table(filename: os.PathLike, columns: list[str] = None) -> dict[str, np.ndarray]:
+    """
+    Read the columns (all of them if None) of a FOV table written by
+    `write_fov_table`
+    """
+    filename = os.fspath(filename)
+    if filename.endswith('.parquet'):
+        if pa is None:
+            raise ImportError('pyarrow is needed to read Parquet files')
+        table = pq.read_table(filename, columns=columns)
+        return {name: table[name].to_numpy() for name in table.column_names}
+    with np.load(filename) as data:
+        return {name: data[name] for name in (data.files if columns is None else columns)}
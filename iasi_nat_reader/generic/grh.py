@@ -20,10 +20,12 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 Modifications made by ronglian zhou <961836102@qq.com> on <2024/10/17>:
 - Added a new grh_type to account for the incomplete data block.
 - Refactored GRH class.
+- Added `grh_dtype` to read many grh at once with numpy.
 """
 
 from typing import IO
 from struct import unpack
+import numpy as np
 
 """
 The issue the record_class property returning a memory address 
@@ -47,6 +49,21 @@ grh_type_dict = {
     9: 'MDR (bad)',
 }
 
+# The layout of a grh, the same as the one unpacked by GRH.read
+grh_dtype = np.dtype(
+    [
+        ('record_class', '>u1'),
+        ('instrument_group', '>u1'),
+        ('record_subclass', '>u1'),
+        ('record_subclass_version', '>u1'),
+        ('record_size', '>u4'),
+        ('record_start_time_day', '>u2'),
+        ('record_start_time_msec', '>u4'),
+        ('record_stop_time_day', '>u2'),
+        ('record_stop_time_msec', '>u4'),
+    ]
+)
+
 
 class GRH(object):
 
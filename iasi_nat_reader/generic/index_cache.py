@@ -0,0 +1,121 @@
+"""
+iasi_nat_reader: An enhanced library to read IASI L1C, L2, and PCC files
+Copyright (C) 2024 Ronglian Zhou
+
+This library is free software; you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License as published by the Free Software Foundation; either
+version 3.0 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+
+On-disk cache of the record indices, to skip the record walk when the
+same native file is opened many times
+"""
+
+import os
+from hashlib import sha1
+from mmap import mmap
+from typing import IO
+import numpy as np
+
+from .record import scan_records, index_dtype
+
+
+class IndexCache:
+    """
+    A directory holding the record index (see `scan_records`) of the native
+    files already opened. An entry is keyed by the absolute path, the size and
+    the modification time of the native file, so it is never reused for a
+    file that has changed. When there are more than max_files entries the
+    least recently used ones are removed.
+
+    Args:
+        - *cache_dir*: the directory of the cache, created if missing
+        - *max_files*: the maximum number of indices kept in the cache
+    """
+
+    suffix = '.npy'
+
+    def __init__(self, cache_dir: os.PathLike, max_files: int = 10000) -> None:
+        self.cache_dir = os.fspath(cache_dir)
+        self.max_files = max_files
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def path(self, filename: os.PathLike) -> str:
+        """
+        The path of the cache entry of a native file
+        """
+        stat = os.stat(filename)
+        key = f'{os.path.abspath(filename)}\0{stat.st_size}\0{stat.st_mtime_ns}'
+        return os.path.join(self.cache_dir, sha1(key.encode()).hexdigest() + self.suffix)
+
+    def load(self, filename: os.PathLike) -> np.ndarray | None:
+        """
+        Return the cached index of a native file, or None if it is not cached
+        """
+        path = self.path(filename)
+        try:
+            index = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        if index.dtype != index_dtype:
+            return None
+        try:
+            # mark the entry as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return index
+
+    def store(self, filename: os.PathLike, index: np.ndarray) -> None:
+        """
+        Save the index of a native file in the cache
+        """
+        path = self.path(filename)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.save(f, index, allow_pickle=False)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Remove the least recently used entries until at most max_files are left
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                entries.append((os.stat(path).st_mtime_ns, path))
+            except OSError:
+                pass
+        if len(entries) <= self.max_files:
+            return
+        entries.sort()
+        for _, path in entries[: len(entries) - self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def get_index(self, f: IO | mmap, filename: os.PathLike, size: int) -> np.ndarray:
+        """
+        Return the index of the records of a native file, from the cache if
+        possible, otherwise scanning f and saving the result in the cache.
+        """
+        index = self.load(filename)
+        if index is None:
+            index = scan_records(f, size)
+            self.store(filename, index)
+        return index
@@ -20,6 +20,7 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 Modifications made by ronglian zhou <961836102@qq.com> on <2024/10/17>:
 - Removed support for python 2.x.
 - Refactored MPHR class.
+- Split the keywords at once, and converted the attributes on first access.
 """
 
 from typing import IO
@@ -94,307 +95,171 @@ def parse(x: str):
     return x.split('=')[1].strip()
 
 
+def parse_items(content: str) -> dict[str, str]:
+    """
+    The keywords of the text of a MPHR and their values, as written
+    """
+    items = {}
+    for line in content.split('\n'):
+        key, sep, value = line.partition('=')
+        if sep:
+            items[key.strip()] = value.strip()
+    return items
+
+
+def text(value: str) -> str:
+    return value
+
+
+def number(kind: type = int, scale: float = 1, unit: str = None):
+    """
+    The conversion of a numeric value, None if it is not filled (xxx)
+    """
+
+    def convert(value: str):
+        if 'x' in value:
+            return None
+        value = kind(value) / scale if scale != 1 else kind(value)
+        return value if unit is None else value * units(unit)
+
+    return convert
+
+
+def lookup(table: dict, kind: type = str):
+    def convert(value: str):
+        return table.get(kind(value), None)
+
+    return convert
+
+
+def boolean(value: str) -> bool:
+    if value == 'T' or value == '1':
+        return True
+    elif value == 'F' or value == '0':
+        return False
+    raise ValueError('Invalid value for subsetted product: ' + str(value))
+
+
+# attribute: (keyword, conversion of its value)
+FIELDS = {
+    'product_name': ('PRODUCT_NAME', text),
+    'parent_product_name1': ('PARENT_PRODUCT_NAME_1', text),
+    'parent_product_name2': ('PARENT_PRODUCT_NAME_2', text),
+    'parent_product_name3': ('PARENT_PRODUCT_NAME_3', text),
+    'parent_product_name4': ('PARENT_PRODUCT_NAME_4', text),
+    'instrument_id': ('INSTRUMENT_ID', text),
+    'instrument_model': ('INSTRUMENT_MODEL', lookup(instrument_model_dict, int)),
+    'product_type': ('PRODUCT_TYPE', text),
+    'processing_level': ('PROCESSING_LEVEL', text),
+    'spacecraft_id': ('SPACECRAFT_ID', text),
+    'sensing_start': ('SENSING_START', text),
+    'sensing_end': ('SENSING_END', text),
+    'sensing_start_theoretical': ('SENSING_START_THEORETICAL', text),
+    'sensing_end_theoretical': ('SENSING_END_THEORETICAL', text),
+    'processing_centre': ('PROCESSING_CENTRE', lookup(processing_centre_dict)),
+    'processor_major_version': ('PROCESSOR_MAJOR_VERSION', number()),
+    'processor_minor_version': ('PROCESSOR_MINOR_VERSION', number()),
+    'format_major_version': ('FORMAT_MAJOR_VERSION', number()),
+    'format_minor_version': ('FORMAT_MINOR_VERSION', number()),
+    'processing_time_start': ('PROCESSING_TIME_START', text),
+    'processing_time_end': ('PROCESSING_TIME_END', text),
+    'processing_mode': ('PROCESSING_MODE', lookup(processing_mode_dict)),
+    'disposition_mode': ('DISPOSITION_MODE', lookup(disposition_mode_dict)),
+    'receiving_ground_station': (
+        'RECEIVING_GROUND_STATION',
+        lookup(receiving_ground_station_dict),
+    ),
+    'receive_time_start': ('RECEIVE_TIME_START', text),
+    'receive_time_end': ('RECEIVE_TIME_END', text),
+    'orbit_start': ('ORBIT_START', number()),
+    'orbit_end': ('ORBIT_END', number()),
+    'actual_product_size': ('ACTUAL_PRODUCT_SIZE', number(unit='bytes')),
+    'state_vector_time': ('STATE_VECTOR_TIME', text),
+    'semi_major_axis': ('SEMI_MAJOR_AXIS', number(float, 1e3, 'm')),
+    'eccentricity': ('ECCENTRICITY', number(float, 1e6)),
+    'inclination': ('INCLINATION', number(float, 1e3, 'deg')),
+    'perigee_argument': ('PERIGEE_ARGUMENT', number(float, 1e3, 'deg')),
+    'right_ascension': ('RIGHT_ASCENSION', number(float, 1e3, 'deg')),
+    'mean_anomaly': ('MEAN_ANOMALY', number(float, 1e3, 'deg')),
+    'x_position': ('X_POSITION', number(float, 1e3, 'm')),
+    'y_position': ('Y_POSITION', number(float, 1e3, 'm')),
+    'z_position': ('Z_POSITION', number(float, 1e3, 'm')),
+    'x_velocity': ('X_VELOCITY', number(float, 1e3, 'm/s')),
+    'y_velocity': ('Y_VELOCITY', number(float, 1e3, 'm/s')),
+    'z_velocity': ('Z_VELOCITY', number(float, 1e3, 'm/s')),
+    'earth_sun_distance_ratio': ('EARTH_SUN_DISTANCE_RATIO', number(float)),
+    'location_tolerance_radial': ('LOCATION_TOLERANCE_RADIAL', number(float, unit='m')),
+    'location_tolerance_crosstrack': ('LOCATION_TOLERANCE_CROSSTRACK', number(float, unit='m')),
+    'location_tolerance_alongtrack': ('LOCATION_TOLERANCE_ALONGTRACK', number(float, unit='m')),
+    'yaw_error': ('YAW_ERROR', number(float, 1e3, 'deg')),
+    'roll_error': ('ROLL_ERROR', number(float, 1e3, 'deg')),
+    'pitch_error': ('PITCH_ERROR', number(float, 1e3, 'deg')),
+    'subsat_latitude_start': ('SUBSAT_LATITUDE_START', number(float, 1e3, 'deg')),
+    'subsat_longitude_start': ('SUBSAT_LONGITUDE_START', number(float, 1e3, 'deg')),
+    'subsat_latitude_end': ('SUBSAT_LATITUDE_END', number(float, 1e3, 'deg')),
+    'subsat_longitude_end': ('SUBSAT_LONGITUDE_END', number(float, 1e3, 'deg')),
+    'leap_second': ('LEAP_SECOND', number()),
+    'leap_second_utc': ('LEAP_SECOND_UTC', text),
+    'total_records': ('TOTAL_RECORDS', number()),
+    'total_mphr': ('TOTAL_MPHR', number()),
+    'total_sphr': ('TOTAL_SPHR', number()),
+    'total_ipr': ('TOTAL_IPR', number()),
+    'total_geadr': ('TOTAL_GEADR', number()),
+    'total_giadr': ('TOTAL_GIADR', number()),
+    'total_veadr': ('TOTAL_VEADR', number()),
+    'total_viadr': ('TOTAL_VIADR', number()),
+    'total_mdr': ('TOTAL_MDR', number()),
+    'count_degraded_inst_mdr': ('COUNT_DEGRADED_INST_MDR', number()),
+    'count_degraded_proc_mdr': ('COUNT_DEGRADED_PROC_MDR', number()),
+    'count_degraded_inst_mdr_blocks': ('COUNT_DEGRADED_INST_MDR_BLOCKS', number()),
+    'count_degraded_proc_mdr_blocks': ('COUNT_DEGRADED_PROC_MDR_BLOCKS', number()),
+    'duration_of_product': ('DURATION_OF_PRODUCT', number(unit='ms')),
+    'milliseconds_of_data_present': ('MILLISECONDS_OF_DATA_PRESENT', number(unit='ms')),
+    'milliseconds_of_data_missing': ('MILLISECONDS_OF_DATA_MISSING', number(unit='ms')),
+    'subsetted_product': ('SUBSETTED_PRODUCT', boolean),
+}
+
+
 class MPHR(interpreted_content):
+    """
+    The main product header record. Its text is split in keywords and values
+    at once when it is read, and every attribute (see FIELDS) is converted
+    from the value of its keyword only when it is first accessed.
+    """
+
     def __init__(self) -> None:
         self.__raw = None
-        self.product_name = None
-        self.parent_product_name1 = None
-        self.parent_product_name2 = None
-        self.parent_product_name3 = None
-        self.parent_product_name4 = None
-        self.instrument_id = None
-        self.instrument_model = None
-        self.product_type = None
-        self.processing_level = None
-        self.spacecraft_id = None
-        self.sensing_start = None
-        self.sensing_end = None
-        self.sensing_start_theoretical = None
-        self.sensing_end_theoretical = None
-        self.processing_centre = None
-        self.processor_major_version = None
-        self.processor_minor_version = None
-        self.format_major_version = None
-        self.format_minor_version = None
-        self.processing_time_start = None
-        self.processing_time_end = None
-        self.processing_mode = None
-        self.disposition_mode = None
-        self.receiving_ground_station = None
-        self.receive_time_start = None
-        self.receive_time_end = None
-        self.orbit_start = None
-        self.orbit_end = None
-        self.actual_product_size = None
-        self.state_vector_time = None
-        self.semi_major_axis = None
-        self.eccentricity = None
-        self.inclination = None
-        self.perigee_argument = None
-        self.right_ascension = None
-        self.mean_anomaly = None
-        self.x_position = None
-        self.y_position = None
-        self.z_position = None
-        self.x_velocity = None
-        self.y_velocity = None
-        self.z_velocity = None
-        self.earth_sun_distance_ratio = None
-        self.location_tolerance_radial = None
-        self.location_tolerance_crosstrack = None
-        self.location_tolerance_alongtrack = None
-        self.yaw_error = None
-        self.roll_error = None
-        self.pitch_error = None
-        self.subsat_latitude_start = None
-        self.subsat_longitude_start = None
-        self.subsat_latitude_end = None
-        self.subsat_longitude_end = None
-        self.leap_second = None
-        self.leap_second_utc = None
-        self.total_records = None
-        self.total_mphr = None
-        self.total_sphr = None
-        self.total_ipr = None
-        self.total_geadr = None
-        self.total_giadr = None
-        self.total_veadr = None
-        self.total_viadr = None
-        self.total_mdr = None
-        self.count_degraded_inst_mdr = None
-        self.count_degraded_proc_mdr = None
-        self.count_degraded_inst_mdr_blocks = None
-        self.count_degraded_proc_mdr_blocks = None
-        self.duration_of_product = None
-        self.milliseconds_of_data_present = None
-        self.milliseconds_of_data_missing = None
-        self.subsetted_product = None
+        self.__items = {}
 
     @property
     def raw(self):
         return self.__raw
 
+    @property
+    def items(self) -> dict[str, str]:
+        """
+        The keywords of the MPHR and their values, as written in the file
+        """
+        return self.__items
+
+    def __getattr__(self, name: str):
+        if name.startswith('_') or name not in FIELDS:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        key, convert = FIELDS[name]
+        value = self.__items.get(key)
+        if value is not None:
+            value = convert(value)
+        setattr(self, name, value)
+        return value
+
     @staticmethod
     def read(f: IO, grh: GRH):
         mphr = MPHR()
         raw_data: bytes = f.read(grh.record_size - GRH.size)
         mphr.__raw = raw_data
-        raw_data = raw_data.decode('ASCII')
-        data = raw_data.split('\n')
-
-        mphr.product_name = parse(data[0])
-
-        mphr.parent_product_name1 = parse(data[1])
-
-        mphr.parent_product_name2 = parse(data[2])
-
-        mphr.parent_product_name3 = parse(data[3])
-
-        mphr.parent_product_name4 = parse(data[4])
-
-        mphr.instrument_id = parse(data[5])
-
-        instrument_model = int(parse(data[6]))
-        mphr.instrument_model = instrument_model_dict.get(instrument_model, None)
-
-        mphr.product_type = parse(data[7])
-
-        mphr.processing_level = parse(data[8])
-
-        mphr.spacecraft_id = parse(data[9])
-
-        mphr.sensing_start = parse(data[10])
-
-        mphr.sensing_end = parse(data[11])
-
-        mphr.sensing_start_theoretical = parse(data[12])
-
-        mphr.sensing_end_theoretical = parse(data[13])
-
-        processing_centre = parse(data[14])
-        mphr.processing_centre = processing_centre_dict.get(processing_centre, None)
-
-        processor_major_version_raw = parse(data[15])
-        if 'x' in processor_major_version_raw:
-            mphr.processor_major_version = None
-        else:
-            mphr.processor_major_version = int(processor_major_version_raw)
-
-        processor_minor_version_raw = parse(data[16])
-        if 'x' in processor_minor_version_raw:
-            mphr.processor_minor_version = None
-        else:
-            mphr.processor_minor_version = int(processor_minor_version_raw)
-
-        format_major_version_raw = parse(data[17])
-        if 'x' in format_major_version_raw:
-            mphr.format_major_version = None
-        else:
-            mphr.format_major_version = int(format_major_version_raw)
-
-        format_minor_version_raw = parse(data[18])
-        if 'x' in format_minor_version_raw:
-            mphr.format_minor_version = None
-        else:
-            mphr.format_minor_version = int(format_minor_version_raw)
-
-        mphr.processing_time_start = parse(data[19])
-
-        mphr.processing_time_end = parse(data[20])
-
-        mphr.processing_mode = processing_mode_dict.get(parse(data[21]), None)
-
-        mphr.disposition_mode = disposition_mode_dict.get(parse(data[22]), None)
-
-        mphr.receiving_ground_station = receiving_ground_station_dict.get(parse(data[23]), None)
-
-        mphr.receive_time_start = parse(data[24])
-
-        mphr.receive_time_end = parse(data[25])
-
-        mphr.orbit_start = int(parse(data[26]))
-
-        mphr.orbit_end = int(parse(data[27]))
-
-        mphr.actual_product_size = int(parse(data[28])) * units('bytes')
-
-        mphr.state_vector_time = parse(data[29])
-
-        scale = 1e3
-        mphr.semi_major_axis = float(parse(data[30])) / scale * units('m')
-
-        scale = 1e6
-        mphr.eccentricity = float(parse(data[31])) / scale
-
-        scale = 1e3
-        mphr.inclination = float(parse(data[32])) / scale * units('deg')
-
-        scale = 1e3
-        mphr.perigee_argument = float(parse(data[33])) / scale * units('deg')
-
-        scale = 1e3
-        mphr.right_ascension = float(parse(data[34])) / scale * units('deg')
-
-        scale = 1e3
-        mphr.mean_anomaly = float(parse(data[35])) / scale * units('deg')
-
-        scale = 1e3
-        mphr.x_position = float(parse(data[36])) / scale * units('m')
-
-        scale = 1e3
-        mphr.y_position = float(parse(data[37])) / scale * units('m')
-
-        scale = 1e3
-        mphr.z_position = float(parse(data[38])) / scale * units('m')
-
-        scale = 1e3
-        mphr.x_velocity = float(parse(data[39])) / scale * units('m/s')
-
-        scale = 1e3
-        mphr.y_velocity = float(parse(data[40])) / scale * units('m/s')
-
-        scale = 1e3
-        mphr.z_velocity = float(parse(data[41])) / scale * units('m/s')
-
-        mphr.earth_sun_distance_ratio = float(parse(data[42]))
-
-        mphr.location_tolerance_radial = float(parse(data[43])) * units('m')
-
-        mphr.location_tolerance_crosstrack = float(parse(data[44])) * units('m')
-
-        mphr.location_tolerance_alongtrack = float(parse(data[45])) * units('m')
-
-        scale = 1e3
-        mphr.yaw_error = float(parse(data[46])) / scale * units('deg')
-
-        scale = 1e3
-        mphr.roll_error = float(parse(data[47])) / scale * units('deg')
-
-        scale = 1e3
-        mphr.pitch_error = float(parse(data[48])) / scale * units('deg')
-
-        scale = 1e3
-        subsat_latitude_start_raw = parse(data[49])
-        if 'x' in subsat_latitude_start_raw:
-            mphr.subsat_latitude_start = None
-        else:
-            mphr.subsat_latitude_start = float(subsat_latitude_start_raw) / scale * units('deg')
-
-        scale = 1e3
-        subsat_longitude_start_raw = parse(data[50])
-        if 'x' in subsat_longitude_start_raw:
-            mphr.subsat_longitude_start = None
-        else:
-            mphr.subsat_longitude_start = float(subsat_longitude_start_raw) / scale * units('deg')
-
-        scale = 1e3
-        subsat_latitude_end_raw = parse(data[51])
-        if 'x' in subsat_latitude_end_raw:
-            mphr.subsat_latitude_end = None
-        else:
-            mphr.subsat_latitude_end = float(subsat_latitude_end_raw) / scale * units('deg')
-
-        scale = 1e3
-        subsat_longitude_end_raw = parse(data[52])
-        if 'x' in subsat_longitude_end_raw:
-            mphr.subsat_longitude_end = None
-        else:
-            mphr.subsat_longitude_end = float(subsat_longitude_end_raw) / scale * units('deg')
-
-        mphr.leap_second = int(parse(data[53]))
-
-        mphr.leap_second_utc = parse(data[54])
-
-        mphr.total_records = int(parse(data[55]))
-
-        mphr.total_mphr = int(parse(data[56]))
+        mphr.__items = parse_items(raw_data.decode('ASCII'))
         assert mphr.total_mphr == 1
-
-        mphr.total_sphr = int(parse(data[57]))
         assert mphr.total_sphr <= 1
-
-        mphr.total_ipr = int(parse(data[58]))
-
-        mphr.total_geadr = int(parse(data[59]))
-
-        mphr.total_giadr = int(parse(data[60]))
-
-        mphr.total_veadr = int(parse(data[61]))
-
-        mphr.total_viadr = int(parse(data[62]))
-
-        mphr.total_mdr = int(parse(data[62]))
-
-        mphr.count_degraded_inst_mdr = int(parse(data[63]))
-
-        mphr.count_degraded_proc_mdr = int(parse(data[64]))
-
-        mphr.count_degraded_inst_mdr_blocks = int(parse(data[66]))
-
-        mphr.count_degraded_proc_mdr_blocks = int(parse(data[67]))
-
-        mphr.duration_of_product = int(parse(data[68])) * units('ms')
-
-        milliseconds_of_data_present_raw = parse(data[69])
-        if 'x' in milliseconds_of_data_present_raw:
-            mphr.milliseconds_of_data_present = None
-        else:
-            mphr.milliseconds_of_data_present = int(milliseconds_of_data_present_raw) * units('ms')
-
-        milliseconds_of_data_missing_raw = parse(data[70])
-        if 'x' in milliseconds_of_data_missing_raw:
-            mphr.milliseconds_of_data_missing = None
-        else:
-            mphr.milliseconds_of_data_missing = int(milliseconds_of_data_missing_raw) * units('ms')
-
-        subsetted_product_raw = parse(data[71])
-        if subsetted_product_raw == 'T' or subsetted_product_raw == '1':
-            mphr.subsetted_product = True
-        elif subsetted_product_raw == 'F' or subsetted_product_raw == '0':
-            mphr.subsetted_product = False
-        else:
-            raise ValueError('Invalid value for subsetted product: ' + str(subsetted_product_raw))
-
         return mphr
 
     def __str__(self):
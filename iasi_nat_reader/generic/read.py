@@ -20,11 +20,20 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 - Moved `read_vint` and  `read_short_date` functions to here.
 - Simplified names of datatypes
 - Created `generic_read` function
+- Added `compile_dtype` and `decode_field` to decode whole records through a
+  single structured view
+- `generic_read` returns views instead of copies when reading from a
+  memory mapped record
+- Added `RecordLayout`, the precomputed position of every field of a record,
+  also used to decode a field of many records at once
+- `read_vint` decodes through a (sf, value) structured view instead of
+  accumulating the mantissa byte by byte
 """
 
+from mmap import mmap
 from struct import unpack
 import numpy as np
-from numpy import fromstring
+from numpy import frombuffer
 
 
 b = '>?'
@@ -35,6 +44,11 @@ u1 = '>u1'
 u2 = '>u2'
 u4 = '>u4'
 vi4 = '>vi4'
+sd = 'short_date'  # short cds time: day (u2) + millisecond (u4)
+
+# numpy layouts of the composite EPS types
+vint4 = np.dtype([('sf', i1), ('value', i4)])
+short_date = np.dtype([('day', u2), ('msec', u4)])
 
 # it's a performance bottleneck since calling the fromstring too many times (2w+)
 # def read_vint(raw_data:bytes, dtype:str):
@@ -50,14 +64,16 @@ vi4 = '>vi4'
 
 
 def read_vint(raw_data: bytes, dtype: str) -> np.ndarray:
-    itsz = int(dtype[-1])
-    dtype = dtype.replace('v', '')
-    n_elements = len(raw_data) // (itsz + 1)
-    as_uint_data = fromstring(raw_data, dtype=u1).reshape(n_elements, (itsz + 1))
-    mantissa = np.zeros((n_elements,), dtype=u4)
-    for i in range(1, itsz + 1):
-        mantissa += as_uint_data[:, i] * (2 ** (8 * (itsz - i)))
-    return mantissa.astype(dtype) / 10.0 ** np.int8(as_uint_data[:, 0])
+    return decode_vint(frombuffer(raw_data, dtype=numpy_dtype(dtype)))
+
+
+def decode_vint(data: np.ndarray) -> np.ndarray:
+    """
+    Decode variable scale integers from a structured array of (sf, value)
+    pairs (see `numpy_dtype`) of any shape, e.g. a strided view over the
+    same field of many records, in a single vectorized operation.
+    """
+    return data['value'] / 10.0 ** data['sf']
 
 
 def read_short_date(raw_data: bytes) -> np.ndarray:
@@ -70,12 +86,18 @@ def read_short_date(raw_data: bytes) -> np.ndarray:
 
 
 def generic_read(
-    raw_data: bytes, 
+    raw_data: bytes | memoryview, 
     offset: int, 
     shape: tuple | list, 
     dtype: str, 
     sf: int | None = None
 ) -> tuple[np.ndarray, int]:
+    """
+    Read a field of the given shape and dtype starting at offset and return it
+    with the offset of the next field. If raw_data is a memoryview (the content
+    of a memory mapped record) and no conversion is needed, the returned array
+    is a read only view over it instead of a copy.
+    """
     if '?' in dtype:
         itemsize = 1
     elif 'v' in dtype:
@@ -83,36 +105,177 @@ def generic_read(
     else:
         itemsize = int(dtype[-1])
 
-    increase = np.prod(shape) * itemsize
+    increase = int(np.prod(shape)) * itemsize
 
     if 'v' in dtype:
         tmp = read_vint(raw_data[offset : offset + increase], dtype)
     else:
-        tmp = fromstring(raw_data[offset : offset + increase], dtype=dtype)
+        tmp = frombuffer(raw_data[offset : offset + increase], dtype=dtype)
+
+    offset += increase
+
+    copy = not isinstance(raw_data, memoryview)
+    return _finalize(tmp, shape, dtype, itemsize, sf, copy), offset
 
-    if '?' not in dtype and '1' not in dtype:
+
+def _finalize(
+    tmp: np.ndarray,
+    shape: tuple | list,
+    dtype: str,
+    itemsize: int,
+    sf: int | None = None,
+    copy: bool = True,
+    squeeze: bool = True,
+) -> np.ndarray:
+    if 'v' not in dtype and '?' not in dtype and '1' not in dtype:
         if 'i' in dtype:
             tmp = np.where(tmp == -(2 ** (itemsize * 8 - 1)), np.nan, tmp)
         elif 'u' in dtype:
             tmp = np.where(tmp == 2 ** (itemsize * 8) - 1, np.nan, tmp)
 
     if 'v' not in dtype and np.all(~np.isnan(tmp)):
-        tmp = tmp.astype(dtype)
+        tmp = tmp.astype(dtype, copy=copy)
 
     # if np.all(np.array(shape)==1) or shape[0]==1:
     #     tmp = tmp[0]
     # elif not np.all(np.array(shape)==1):
     #     tmp = tmp.reshape(shape)
-    if np.all(np.array(shape) == 1):
-        tmp = tmp[0]
+    if squeeze and np.all(np.array(shape) == 1):
+        tmp = tmp.reshape(-1)[0]
     # elif np.any(np.array(shape)==1):
     #     tmp = np.squeeze(tmp)
     else:
         tmp = tmp.reshape(shape)
 
-    offset += increase
-
     if sf is None:
-        return tmp, offset
+        return tmp
+    else:
+        return tmp / 10.0**sf
+
+
+def numpy_dtype(dtype: str) -> np.dtype:
+    """
+    The numpy dtype used to view one element of an EPS datatype
+    """
+    if dtype == sd:
+        return short_date
+    elif 'v' in dtype:
+        return np.dtype([('sf', i1), ('value', dtype.replace('v', ''))])
+    return np.dtype(dtype)
+
+
+def compile_dtype(fields: list[tuple]) -> np.dtype:
+    """
+    Build one big-endian structured dtype from a field table, so that a whole
+    record can be viewed with a single `np.frombuffer` call.
+
+    Args:
+        - *fields*: a list of (name, shape, dtype, scale) tuples, in the order
+          in which they appear in the record
+
+    Returns:
+        A packed numpy structured dtype
+    """
+    return np.dtype(
+        [(name, numpy_dtype(dtype), tuple(shape)) for name, shape, dtype, _ in fields]
+    )
+
+
+def decode_field(
+    data: np.ndarray,
+    shape: tuple | list,
+    dtype: str,
+    sf: int | None = None,
+    copy: bool = True,
+    squeeze: bool = True,
+) -> np.ndarray:
+    """
+    Decode a field taken from a structured view (see `compile_dtype`) in the
+    same way `generic_read` does: fill values become NaN, variable scale
+    integers are expanded and the scale factor is applied. With copy=False,
+    fields that need no conversion are returned as views. With squeeze=False,
+    fields of shape (1,) are not turned into scalars.
+    """
+    if dtype == sd:
+        return np.stack([data['day'], data['msec']], axis=-1).astype(i4)
+    if 'v' in dtype:
+        data = decode_vint(data)
+        itemsize = numpy_dtype(dtype).itemsize
     else:
-        return tmp / 10.0**sf, offset
+        itemsize = data.dtype.itemsize
+    return _finalize(data, shape, dtype, itemsize, sf, copy, squeeze)
+
+
+def strided_view(
+    raw_data: bytes | memoryview | mmap,
+    dtype: np.dtype,
+    offset: int,
+    count: int,
+    stride: int,
+) -> np.ndarray:
+    """
+    A read only array viewing, without copies, count elements of the given
+    dtype placed every stride bytes in raw_data from offset on, e.g. the
+    same structure in consecutive records of a memory mapped file.
+    """
+    return np.ndarray((count,), dtype=dtype, buffer=raw_data, offset=offset, strides=(stride,))
+
+
+class RecordLayout:
+    """
+    The precomputed layout of a record (without GRH): the field table, the
+    structured dtype viewing the record and the offset of every field.
+
+    Args:
+        - *fields*: a list of (name, shape, dtype, scale) tuples, in the order
+          in which they appear in the record
+    """
+
+    def __init__(self, fields: list[tuple]) -> None:
+        self.fields = {name: (shape, dtype, scale) for name, shape, dtype, scale in fields}
+        self.dtype = compile_dtype(fields)
+
+    @property
+    def itemsize(self) -> int:
+        return self.dtype.itemsize
+
+    def offset(self, name: str) -> int:
+        """
+        The offset in bytes of a field from the beginning of the record
+        """
+        return self.dtype.fields[name][1]
+
+    def view(self, raw_data: bytes | memoryview) -> np.void:
+        """
+        A structured view over the raw data of a record. The raw data may be
+        longer than the layout (fields at its end that are not described).
+        """
+        return frombuffer(raw_data, dtype=self.dtype, count=1)[0]
+
+    def decode(self, view: np.void, name: str, copy: bool = True):
+        """
+        Decode a field from a view returned by `view`
+        """
+        shape, dtype, scale = self.fields[name]
+        return decode_field(view[name], shape, dtype, scale, copy)
+
+    def decode_stacked(self, data: np.ndarray, name: str) -> np.ndarray:
+        """
+        Decode a field gathered from many records, an array of shape
+        (n_records, ...) filled from views returned by `view`. The fields of
+        shape (1,) give arrays of shape (n_records,). The result is in native
+        byte order, as when the fields of single records are concatenated.
+        """
+        shape, dtype, scale = self.fields[name]
+        values = decode_field(data, data.shape, dtype, scale, squeeze=False)
+        if np.all(np.array(shape) == 1):
+            values = values.reshape(len(data))
+        return values.astype(values.dtype.newbyteorder('='), copy=False)
+
+    def empty_stacked(self, name: str, n_records: int) -> np.ndarray:
+        """
+        An uninitialized array where a field of n_records records can be
+        gathered before `decode_stacked`
+        """
+        field_dtype = self.dtype.fields[name][0]
+        return np.empty((n_records,) + field_dtype.shape, dtype=field_dtype.base)
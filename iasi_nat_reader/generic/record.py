@@ -20,10 +20,105 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 Modifications made by ronglian zhou <961836102@qq.com> on <2024/10/17>:
 - Moved the Record class from native_file.py to here.
 - Separated out the base attributes and functions in Record class to BaseRecord class.
+- Added support for reading records from a memory mapped file.
+- Added `scan_records` and `select_records` to locate records without
+  reading their content.
 """
 
-from .record_content import interpreted_content, uninterpreted_content
-from .grh import GRH
+from typing import IO, Callable
+from mmap import mmap, ACCESS_READ
+from os import SEEK_CUR
+import numpy as np
+
+from .record_content import interpreted_content, uninterpreted_content, mapped_content
+from .grh import GRH, grh_dtype
+
+# An entry of the record index: where the record starts in the file and its grh
+index_dtype = np.dtype([('offset', np.int64)] + grh_dtype.descr)
+
+
+def map_file(f: IO) -> mmap:
+    """
+    Map a whole file opened in binary mode in memory (read only). Records
+    read from the returned object keep a view over it instead of a copy of
+    their content.
+    """
+    return mmap(f.fileno(), 0, access=ACCESS_READ)
+
+
+def scan_records(f: IO | mmap, size: int) -> np.ndarray:
+    """
+    Build the index of the records of a file reading only their grh: the
+    content of every record is skipped seeking forward of record_size bytes.
+
+    Args:
+        - *f*: a file descriptor (or a memory mapped file)
+        - *size*: the size of the file in bytes
+
+    Returns:
+        A numpy array of index_dtype with an entry for every record
+    """
+    offsets = []
+    headers = []
+    offset = 0
+    while offset < size:
+        f.seek(offset)
+        raw = f.read(GRH.size)
+        header = np.frombuffer(raw, dtype=grh_dtype, count=1)[0]
+        if header['record_size'] < GRH.size:
+            raise ValueError(f'invalid record size ({header["record_size"]}) at offset {offset}')
+        offsets.append(offset)
+        headers.append(raw)
+        offset += int(header['record_size'])
+
+    index = np.zeros(len(offsets), dtype=index_dtype)
+    index['offset'] = offsets
+    grhs = np.frombuffer(b''.join(headers), dtype=grh_dtype)
+    for name in grh_dtype.names:
+        index[name] = grhs[name]
+    return index
+
+
+def read_header_records(f: IO, read_record: Callable) -> list:
+    """
+    Read the records of a file from its start up to its first MDR (the MPHR,
+    the IPRs and the auxiliary data records) with read_record, e.g.
+    `Record.read`, without walking the rest of the file
+    """
+    records = []
+    while True:
+        raw = f.read(GRH.size)
+        # the record class is the first byte of the grh
+        if len(raw) < GRH.size or raw[0] == 8:
+            return records
+        f.seek(-GRH.size, 1)
+        records.append(read_record(f))
+
+
+def select_records(index: np.ndarray, mdr_record_idx: int | list | slice = None) -> list[int]:
+    """
+    Return the positions (in the index) of the records to read: all the
+    records that come before the first MDR, followed by the MDRs selected
+    by mdr_record_idx (all of them if it is None).
+    """
+    positions = list(range(len(index)))
+    if mdr_record_idx is None:
+        return positions
+
+    # without any MDR, all the records are header records
+    mdrs = np.flatnonzero(index['record_class'] == 8)
+    i = int(mdrs[0]) if len(mdrs) else len(index)
+    header = positions[:i]
+    main = positions[i:]
+
+    if isinstance(mdr_record_idx, int):
+        main = [main[mdr_record_idx]]
+    elif isinstance(mdr_record_idx, list):
+        main = [element for n, element in enumerate(main) if n in mdr_record_idx]
+    elif isinstance(mdr_record_idx, slice):
+        rng = range(mdr_record_idx.start, mdr_record_idx.stop)
+        main = [element for n, element in enumerate(main) if n in rng]
+    return [*header, *main]
 
 
 class BaseRecord:
@@ -42,10 +137,28 @@ class BaseRecord:
         - *content*: a record_content object
     """
 
-    def __init__(self, grh: GRH, content: interpreted_content | uninterpreted_content):
+    def __init__(
+        self,
+        grh: GRH,
+        content: interpreted_content | uninterpreted_content | mapped_content,
+    ):
         self.__grh = grh
         self.__content = content
 
+    @staticmethod
+    def read_content(f: IO | mmap, grh: GRH) -> uninterpreted_content | mapped_content:
+        """
+        Read the content of a record whose grh has just been read from f,
+        without interpreting it. If f is a memory mapped file, nothing is
+        copied: the content is a view over the mapping.
+        """
+        size = grh.record_size - GRH.size
+        if isinstance(f, mmap):
+            start = f.tell()
+            f.seek(size, SEEK_CUR)
+            return mapped_content(memoryview(f)[start : start + size])
+        return uninterpreted_content(f.read(size))
+
     @property
     def type(self):
         """
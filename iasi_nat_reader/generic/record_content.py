@@ -19,8 +19,16 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 
 Modifications made by ronglian zhou <961836102@qq.com> on <2024/10/17>:
 - Removed support for python 2.x.
+- Added `mapped_content` for records read from a memory mapped file.
+- Added `lazy_content`, decoding the fields of a record on first access.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .read import RecordLayout, strided_view
+
 
 class uninterpreted_content(bytes):
     @property
@@ -40,3 +48,174 @@ class interpreted_content(object):
     @property
     def raw(self):
         raise NotImplementedError
+
+
+class mapped_content(object):
+    """
+    An uninterpreted content that is not copied in memory: it is a view
+    over the memory mapped file the record has been read from
+    """
+
+    def __init__(self, buffer: memoryview):
+        self.__buffer = buffer
+
+    @property
+    def interpreted(self):
+        return False
+
+    @property
+    def raw(self):
+        return self.__buffer
+
+    def __len__(self):
+        return len(self.__buffer)
+
+
+def _address(buffer) -> int:
+    return np.frombuffer(buffer, dtype=np.uint8, count=1).__array_interface__['data'][0]
+
+
+def _strided_records(contents: list['lazy_content']) -> np.ndarray | None:
+    """
+    A structured array viewing all the records at once, if they share their
+    layout and are evenly spaced over the same memory mapped file
+    """
+    if not contents or not all(isinstance(c._raw, memoryview) for c in contents):
+        return None
+    base = contents[0]._raw.obj
+    layout = contents[0]._layout
+    if any(c._raw.obj is not base or c._layout is not layout for c in contents):
+        return None
+
+    offsets = np.array([_address(c._raw) for c in contents]) - _address(base)
+    stride = int(offsets[1] - offsets[0]) if len(offsets) > 1 else layout.itemsize
+    if stride < layout.itemsize or np.any(np.diff(offsets) != stride):
+        return None
+    return strided_view(base, layout.dtype, int(offsets[0]), len(contents), stride)
+
+
+class lazy_content(interpreted_content):
+    """
+    An interpreted content whose fields are decoded from the raw record the
+    first time they are accessed, through the precomputed layout of the
+    record, and are then kept as plain attributes.
+
+    Subclasses list in `fields` all the fields they may have: the ones that
+    are not part of the layout of a record (e.g. fields added by a newer
+    subclass version) are None. Fields that need more than `RecordLayout.decode`
+    are handled overriding `decode`.
+    """
+
+    fields: tuple[str, ...] = ()
+    # the fields that `decode` does not hand over to `RecordLayout.decode`
+    custom_fields: tuple[str, ...] = ()
+
+    def __init__(self, raw: bytes | memoryview, layout: RecordLayout) -> None:
+        self._raw = raw
+        self._layout = layout
+        self._view = layout.view(raw)
+
+    @property
+    def raw(self):
+        return self._raw
+
+    @property
+    def layout(self) -> RecordLayout:
+        return self._layout
+
+    def decode(self, name: str):
+        """
+        Decode a field of the record
+        """
+        return self._layout.decode(self._view, name, not isinstance(self._raw, memoryview))
+
+    @classmethod
+    def stack(cls, contents: list['lazy_content'], name: str):
+        """
+        Decode a field of many records at once, without decoding their other
+        fields: the raw values are gathered in one preallocated array of
+        shape (n_records, ...) which is then decoded as a whole.
+
+        Custom fields, fields missing in some records and fields whose shape
+        changes from a record to another are returned as a list of the values
+        of every record.
+        """
+        if name not in cls.fields:
+            raise ValueError(f'{cls.__name__} has no field {name}')
+
+        descriptors = {content._layout.fields.get(name) for content in contents}
+        if name in cls.custom_fields or len(descriptors) != 1 or None in descriptors:
+            return [getattr(content, name) for content in contents]
+
+        return contents[0]._layout.decode_stacked(cls.gather(contents, name), name)
+
+    @classmethod
+    def gather(cls, contents: list['lazy_content'], name: str) -> np.ndarray:
+        """
+        The raw values of a field of many records with the same layout, as an
+        array of shape (n_records, ...). When the records are evenly spaced
+        in the same memory mapped file, as the MDRs of a file are, this is a
+        strided view over the file; otherwise the values are copied in a
+        preallocated array. The records must not be empty: their layout
+        gives the dtype and the shape of the values.
+        """
+        if not contents:
+            raise ValueError(f'no record to gather {name} from')
+        if name not in contents[0]._layout.fields:
+            raise ValueError(f'{name} is not a field of the records')
+
+        records = _strided_records(contents)
+        if records is not None:
+            return records[name]
+
+        data = contents[0]._layout.empty_stacked(name, len(contents))
+        for i, content in enumerate(contents):
+            data[i] = content._view[name]
+        return data
+
+    def decode_all(self) -> None:
+        """
+        Decode all the fields that have not been accessed yet
+        """
+        for name in self.fields:
+            getattr(self, name)
+
+    @staticmethod
+    def decode_contents(contents: list['lazy_content'], workers: int = 1) -> None:
+        """
+        Decode all the fields of many contents up front. With workers > 1 the
+        contents are decoded concurrently by a pool of threads: most of the
+        work is done by numpy, which releases the GIL, and the threads share
+        the raw data (or the memory mapped file) without copies.
+        """
+        if workers <= 1:
+            for content in contents:
+                content.decode_all()
+            return
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for _ in pool.map(lazy_content.decode_all, contents):
+                pass
+
+    def __getattr__(self, name: str):
+        # only called when the attribute is not set, i.e. the first time a
+        # field is accessed
+        if name.startswith('_') or name not in type(self).fields:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'"
+            )
+        value = self.decode(name) if name in self._layout.fields else None
+        setattr(self, name, value)
+        return value
+
+    def __dir__(self):
+        return sorted(set(super().__dir__()) | set(self.fields))
+
+    def __getstate__(self):
+        state = dict(vars(self))
+        state['_raw'] = bytes(self._raw)
+        del state['_view']
+        return state
+
+    def __setstate__(self, state):
+        vars(self).update(state)
+        self._view = self._layout.view(self._raw)
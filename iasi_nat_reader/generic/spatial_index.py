@@ -0,0 +1,175 @@
+"""
+iasi_nat_reader: An enhanced library to read IASI L1C, L2, and PCC files
+Copyright (C) 2024 Ronglian Zhou
+
+This library is free software; you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License as published by the Free Software Foundation; either
+version 3.0 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+Spatial index of the FOVs of a native file, to select the FOVs of a region
+without comparing the location of every FOV
+"""
+
+import numpy as np
+
+EARTH_RADIUS = 6371.0  # km
+
+
+class SpatialIndex:
+    """
+    A grid of cells of cell x cell degrees over the FOVs of a file: the
+    positions of the FOVs are sorted by cell, so that a query looks only at
+    the FOVs of the cells crossed by the region.
+
+    Args:
+        - *lon*, *lat*: the longitudes and the latitudes of the FOVs (in
+          degrees), of shape (n_mdrs, n_fov). The FOVs without location
+          (NaN) are never selected.
+        - *cell*: the size of the cells in degrees
+
+    Example:
+        >>> index = SpatialIndex(lon, lat)
+        >>> mdr, fov = index.select(bbox=(-10, 35, 5, 45))
+        >>> mdr, fov = index.select(center=(2.35, 48.85), radius=100)
+    """
+
+    def __init__(self, lon: np.ndarray, lat: np.ndarray, cell: float = 1.0) -> None:
+        lon, lat = np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64)
+        self.shape = lon.shape
+        self.cell = cell
+        self.n_lat = int(np.ceil(180 / cell))
+        self.n_lon = int(np.ceil(360 / cell))
+
+        self.lon = wrap_longitude(lon.reshape(-1))
+        self.lat = lat.reshape(-1)
+        valid = np.flatnonzero(~np.isnan(self.lon) & ~np.isnan(self.lat))
+        cells = self.cell_ids(self.lat_bins(self.lat[valid]), self.lon_bins(self.lon[valid]))
+        order = np.argsort(cells, kind='stable')
+        # the positions of the FOVs sorted by cell
+        self.positions = valid[order]
+        self.cells = cells[order]
+
+    def lat_bins(self, lat: np.ndarray) -> np.ndarray:
+        return np.clip(np.floor((lat + 90) / self.cell), 0, self.n_lat - 1).astype(np.int64)
+
+    def lon_bins(self, lon: np.ndarray) -> np.ndarray:
+        return np.clip(np.floor((lon + 180) / self.cell), 0, self.n_lon - 1).astype(np.int64)
+
+    def cell_ids(self, lat_bins: np.ndarray, lon_bins: np.ndarray) -> np.ndarray:
+        return lat_bins * self.n_lon + lon_bins
+
+    def candidates(self, lon_ranges: list[tuple], lat_range: tuple) -> np.ndarray:
+        """
+        The positions of the FOVs of the cells crossed by some ranges of
+        longitudes (which do not cross the antimeridian) and a range of
+        latitudes
+        """
+        lat_bins = np.arange(*self.lat_bins(np.array(lat_range)) + [0, 1])
+        lon_bins = np.concatenate(
+            [np.arange(*self.lon_bins(np.array(lon_range)) + [0, 1]) for lon_range in lon_ranges]
+        )
+        # ranges sharing a cell (e.g. both sides of the antimeridian) visit it once
+        wanted = np.unique(self.cell_ids(lat_bins[:, np.newaxis], lon_bins[np.newaxis, :]))
+        starts = np.searchsorted(self.cells, wanted, 'left')
+        stops = np.searchsorted(self.cells, wanted, 'right')
+        found = stops > starts
+        if not np.any(found):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(
+            [self.positions[start:stop] for start, stop in zip(starts[found], stops[found])]
+        )
+
+    def query_box(
+        self, lon_min: float, lat_min: float, lon_max: float, lat_max: float
+    ) -> np.ndarray:
+        """
+        The positions (in the flattened arrays of the FOVs) of the FOVs in a
+        box. The box crosses the antimeridian if lon_min > lon_max.
+        """
+        # only a span of 360 degrees or more holds all the longitudes
+        full = lon_max - lon_min >= 360
+        lon_min, lon_max = wrap_longitude(np.array([lon_min, lon_max], dtype=np.float64))
+        if full:
+            lon_ranges = [(-180.0, 180.0)]
+        elif lon_min <= lon_max:
+            lon_ranges = [(lon_min, lon_max)]
+        else:
+            lon_ranges = [(lon_min, 180.0), (-180.0, lon_max)]
+        positions = self.candidates(lon_ranges, (lat_min, lat_max))
+
+        lon, lat = self.lon[positions], self.lat[positions]
+        inside = (lat >= lat_min) & (lat <= lat_max)
+        if not full and lon_min <= lon_max:
+            inside &= (lon >= lon_min) & (lon <= lon_max)
+        elif not full:
+            inside &= (lon >= lon_min) | (lon <= lon_max)
+        return np.sort(positions[inside])
+
+    def query_radius(self, lon: float, lat: float, radius: float) -> np.ndarray:
+        """
+        The positions (in the flattened arrays of the FOVs) of the FOVs at
+        most radius km (on a spherical Earth) from a point
+        """
+        distance = np.degrees(radius / EARTH_RADIUS)
+        lat_range = (max(lat - distance, -90.0), min(lat + distance, 90.0))
+        if lat_range[0] <= -90 or lat_range[1] >= 90 or distance >= 90:
+            # the circle holds a pole: all the longitudes
+            lon_ranges = [(-180.0, 180.0)]
+        else:
+            width = np.degrees(
+                np.arcsin(min(np.sin(np.radians(distance)) / np.cos(np.radians(lat)), 1.0))
+            )
+            lon_min, lon_max = wrap_longitude(np.array([lon - width, lon + width]))
+            if lon_min <= lon_max and 2 * width < 360:
+                lon_ranges = [(lon_min, lon_max)]
+            else:
+                lon_ranges = [(lon_min, 180.0), (-180.0, lon_max)]
+        positions = self.candidates(lon_ranges, lat_range)
+
+        inside = great_circle(lon, lat, self.lon[positions], self.lat[positions]) <= radius
+        return np.sort(positions[inside])
+
+    def select(
+        self, bbox: tuple = None, center: tuple = None, radius: float = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The MDRs and the FOVs (their positions in the arrays the index was
+        built from) of a region: either a box (lon_min, lat_min, lon_max,
+        lat_max), or the FOVs at most radius km from a center (lon, lat)
+        """
+        if bbox is not None and center is None and radius is None:
+            positions = self.query_box(*bbox)
+        elif bbox is None and center is not None and radius is not None:
+            positions = self.query_radius(*center, radius)
+        else:
+            raise ValueError('give either a bbox, or a center and a radius')
+        return np.unravel_index(positions, self.shape)
+
+
+def wrap_longitude(lon: np.ndarray) -> np.ndarray:
+    """
+    The longitudes in [-180, 180)
+    """
+    return (lon + 180) % 360 - 180
+
+
+def great_circle(lon1, lat1, lon2, lat2) -> np.ndarray:
+    """
+    The distance in km between points, with the haversine formula
+    """
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
@@ -19,18 +19,19 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 
 Modifications made by ronglian zhou <961836102@qq.com> on <2024/10/17>:
 - Refactored MDR class.
+- The fields of the MDR are decoded lazily, on first access.
 """
 
-from numpy import fromstring, arange
+from numpy import arange
 import numpy as np
 
-from ..utilities import where_greater, read_bitfield
-from ...generic.record_content import interpreted_content
+from ..utilities import where_greater, read_bitfield, read_avhrr_quality, avhrr_quality_list
+from ...generic.record_content import lazy_content
 from ...generic.grh import GRH
 from ...generic.parameters import *
 from ...generic.read import (
-    generic_read,
-    read_short_date,
+    RecordLayout,
+    decode_field,
     b,
     i2,
     i4,
@@ -38,403 +39,187 @@ from ...generic.read import (
     u2,
     u4,
     vi4,
+    sd,
 )
 from .record import Record
 from .giadr import GIADR_scale_factors
 
 
-class MDR(interpreted_content):
-    def __init__(self) -> None:
-        self.DEGRADED_INST_MDR = None
-        self.DEGRADED_PROC_MDR = None
-        self.GEPSIasiMode = None
-        self.GEPSOPSProcessingMode = None
-        self.GEPSIdConf = None
-        self.GEPSLocIasiAvhrr_IASI = None
-        self.GEPSLocIasiAvhrr_IIS = None
-        self.OBT = None
-        self.ONBoardUTC = None
-        self.GEPSDatIasi = None
-        self.GIsfLinOrigin = None
-        self.GIsfColOrigin = None
-        self.GIsfPds1 = None
-        self.GIsfPds2 = None
-        self.GIsfPds3 = None
-        self.GIsfPds4 = None
-        self.GEPS_CCD = None
-        self.GEPS_SP = None
-        self.GIrcImage = None
-        self.GQisFlagQual = None
-        self.GQisFlagQualDetailed = None
-        self.GQisQualIndex = None
-        self.GQisQualIndexIIS = None
-        self.GQisQualIndexLoc = None
-        self.GQisQualIndexRad = None
-        self.GQisQualIndexSpect = None
-        self.GQisSysTecIISQual = None
-        self.GQisSysTecSondQual = None
-        self.GGeoSondLoc = None
-        self.GGeoSondAnglesMETOP = None
-        self.GGeoIISAnglesMETOP = None
-        self.GGeoSondAnglesSUN = None
-        self.GGeoIISAnglesSUN = None
-        self.GGeoIISLoc = None
-        self.EARTH_SATELLITE_DISTANCE = None
-        self.IDefSpectDWn1b = None
-        self.IDefNsfirst1b = None
-        self.IDefNslast1b = None
-        self.GS1cSpect = None
-        self.IDefCovarMatEigenVal1c = None
-        self.IDefCcsChannelId = None
-        self.GCcsRadAnalNbClass = None
-        self.GCcsRadAnalWgt = None
-        self.GCcsRadAnalY = None
-        self.GCcsRadAnalZ = None
-        self.GCcsRadAnalMean = None
-        self.GCcsRadAnalStd = None
-        self.GCcsImageClassified = None
-        self.IDefCcsMode = None
-        self.GCcsImageClassifiedNbLin = None
-        self.GCcsImageClassifiedNbCol = None
-        self.GCcsImageClassifiedFirstLin = None
-        self.GCcsImageClassifiedFirstCol = None
-        self.GCcsRadAnalType = None
-        self.GIacVarImagIIS = None
-        self.GIacAvgImagIIS = None
-        self.GEUMAvhrr1BCldFrac = None
-        self.GEUMAvhrr1BLandFrac = None
-        self.GEUMAvhrr1BQual = None
+def mdr_fields(version: int) -> list[tuple]:
+    """
+    The layout of an MDR (without GRH) of the given subclass version as a list
+    of (name, shape, dtype, scale) tuples.
+
+    Bitfields are listed as raw bytes (`u1`) and are interpreted afterwards
+    by `read_bitfield`; `GS1cSpect` is listed unscaled since its scale factors
+    come from the GIADR.
+    """
+    fields = [
+        ('DEGRADED_INST_MDR', (1,), b, None),
+        ('DEGRADED_PROC_MDR', (1,), b, None),
+        ('GEPSIasiMode', (4,), u1, None),
+        ('GEPSOPSProcessingMode', (4,), u1, None),
+        ('GEPSIdConf', (32,), u1, None),
+        ('GEPSLocIasiAvhrr_IASI', (SNOT, PN, 2), vi4, None),
+        ('GEPSLocIasiAvhrr_IIS', (SNOT, SGI, 2), vi4, None),
+        ('OBT', (SNOT, 6), u1, None),
+        ('ONBoardUTC', (SNOT,), sd, None),
+        ('GEPSDatIasi', (SNOT,), sd, None),
+        ('GIsfLinOrigin', (CCD,), i4, None),
+        ('GIsfColOrigin', (CCD,), i4, None),
+        ('GIsfPds1', (CCD,), i4, 6),
+        ('GIsfPds2', (CCD,), i4, 6),
+        ('GIsfPds3', (CCD,), i4, 6),
+        ('GIsfPds4', (CCD,), i4, 6),
+        ('GEPS_CCD', (SNOT,), b, None),
+        ('GEPS_SP', (SNOT,), i4, None),
+        ('GIrcImage', (SNOT, IMLI, IMCO), u2, -5),  # W/m2/sr/m-1 -> mW/m2/sr/cm-1
+    ]
+    if version == 4:
+        fields += [
+            ('GQisFlagQual', (SNOT, PN), b, None),
+        ]
+    elif version == 5:
+        fields += [
+            ('GQisFlagQual', (SNOT, PN, SB), b, None),
+            ('GQisFlagQualDetailed', (SNOT, PN), i2, None),
+        ]
+    fields += [
+        ('GQisQualIndex', (1,), vi4, None),
+        ('GQisQualIndexIIS', (1,), vi4, None),
+        ('GQisQualIndexLoc', (1,), vi4, None),
+        ('GQisQualIndexRad', (1,), vi4, None),
+        ('GQisQualIndexSpect', (1,), vi4, None),
+        ('GQisSysTecIISQual', (1,), u4, None),
+        ('GQisSysTecSondQual', (1,), u4, None),
+        ('GGeoSondLoc', (SNOT, PN, 2), i4, 6),
+        ('GGeoSondAnglesMETOP', (SNOT, PN, 2), i4, 6),
+        ('GGeoIISAnglesMETOP', (SNOT, SGI, 2), i4, 6),
+        ('GGeoSondAnglesSUN', (SNOT, PN, 2), i4, 6),
+        ('GGeoIISAnglesSUN', (SNOT, SGI, 2), i4, 6),
+        ('GGeoIISLoc', (SNOT, SGI, 2), i4, 6),
+        ('EARTH_SATELLITE_DISTANCE', (1,), u4, None),
+        ('IDefSpectDWn1b', (1,), vi4, None),
+        ('IDefNsfirst1b', (1,), i4, None),
+        ('IDefNslast1b', (1,), i4, None),
+        ('GS1cSpect', (SNOT, PN, SS), i2, None),
+        ('IDefCovarMatEigenVal1c', (100, CCD), vi4, None),
+        ('IDefCcsChannelId', (NBK,), i4, None),
+        ('GCcsRadAnalNbClass', (SNOT, PN), i4, None),
+        ('GCcsRadAnalWgt', (SNOT, PN, NCL), vi4, None),
+        ('GCcsRadAnalY', (SNOT, PN, NCL), i4, 6),
+        ('GCcsRadAnalZ', (SNOT, PN, NCL), i4, 6),
+        ('GCcsRadAnalMean', (SNOT, PN, NCL, NBK), vi4, -3),  # W/* -> mW/*
+        ('GCcsRadAnalStd', (SNOT, PN, NCL, NBK), vi4, -3),  # W/* -> mW/*
+        ('GCcsImageClassified', (SNOT, AMLI, AMCO), u1, None),
+        ('IDefCcsMode', (4,), u1, None),
+        ('GCcsImageClassifiedNbLin', (SNOT,), i2, None),
+        ('GCcsImageClassifiedNbCol', (SNOT,), i2, None),
+        ('GCcsImageClassifiedFirstLin', (SNOT,), vi4, None),
+        ('GCcsImageClassifiedFirstCol', (SNOT,), vi4, None),
+        ('GCcsRadAnalType', (SNOT, NCL), b, None),
+    ]
+    if version == 5:
+        fields += [
+            ('GIacVarImagIIS', (SNOT,), vi4, -5),  # W/(m² sr m^-1) -> mW/(m² sr cm^-1)
+            ('GIacAvgImagIIS', (SNOT,), vi4, -5),  # W/(m² sr m^-1) -> mW/(m² sr cm^-1)
+            ('GEUMAvhrr1BCldFrac', (SNOT, PN), u1, None),
+            ('GEUMAvhrr1BLandFrac', (SNOT, PN), u1, None),
+            ('GEUMAvhrr1BQual', (SNOT, PN), u1, None),
+        ]
+    return fields
+
+
+MDR_FIELDS = {version: mdr_fields(version) for version in (4, 5)}
+MDR_LAYOUTS = {version: RecordLayout(fields) for version, fields in MDR_FIELDS.items()}
+
+BITFIELDS = ('GEPSIasiMode', 'GEPSOPSProcessingMode', 'GEPSIdConf', 'IDefCcsMode')
+
+
+def radiance_scale_factors(giadr_sf: GIADR_scale_factors, nsfirst: int, nslast: int) -> np.ndarray:
+    """
+    The scale factors of the channels from nsfirst to nslast, from the GIADR
+    """
+    num_ch = nslast - nsfirst + 1
+    pos = where_greater(giadr_sf.IDefScaleSondNslast, arange(num_ch) + nsfirst)
+    return giadr_sf.IDefScaleSondScaleFactor[pos]
+
+
+class MDR(lazy_content):
+    """
+    The MDR of a L1C file. Its fields are decoded from the record only when
+    they are accessed for the first time (see `lazy_content`).
+    """
+
+    fields = tuple(name for name, *_ in MDR_FIELDS[5])
+    custom_fields = BITFIELDS + ('GEUMAvhrr1BQual', 'GS1cSpect')
+
+    def __init__(
+        self,
+        raw_data: bytes | memoryview,
+        version: int,
+        giadr_sf: GIADR_scale_factors,
+    ) -> None:
+        super().__init__(raw_data, MDR_LAYOUTS[version])
+        self._giadr_sf = giadr_sf
 
     @staticmethod
     def read(record: Record, giadr_sf: GIADR_scale_factors):
-        raw_data: bytes = record.content
         grh: GRH = record.grh
-
-        mdr = MDR()
-
-        offset = 0
-        increase = 0
-
-        shape = (1,)
-        dtype = b
-        scale = None
-        mdr.DEGRADED_INST_MDR, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = b
-        scale = None
-        mdr.DEGRADED_PROC_MDR, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        increase = np.prod(shape) * 4
-        mdr.GEPSIasiMode = read_bitfield(raw_data[offset : offset + increase], 'GEPSIasiMode')
-        offset += increase
-
-        shape = (1,)
-        increase = np.prod(shape) * 4
-        mdr.GEPSOPSProcessingMode = read_bitfield(raw_data[offset : offset + increase], 'GEPSOPSProcessingMode')
-        offset += increase
-
-        shape = (1,)
-        increase = np.prod(shape) * 32
-        mdr.GEPSIdConf = read_bitfield(raw_data[offset : offset + increase], 'GEPSIdConf')
-        offset += increase
-
-        shape = (SNOT, PN, 2)
-        dtype = vi4
-        scale = None
-        mdr.GEPSLocIasiAvhrr_IASI, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, SGI, 2)
-        dtype = vi4
-        scale = None
-        mdr.GEPSLocIasiAvhrr_IIS, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        increase = 6 * SNOT
-        mdr.OBT = fromstring(raw_data[offset : offset + increase], dtype=u1).reshape(SNOT, 6)
-        offset += increase
-
-        increase = SNOT * 6
-        mdr.ONBoardUTC = read_short_date(raw_data[offset : offset + increase])
-        offset += increase
-
-        increase = SNOT * 6
-        mdr.GEPSDatIasi = read_short_date(raw_data[offset : offset + increase])
-        offset += increase
-
-        shape = (CCD,)
-        dtype = i4
-        scale = None
-        mdr.GIsfLinOrigin, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (CCD,)
-        dtype = i4
-        scale = None
-        mdr.GIsfColOrigin, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (CCD,)
-        dtype = i4
-        scale = 6
-        mdr.GIsfPds1, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (CCD,)
-        dtype = i4
-        scale = 6
-        mdr.GIsfPds2, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (CCD,)
-        dtype = i4
-        scale = 6
-        mdr.GIsfPds3, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (CCD,)
-        dtype = i4
-        scale = 6
-        mdr.GIsfPds4, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT,)
-        dtype = b
-        scale = None
-        mdr.GEPS_CCD, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT,)
-        dtype = i4
-        scale = None
-        mdr.GEPS_SP, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, IMLI, IMCO)
-        dtype = u2
-        scale = -5  # W/m2/sr/m-1 -> mW/m2/sr/cm-1
-        mdr.GIrcImage, offset = generic_read(raw_data, offset, shape, dtype, scale)
-        # mdr.GIrcImage = mdr.GIrcImage.astype(np.float64)
-        # UFuncTypeError: Cannot cast ufunc 'multiply' output from dtype('float64') to dtype('>u2') with casting rule 'same_kind'
-
-        if grh.record_subclass_version == 4:
-            shape = (SNOT, PN)
-            dtype = b
-            scale = None
-            mdr.GQisFlagQual, offset = generic_read(raw_data, offset, shape, dtype, scale)
-        elif grh.record_subclass_version == 5:
-            shape = (SNOT, PN, SB)
-            dtype = b
-            scale = None
-            mdr.GQisFlagQual, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-            shape = (SNOT, PN)
-            dtype = i2
-            scale = None
-            mdr.GQisFlagQualDetailed, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = vi4
-        scale = None
-        mdr.GQisQualIndex, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = vi4
-        scale = None
-        mdr.GQisQualIndexIIS, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = vi4
-        scale = None
-        mdr.GQisQualIndexLoc, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = vi4
-        scale = None
-        mdr.GQisQualIndexRad, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = vi4
-        scale = None
-        mdr.GQisQualIndexSpect, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = u4
-        scale = None
-        mdr.GQisSysTecIISQual, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = u4
-        scale = None
-        mdr.GQisSysTecSondQual, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, 2)
-        dtype = i4
-        scale = 6
-        mdr.GGeoSondLoc, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, 2)
-        dtype = i4
-        scale = 6
-        mdr.GGeoSondAnglesMETOP, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, SGI, 2)
-        dtype = i4
-        scale = 6
-        mdr.GGeoIISAnglesMETOP, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, 2)
-        dtype = i4
-        scale = 6
-        mdr.GGeoSondAnglesSUN, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, SGI, 2)
-        dtype = i4
-        scale = 6
-        mdr.GGeoIISAnglesSUN, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, SGI, 2)
-        dtype = i4
-        scale = 6
-        mdr.GGeoIISLoc, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = u4
-        scale = None
-        mdr.EARTH_SATELLITE_DISTANCE, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = vi4
-        scale = None
-        mdr.IDefSpectDWn1b, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = i4
-        scale = None
-        mdr.IDefNsfirst1b, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = i4
-        scale = None
-        mdr.IDefNslast1b, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        num_ch = mdr.IDefNslast1b - mdr.IDefNsfirst1b + 1
-
-        pos = where_greater(giadr_sf.IDefScaleSondNslast, arange(num_ch) + mdr.IDefNsfirst1b)
-        rad_sfs = giadr_sf.IDefScaleSondScaleFactor[pos]
-
-        shape = (SNOT, PN, SS)
-        dtype = i2
-        scale = None
-        GS1cSpect, offset = generic_read(raw_data, offset, shape, dtype, scale)
-        # With the following two lines you have the original data format
-        # with some useless values
-        # mdr.GS1cSpect = zeros((SS, PN, SNOT), dtype=float64)
-        # mdr.GS1cSpect[0:num_ch,:,:] = GS1cSpect[0:num_ch,:,:] / 10.**rad_sfs[:, newaxis, newaxis]
-        # With this, instead, you have only the real data
-        mdr.GS1cSpect = GS1cSpect[:, :, 0:num_ch] / 10.0**rad_sfs * 1e5  # W/(m² sr m^-1) -> mW/m2/sr/cm-1
-
-        shape = (100, CCD)
-        dtype = vi4
-        scale = None
-        mdr.IDefCovarMatEigenVal1c, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (NBK,)
-        dtype = i4
-        scale = None
-        mdr.IDefCcsChannelId, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN)
-        dtype = i4
-        scale = None
-        mdr.GCcsRadAnalNbClass, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NCL)
-        dtype = vi4
-        scale = None
-        mdr.GCcsRadAnalWgt, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NCL)
-        dtype = i4
-        scale = 6
-        mdr.GCcsRadAnalY, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NCL)
-        dtype = i4
-        scale = 6
-        mdr.GCcsRadAnalZ, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NCL, NBK)
-        dtype = vi4
-        # scale = None
-        scale = -3  # W/* -> mW/*
-        mdr.GCcsRadAnalMean, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NCL, NBK)
-        dtype = vi4
-        # scale = None
-        scale = -3  # W/* -> mW/*
-        mdr.GCcsRadAnalStd, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, AMLI, AMCO)
-        dtype = u1
-        scale = None
-        mdr.GCcsImageClassified, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        increase = np.prod(shape) * 4
-        mdr.IDefCcsMode = read_bitfield(raw_data[offset : offset + increase], 'IDefCcsMode')
-        offset += increase
-
-        shape = (SNOT,)
-        dtype = i2
-        scale = None
-        mdr.GCcsImageClassifiedNbLin, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT,)
-        dtype = i2
-        scale = None
-        mdr.GCcsImageClassifiedNbCol, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT,)
-        dtype = vi4
-        scale = None
-        mdr.GCcsImageClassifiedFirstLin, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT,)
-        dtype = vi4
-        scale = None
-        mdr.GCcsImageClassifiedFirstCol, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, NCL)
-        dtype = b
-        scale = None
-        mdr.GCcsRadAnalType, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        if grh.record_subclass_version == 5:
-            shape = (SNOT,)
-            dtype = vi4
-            scale = -5  # W/(m² sr m^-1) -> mW/(m² sr cm^-1)
-            mdr.GIacVarImagIIS, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-            shape = (SNOT,)
-            dtype = vi4
-            scale = -5  # W/(m² sr m^-1) -> mW/(m² sr cm^-1)
-            mdr.GIacAvgImagIIS, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-            shape = (SNOT, PN)
-            dtype = u1
-            scale = None
-            mdr.GEUMAvhrr1BCldFrac, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-            shape = (SNOT, PN)
-            dtype = u1
-            scale = None
-            mdr.GEUMAvhrr1BLandFrac, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-            GEUMAvhrr1BQual = []
-            shape = (SNOT, PN)
-            increase = np.prod(shape)
-            for i in range(increase):
-                GEUMAvhrr1BQual.append(read_bitfield(raw_data[offset : offset + 1], 'GEUMAvhrr1BQual'))
-                offset += 1
-            mdr.GEUMAvhrr1BQual = GEUMAvhrr1BQual
-
-        assert grh.record_size == offset + GRH.size
-
-        return mdr
+        version = grh.record_subclass_version
+        assert grh.record_size == MDR_LAYOUTS[version].itemsize + GRH.size
+
+        return MDR(record.content.raw, version, giadr_sf)
+
+    def decode(self, name: str):
+        if name in BITFIELDS:
+            return read_bitfield(self._view[name].tobytes(), name)
+
+        if name == 'GEUMAvhrr1BQual':
+            return avhrr_quality_list(self._view[name])
+
+        if name == 'GS1cSpect':
+            num_ch = self.IDefNslast1b - self.IDefNsfirst1b + 1
+            rad_sfs = radiance_scale_factors(self._giadr_sf, self.IDefNsfirst1b, self.IDefNslast1b)
+
+            GS1cSpect = decode_field(self._view['GS1cSpect'], (SNOT, PN, SS), i2)
+            # With the following two lines you have the original data format
+            # with some useless values
+            # mdr.GS1cSpect = zeros((SS, PN, SNOT), dtype=float64)
+            # mdr.GS1cSpect[0:num_ch,:,:] = GS1cSpect[0:num_ch,:,:] / 10.**rad_sfs[:, newaxis, newaxis]
+            # With this, instead, you have only the real data
+            return GS1cSpect[:, :, 0:num_ch] / 10.0**rad_sfs * 1e5  # W/(m² sr m^-1) -> mW/m2/sr/cm-1
+
+        return super().decode(name)
+
+    @classmethod
+    def avhrr_quality(cls, mdrs: list['MDR']) -> tuple[np.ndarray, np.ndarray]:
+        """
+        GEUMAvhrr1BQual of many MDRs decoded at once, see `read_avhrr_quality`
+
+        Returns:
+            The flag and value arrays, of shape (n_mdr, SNOT, PN)
+        """
+        return read_avhrr_quality(cls.gather(mdrs, 'GEUMAvhrr1BQual'))
+
+    @classmethod
+    def stack(cls, mdrs: list['MDR'], name: str):
+        if name != 'GS1cSpect':
+            return super().stack(mdrs, name)
+
+        # the spectra are stacked only if all of them have the same channels
+        # and scale factors, which is the case for the MDRs of a file
+        channels = {(mdr.IDefNsfirst1b, mdr.IDefNslast1b, id(mdr._giadr_sf)) for mdr in mdrs}
+        if len(channels) != 1:
+            return super().stack(mdrs, name)
+
+        nsfirst, nslast, _ = channels.pop()
+        num_ch = nslast - nsfirst + 1
+        rad_sfs = radiance_scale_factors(mdrs[0]._giadr_sf, nsfirst, nslast)
+
+        data = cls.gather(mdrs, 'GS1cSpect')[:, :, :, 0:num_ch]
+        GS1cSpect = decode_field(data, data.shape, i2, squeeze=False)
+        return GS1cSpect / 10.0**rad_sfs * 1e5  # W/(m² sr m^-1) -> mW/m2/sr/cm-1
 
     def get_times(self):
         from datetime import datetime, timedelta
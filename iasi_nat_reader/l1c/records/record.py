@@ -26,14 +26,18 @@ Modifications made by ronglian zhou <961836102@qq.com> on <2024/10/17>:
 from typing import IO
 
 from ...generic.record import BaseRecord
-from ...generic.record_content import interpreted_content, uninterpreted_content
+from ...generic.record_content import interpreted_content, uninterpreted_content, mapped_content
 from ...generic.grh import GRH
 from ...generic.mphr import MPHR
 from .giadr import GIADR_quality, GIADR_scale_factors
 
 
 class Record(BaseRecord):
-    def __init__(self, grh: GRH, content: interpreted_content | uninterpreted_content):
+    def __init__(
+        self,
+        grh: GRH,
+        content: interpreted_content | uninterpreted_content | mapped_content,
+    ):
         super().__init__(grh, content)
 
     @classmethod
@@ -46,7 +50,8 @@ class Record(BaseRecord):
         the mdr records which require a GIADR scalefactor record)
 
         Args:
-            -*f*: A file descriptor
+            -*f*: A file descriptor, or a memory mapped file (see `map_file`)
+            in which case the content of the record is not copied
 
         Returns:
             A Record object
@@ -61,9 +66,7 @@ class Record(BaseRecord):
             elif grh.record_subclass == 1:
                 content = GIADR_scale_factors.read(f, grh)
             else:
-                data = f.read(grh.record_size - GRH.size)
-                content = uninterpreted_content(data)
+                content = cls.read_content(f, grh)
         else:
-            data = f.read(grh.record_size - GRH.size)
-            content = uninterpreted_content(data)
+            content = cls.read_content(f, grh)
         return cls(grh, content)
@@ -20,11 +20,15 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 Modifications made by ronglian zhou <961836102@qq.com> on <2024/10/17>:
 - Moved `read_vint` and  `read_short_date` functions to read.py in generic package.
 - Added `read_bitfield` function.
+- Added `read_avhrr_quality`, a vectorized decoder of GEUMAvhrr1BQual.
+- Added vectorized decoders of GEPSOPSProcessingMode, GEPSIdConf and
+  GQisFlagQualDetailed, unpacking every flag bit in a boolean array.
 """
 
 from __future__ import division
 
 from struct import unpack
+import numpy as np
 from numpy import meshgrid, argmax, max
 
 
@@ -150,3 +154,150 @@ def read_bitfield(raw_data, name):
             # Keep the last seven bits and the rest are 0
             fraction_covered_with_snow_ice = byte & 0x7F
             return ['good', fraction_covered_with_snow_ice]
+
+
+def read_avhrr_quality(raw_data: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Decode GEUMAvhrr1BQual bytes of any shape at once, e.g. (SNOT, PN) for a
+    MDR or (n_mdr, SNOT, PN) for a whole file. It is the vectorized version
+    of `read_bitfield(raw_data, 'GEUMAvhrr1BQual')`.
+
+    Returns:
+        - *flag*: a uint8 array with bit 7 of every byte: 1 if the value is
+          the number of missing or bad AVHRR pixels, 0 if it is the
+          percentage of the IASI pixel covered with snow or ice
+        - *value*: a uint8 array with the other seven bits
+    """
+    raw_data = np.asarray(raw_data, dtype=np.uint8)
+    return raw_data >> 7, raw_data & 0x7F
+
+
+def avhrr_quality_list(raw_data: np.ndarray) -> list[list]:
+    """
+    GEUMAvhrr1BQual as a list of ['good' | 'missing', value] pairs, as
+    returned by `read_bitfield` for every byte
+    """
+    flag, value = read_avhrr_quality(raw_data)
+    return [
+        ['missing' if f else 'good', v]
+        for f, v in zip(flag.ravel().tolist(), value.ravel().tolist())
+    ]
+
+
+# position of the flag bits of the bitfields, the same as in `read_bitfield`
+OPS_PROCESSING_MODE_BITS = {
+    'instrument_mode': 2,
+    'debug_mode': 3,
+    'interface_mode': 4,
+    'target_type': 5,
+}
+
+ID_CONF_BITS = {
+    'normal_processing': 0,
+    'backlog_processing': 1,
+    're_processing': 2,
+    'parallel_validation': 3,
+    'in_plane_manoeuvre': 4,
+    'GOPSFlaPixMiss': 5,
+    'GOPSFlaDataGap': 6,
+    'GOPSFltIsrfemOff': 7,
+    'GOPSFltBandMiss': 8,
+    'GOPSFltBBTMiss': 9,
+    'GOPSFltImgEWMiss': 10,
+    'GOPSFltImgBBMiss': 11,
+    'GOPSFltImgCSMiss': 12,
+    'GOPSFlagPacketVPMiss': 13,
+    'GOPSFlagPacketAPMiss': 14,
+    'GOPSFlagPacketPXMiss': 15,
+    'GOPSFlagPacketIPMiss': 16,
+}
+
+FLAG_QUAL_DETAILED_BITS = {
+    'hardware': 15,
+    'band1_spikes': 14,
+    'band2_spikes': 13,
+    'band3_spikes': 12,
+    'nzpd_complex_error': 11,
+    'onboard_quality_flag': 10,
+    'overflow_underflow': 9,
+    'spectral_calibration_error': 8,
+    'radiometric_post_calibration_error': 7,
+    'gqis_flag_qual_summary': 6,
+    'missing_sounder_data': 5,
+    'missing_iis_data': 4,
+    'missing_avhrr_data': 3,
+}
+
+
+def unpack_bits(data: np.ndarray, bits: dict[str, int]) -> dict[str, np.ndarray]:
+    """
+    Unpack the flag bits of an array of unsigned integers
+
+    Args:
+        - *data*: the array of integers
+        - *bits*: the position of every flag, 0 being the least significant bit
+
+    Returns:
+        A dict with a boolean array of the same shape of data for every flag
+    """
+    return {name: ((data >> bit) & 1).astype(bool) for name, bit in bits.items()}
+
+
+def _bytes_as(raw_data: np.ndarray, start: int, stop: int, dtype: str) -> np.ndarray:
+    # the bytes [start:stop] of the last axis of raw_data read as one integer
+    return np.ascontiguousarray(raw_data[..., start:stop]).view(dtype)[..., 0]
+
+
+def read_ops_processing_mode(raw_data: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Decode GEPSOPSProcessingMode of many MDRs at once, the vectorized version
+    of `read_bitfield(raw_data, 'GEPSOPSProcessingMode')`.
+
+    Args:
+        - *raw_data*: the raw bytes, an uint8 array of shape (..., 4)
+
+    Returns:
+        A dict with the processing `level` (uint8) and a boolean array for
+        every flag, all of shape raw_data.shape[:-1]
+    """
+    first = np.asarray(raw_data, dtype=np.uint8)[..., 0]
+    output = {'level': first & 0x03}
+    output.update(unpack_bits(first, OPS_PROCESSING_MODE_BITS))
+    return output
+
+
+def read_id_conf(raw_data: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Decode GEPSIdConf of many MDRs at once, the vectorized version of
+    `read_bitfield(raw_data, 'GEPSIdConf')`.
+
+    Args:
+        - *raw_data*: the raw bytes, an uint8 array of shape (..., 32)
+
+    Returns:
+        A dict with `ptsi` and `idef_id_conf` (uint32) and a boolean array for
+        every flag, all of shape raw_data.shape[:-1]
+    """
+    raw_data = np.asarray(raw_data, dtype=np.uint8)
+    output = {
+        'ptsi': _bytes_as(raw_data, 0, 4, '>u4').astype(np.uint32),
+        'idef_id_conf': _bytes_as(raw_data, 4, 8, '>u4').astype(np.uint32),
+    }
+    output.update(unpack_bits(_bytes_as(raw_data, 8, 16, '>u8'), ID_CONF_BITS))
+    return output
+
+
+def read_flag_qual_detailed(raw_data: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Decode GQisFlagQualDetailed of many pixels at once, the vectorized
+    version of `read_bitfield(raw_data, 'GQisFlagQualDetailed')`.
+
+    Args:
+        - *raw_data*: the raw 2-bytes integers (not converted to float), e.g.
+          an array of shape (n_mdr, SNOT, PN)
+
+    Returns:
+        A dict with a boolean array of the same shape of raw_data for every flag
+    """
+    raw_data = np.asarray(raw_data).astype('>i2', copy=False)
+    return unpack_bits(raw_data.view('>u2'), FLAG_QUAL_DETAILED_BITS)
@@ -23,13 +23,22 @@ New features made by ronglian zhou <961836102@qq.com> on <2024/10/17>:
 
 from __future__ import print_function, division
 import gc
+import logging
+from contextlib import nullcontext
+from typing import Iterator
+import os
 import numpy as np
 from os.path import getsize
 from datetime import datetime, timedelta
 
 from ..generic.mphr import MPHR
+from ..generic.index_cache import IndexCache
+from ..generic.record import map_file, read_header_records, scan_records, select_records
+from ..generic.spatial_index import SpatialIndex
 from .records import *
 
+logger = logging.getLogger(__name__)
+
 
 class MphrNotFoundException(Exception):
     """A error that happens if the file do not has a MPHR"""
@@ -57,41 +66,52 @@ class TooSmallThresholdException(ValueError):
 
 
 class NativeFile:
-    def __init__(self, filename, mdr_record_idx: int | list | slice = None):
+    def __init__(
+        self,
+        filename,
+        mdr_record_idx: int | list | slice = None,
+        mmap: bool = False,
+        index_cache: 'str | os.PathLike | IndexCache' = None,
+        workers: int = None,
+    ):
+        """
+        Args:
+            - *filename*: the path of the native file
+            - *mdr_record_idx*: read only the MDRs with this index (or indices)
+            - *mmap*: if True, the file is memory mapped instead of being read
+              in memory. The records keep views over the mapping and the
+              fields that need no conversion are returned as read only views,
+              so only the parts of the file that are accessed are loaded.
+            - *index_cache*: an IndexCache (or the directory of one) where
+              the record index of the file is saved, so that opening the
+              same file again does not need to walk all its records.
+            - *workers*: if given, all the fields of the MDRs are decoded when
+              the file is opened, by this many threads, instead of being
+              decoded on first access.
+        """
         self.__fn = filename
         self.__record_list: list[Record] = []
         self.__size = getsize(filename)
         self.__data_read = False
+        self.__mmap = None
+        self.__workers = workers
+        self.__spatial_index = None
 
-        # Read content from the file
-        bytes_read = 0
+        # Locate the records reading only their grh, then read just the
+        # records that have been selected
         with open(filename, 'rb') as iasi_file:
-            while bytes_read < self.__size:
-                rcd = Record.read(iasi_file)
-                self.__record_list.append(rcd)
-                bytes_read += rcd.size
-
-        if mdr_record_idx is not None:
-            i = 0
-            while True:
-                if self.__record_list[i].type == 'MDR':
-                    break
-                i += 1
-            header = self.__record_list[:i]
-            main = self.__record_list[i:]
-
-            if isinstance(mdr_record_idx, int):
-                main = [main[mdr_record_idx]]
-            elif isinstance(mdr_record_idx, list):
-                main = [
-                    element
-                    for index, element in enumerate(main)
-                    if index in mdr_record_idx
-                ]
-            elif isinstance(mdr_record_idx, slice):
-                rng = range(mdr_record_idx.start, mdr_record_idx.stop)
-                main = [element for index, element in enumerate(main) if index in rng]
-            self.__record_list = [*header, *main]
+            if mmap:
+                self.__mmap = map_file(iasi_file)
+            source = self.__mmap if mmap else iasi_file
+            if index_cache is None:
+                self.__index = scan_records(source, self.__size)
+            else:
+                if not isinstance(index_cache, IndexCache):
+                    index_cache = IndexCache(index_cache)
+                self.__index = index_cache.get_index(source, filename, self.__size)
+            for pos in select_records(self.__index, mdr_record_idx):
+                source.seek(int(self.__index['offset'][pos]))
+                self.__record_list.append(Record.read(source))
 
         self.read_mdrs()
 
@@ -105,6 +125,14 @@ class NativeFile:
         self.__record_list = None
         self.mdrs = None
         gc.collect()
+        if self.__mmap is not None:
+            try:
+                self.__mmap.close()
+            except BufferError:
+                # some arrays read from the file are still alive: the mapping
+                # is released when they are garbage collected
+                pass
+            self.__mmap = None
 
     @property
     def size(self):
@@ -113,6 +141,15 @@ class NativeFile:
         """
         return self.__size
 
+    @property
+    def record_index(self) -> np.ndarray:
+        """
+        The index of all the records saved in the file (not only the selected
+        ones): a numpy structured array with the offset of every record and
+        the fields of its grh
+        """
+        return self.__index
+
     @property
     def n_of_records(self):
         """
@@ -161,6 +198,34 @@ class NativeFile:
             raise GiadrNotFoundException
         return giadr_records[0].content
 
+    @staticmethod
+    def read_mphr(filename: os.PathLike) -> MPHR:
+        """
+        Read only the MPHR of a file (its first record), without locating or
+        reading the other records, e.g. to sweep the metadata of many files
+        """
+        with open(filename, 'rb') as f:
+            record = Record.read(f)
+        if record.type != 'MPHR':
+            raise MphrNotFoundException
+        return record.content
+
+    @staticmethod
+    def read_headers(filename: os.PathLike) -> tuple[MPHR, GIADR]:
+        """
+        Read only the records of a file before its first MDR, and return its
+        MPHR and its GIADR
+        """
+        with open(filename, 'rb') as f:
+            records = read_header_records(f, Record.read)
+        mphr = next((rcd.content for rcd in records if rcd.type == 'MPHR'), None)
+        giadr = next((rcd.content for rcd in records if rcd.type == 'GIADR'), None)
+        if mphr is None:
+            raise MphrNotFoundException
+        if giadr is None:
+            raise GiadrNotFoundException
+        return mphr, giadr
+
     def get_mdrs(self) -> list[MDR]:
         """
         Return a list of all the records of mdr type
@@ -170,11 +235,21 @@ class NativeFile:
         """
         return [r.content for r in self.__record_list if r.type == "MDR"]
 
-    def read_mdrs(self, idx: int | slice = None):
+    def read(self, fields: list[str]) -> dict[str, np.ndarray]:
+        """
+        Decode only the given fields of the L2 MDRs, each into one array of
+        shape (n_mdr, ...), e.g. (n_mdr, 120, 2) for EARTH_LOCATION (lat,
+        lon). The error data, whose shape depends on the number of
+        retrievals with errors (NERR) of every MDR, are given as a list of
+        the values of every MDR.
+        """
+        return {name: MDR.stack(self.mdrs, name) for name in fields}
+
+    def read_mdrs(self, idx: int | slice = None, workers: int = None):
         mdr_record_positions = [
             i for i in range(self.n_of_records) if self.__record_list[i].type == 'MDR'
         ]
-        firstpos = mdr_record_positions[0]
+        firstpos = mdr_record_positions[0] if mdr_record_positions else 0
         giadr = self.get_giadr()
         if idx is not None:
             if isinstance(idx, int):
@@ -182,35 +257,184 @@ class NativeFile:
             elif isinstance(idx, slice):
                 mdr_record_positions = mdr_record_positions[idx]
         for i in mdr_record_positions:
-            print(f'mdr pos {i-firstpos:03d} (rel) {i:03d} (abs)', end='\r')
+            logger.debug('mdr pos %03d (rel) %03d (abs)', i - firstpos, i)
             mdr_record = self.__record_list[i]
-            if (
-                mdr_record.grh.record_subclass_version != 4
-                or mdr_record.grh.record_size <= 207747
+            if not self.__valid_mdr(
+                mdr_record.grh.record_subclass_version, mdr_record.grh.record_size
             ):
                 mdr_record.grh._GRH__record_class = 9
-                print(
-                    'anormal mdr at {} (rel) {} (abs) : sub class version = {}, record size = {}\nfilename = {}'.format(
-                        i - firstpos,
-                        i,
-                        mdr_record.grh.record_subclass_version,
-                        mdr_record.grh.record_size,
-                        self.__fn,
-                    )
+                logger.warning(
+                    'anormal mdr at %d (rel) %d (abs) : sub class version = %d, record size = %d'
+                    ', filename = %s',
+                    i - firstpos,
+                    i,
+                    mdr_record.grh.record_subclass_version,
+                    mdr_record.grh.record_size,
+                    self.__fn,
                 )
                 new_content = 'bad'
             else:
                 new_content = MDR.read(mdr_record, giadr)
             self.__record_list[i] = Record(mdr_record.grh, new_content)
-        print()
         self.__data_read = True
         self.mdrs: list[MDR] = [
             r.content for r in self.__record_list if r.type == "MDR"
         ]
 
+        if workers is None:
+            workers = self.__workers
+        if workers:
+            MDR.decode_contents(self.mdrs, workers)
+
     def __iter__(self):
         return self.__record_list.__iter__()
 
+    @staticmethod
+    def __valid_mdr(version: int, size: int) -> bool:
+        """
+        Whether a MDR with this subclass version and record size can be read
+        """
+        return version == 4 and size > 207747
+
+    @property
+    def mdr_index(self) -> np.ndarray:
+        """
+        The entries of the record index (see `record_index`) of the valid MDRs
+        of the file, in the order in which `iter_mdrs` reads them
+        """
+        index = self.__index
+        return index[self.valid_mdrs(index)]
+
+    @classmethod
+    def valid_mdrs(cls, index: np.ndarray) -> np.ndarray:
+        """
+        Whether the entries of a record index (see `record_index`) are valid
+        MDRs, as a boolean array
+        """
+        return np.array(
+            [
+                rcd['record_class'] == 8
+                and cls.__valid_mdr(rcd['record_subclass_version'], rcd['record_size'])
+                for rcd in index
+            ],
+            dtype=bool,
+        )
+
+    def lazy_mdrs(self, mdrs: slice | list = None) -> list[MDR]:
+        """
+        The valid MDRs of the file (see `mdr_index`), or the ones at the
+        positions mdrs, read without decoding any field: their fields are
+        decoded when they are accessed, and the shape of a field in a MDR is
+        `mdr.layout.fields[name][0]`. The records are only mapped, not
+        copied, when the file is memory mapped.
+        """
+        offsets = self.mdr_index['offset']
+        if mdrs is not None:
+            offsets = offsets[mdrs]
+        giadr = self.get_giadr()
+        mdr_class = MDR
+        records = []
+        with nullcontext(self.__mmap) if self.__mmap else open(self.__fn, 'rb') as source:
+            for offset in offsets:
+                source.seek(int(offset))
+                records.append(mdr_class.read(Record.read(source), giadr))
+        return records
+
+    def iter_mdrs(
+        self, batch: int = 1, fields: list[str] = None, mdrs: slice | list = None
+    ) -> Iterator[dict[str, np.ndarray]]:
+        """
+        Read the valid MDRs of the file batch by batch, and yield the fields
+        of every batch as a dict of arrays of shape (n, ...), with n <= batch
+        (see `read`). A batch is read from the file only when it is reached
+        and nothing is kept once it has been yielded, so the memory in use
+        does not grow with the size of the file.
+
+        All the MDRs of the file are read (unless mdrs is given), not only the
+        ones selected when it was opened: open it with mdr_record_idx=[] to
+        read just its headers.
+
+        Args:
+            - *batch*: the number of MDRs of every batch
+            - *fields*: the names of the fields to decode (all of them if None)
+            - *mdrs*: the positions of the MDRs to read among the valid MDRs
+              (see `mdr_index`), all of them if None
+
+        Example:
+            >>> with NativeFile(filename, mdr_record_idx=[]) as native:
+            ...     for bundle in native.iter_mdrs(batch=10, fields=['EARTH_LOCATION']):
+            ...         process(bundle['EARTH_LOCATION'])  # (10, 120, 2)
+        """
+        if batch < 1:
+            raise ValueError(f'batch must be a positive integer, not {batch}')
+        offsets = self.mdr_index['offset']
+        if mdrs is not None:
+            offsets = offsets[mdrs]
+        giadr = self.get_giadr()
+        mdr_class = MDR
+
+        with nullcontext(self.__mmap) if self.__mmap else open(self.__fn, 'rb') as source:
+            for start in range(0, len(offsets), batch):
+                records = []
+                for offset in offsets[start : start + batch]:
+                    source.seek(int(offset))
+                    records.append(mdr_class.read(Record.read(source), giadr))
+                bundle = self.__stack_fields(mdr_class, records, fields)
+                del records
+                yield bundle
+                del bundle
+
+    def iter_scanlines(self, fields: list[str] = None) -> Iterator[dict[str, np.ndarray]]:
+        """
+        Yield the fields of the MDRs of the file one scan line (i.e. one MDR)
+        at a time, as a dict of arrays without the MDR axis, e.g. (120, 2)
+        for EARTH_LOCATION (see `iter_mdrs`)
+        """
+        for bundle in self.iter_mdrs(1, fields):
+            yield {name: values[0] for name, values in bundle.items()}
+
+    @staticmethod
+    def __stack_fields(mdr_class: type, mdrs: list, fields: list[str] = None) -> dict:
+        if fields is None:
+            fields = [name for name in mdr_class.fields if name in mdrs[0].layout.fields]
+        return {name: mdr_class.stack(mdrs, name) for name in fields}
+
+    @property
+    def spatial_index(self) -> SpatialIndex:
+        """
+        The spatial index of the FOVs of all the valid MDRs of the file (see
+        `mdr_index`), built from EARTH_LOCATION when it is first used
+        """
+        if self.__spatial_index is None:
+            bundles = self.iter_mdrs(100, ['EARTH_LOCATION'])
+            location = [bundle['EARTH_LOCATION'] for bundle in bundles]
+            location = np.concatenate(location) if location else np.empty((0, 1, 2))
+            location = location.reshape(len(location), -1, 2)
+            self.__spatial_index = SpatialIndex(location[..., 1], location[..., 0])
+        return self.__spatial_index
+
+    def select_region(
+        self, bbox: tuple = None, center: tuple = None, radius: float = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Select the FOVs of a region with the spatial index of the file,
+        without comparing the location of all the FOVs: either a box
+        (lon_min, lat_min, lon_max, lat_max) in degrees, which crosses the
+        antimeridian if lon_min > lon_max, or the FOVs at most radius km
+        from a center (lon, lat).
+
+        Returns:
+            The positions of the MDRs of the FOVs among the valid MDRs (see
+            `mdr_index`), and the positions of the FOVs in their MDR (0 to
+            119), so that only the MDRs of the region are then decoded
+
+        Example:
+            >>> mdr, fov = native.select_region(center=(2.35, 48.85), radius=100)
+            >>> for bundle in native.iter_mdrs(10, ['SURFACE_TEMPERATURE'], mdrs=np.unique(mdr)):
+            ...     process(bundle['SURFACE_TEMPERATURE'])
+        """
+        return self.spatial_index.select(bbox, center, radius)
+
     def get_dgd_flag(self):
         dgd_inst_flag = np.array(
             [mdr.DEGRADED_INST_MDR for mdr in self.mdrs], dtype=np.uint8
@@ -24,7 +24,6 @@ New features made by ronglian zhou <961836102@qq.com> on <2024/10/17>:
 from typing import IO
 
 from ...generic.record import BaseRecord
-from ...generic.record_content import uninterpreted_content
 from ...generic.grh import GRH
 from ...generic.mphr import MPHR
 from .giadr import GIADR
@@ -44,7 +43,8 @@ class Record(BaseRecord):
         the mdr records which require a GIADR scalefactor record)
 
         Args:
-            -*f*: A file descriptor
+            -*f*: A file descriptor, or a memory mapped file (see `map_file`)
+            in which case the content of the record is not copied
 
         Returns:
             A Record object
@@ -56,9 +56,7 @@ class Record(BaseRecord):
             if grh.record_subclass == 1:
                 content = GIADR.read(f, grh)
             else:
-                data = f.read(grh.record_size - GRH.size)
-                content = uninterpreted_content(data)
+                content = cls.read_content(f, grh)
         else:
-            data = f.read(grh.record_size - GRH.size)
-            content = uninterpreted_content(data)
+            content = cls.read_content(f, grh)
         return cls(grh, content)
@@ -0,0 +1,169 @@
+"""
+iasi_nat_reader: An enhanced library to read IASI L1C, L2, and PCC files
+Copyright (C) 2024 Ronglian Zhou
+
+This library is free software; you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License as published by the Free Software Foundation; either
+version 3.0 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+
+Cache of the eigenvector bases of the PC products, loaded once per process
+and optionally shared between processes through memory mapped files
+"""
+
+import os
+from contextlib import nullcontext
+from hashlib import sha1
+from importlib.resources import files
+from threading import Lock
+import numpy as np
+from h5py import File
+
+EIG_FILES = [f'IASI_EV{i}_xx_Mxx' for i in range(1, 4)]
+EIG_DATASETS = ('Eigenvalues', 'Eigenvectors', 'Mean', 'Nedr')
+
+# (paths, dtype) -> (modification stamp of the files, basis)
+_eigenbases: dict[tuple, tuple] = {}
+_eigenbases_lock = Lock()
+
+
+def eig_filenames(eig_dir: os.PathLike | None = None) -> list:
+    """
+    The eigenvector files of the three bands: their paths in eig_dir, or the
+    resources of the `data` directory of the package if eig_dir is None,
+    found through importlib.resources (so that they can be read even if the
+    package is installed in a zip file)
+    """
+    if eig_dir is None:
+        data = files('iasi_nat_reader') / 'data'
+        return [data / name for name in EIG_FILES]
+    return [os.path.abspath(os.path.join(eig_dir, name)) for name in EIG_FILES]
+
+
+def file_stamp(filename) -> tuple:
+    """
+    The path, the size and the modification time of an eigenvector file, or
+    only its name for a resource which is not a file of the file system
+    """
+    try:
+        stat = os.stat(filename)
+    except TypeError:
+        return (str(filename),)
+    return (os.fspath(filename), stat.st_size, stat.st_mtime_ns)
+
+
+def read_eigenbasis(filenames: list, dtype: np.dtype) -> dict[str, list[np.ndarray]]:
+    """
+    Read the datasets of the eigenvector files (paths or resources, see
+    `eig_filenames`), converted to dtype
+    """
+    basis = {name: [] for name in EIG_DATASETS}
+    for fn in filenames:
+        path = isinstance(fn, (str, os.PathLike))
+        with nullcontext(fn) if path else fn.open('rb') as source, File(source, 'r') as f:
+            for name in EIG_DATASETS:
+                basis[name].append(f[name][:].astype(dtype))
+    return basis
+
+
+def map_eigenbasis(
+    filenames: list, dtype: np.dtype, stamp: tuple, cache_dir: os.PathLike
+) -> dict[str, list[np.ndarray]]:
+    """
+    Return the datasets of the eigenvector files as read only memory mapped
+    .npy files of cache_dir, which are written first if they do not exist.
+    All the processes mapping the same files share the same memory. The .npy
+    files are named after the eigenvector files and dtype, then after the
+    stamp of the files: the ones of the previous stamps are removed when the
+    eigenvector files have been modified.
+    """
+    source = sha1(repr(([str(fn) for fn in filenames], dtype.str)).encode()).hexdigest()[:20]
+    prefix = f'{source}_{sha1(repr(stamp).encode()).hexdigest()[:20]}_'
+    paths = {
+        name: [
+            os.path.join(cache_dir, f'{prefix}{name}{band}.npy') for band in range(len(filenames))
+        ]
+        for name in EIG_DATASETS
+    }
+    if not all(os.path.exists(path) for band_paths in paths.values() for path in band_paths):
+        os.makedirs(cache_dir, exist_ok=True)
+        basis = read_eigenbasis(filenames, dtype)
+        for name, band_paths in paths.items():
+            for path, array in zip(band_paths, basis[name]):
+                tmp = f'{path}.{os.getpid()}.tmp'
+                with open(tmp, 'wb') as f:
+                    np.save(f, array, allow_pickle=False)
+                os.replace(tmp, path)
+        for entry in os.listdir(cache_dir):
+            if entry.startswith(f'{source}_') and not entry.startswith(prefix):
+                try:
+                    os.remove(os.path.join(cache_dir, entry))
+                except OSError:
+                    # e.g. still mapped by another process on Windows
+                    pass
+    return {
+        name: [np.load(path, mmap_mode='r') for path in band_paths]
+        for name, band_paths in paths.items()
+    }
+
+
+def load_eigenbasis(
+    eig_dir: os.PathLike | None = None,
+    dtype: np.dtype = np.float64,
+    cache_dir: os.PathLike | None = None,
+) -> dict[str, list[np.ndarray]]:
+    """
+    Return the eigenvalues, the eigenvectors, the mean and the NEdR of the
+    three bands, as a dict with a list of read only arrays (one per band) for
+    every dataset. The files are read once per process for every eig_dir and
+    dtype, and read again only if they have been modified.
+
+    Args:
+        - *eig_dir*: the directory of the IASI_EV{1,2,3}_xx_Mxx files (the
+          `data` directory of the package if None)
+        - *dtype*: the dtype of the arrays
+        - *cache_dir*: if given, the arrays are saved in this directory and
+          memory mapped, so that the processes (e.g. the workers of a pool)
+          using the same directory hold only one copy of them
+    """
+    dtype = np.dtype(dtype)
+    filenames = eig_filenames(eig_dir)
+    stamp = tuple(file_stamp(fn) for fn in filenames)
+    key = (
+        tuple(str(fn) for fn in filenames),
+        dtype.str,
+        None if cache_dir is None else os.fspath(cache_dir),
+    )
+
+    with _eigenbases_lock:
+        cached = _eigenbases.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        if cache_dir is None:
+            basis = read_eigenbasis(filenames, dtype)
+            for arrays in basis.values():
+                for array in arrays:
+                    array.flags.writeable = False
+        else:
+            basis = map_eigenbasis(filenames, dtype, stamp, cache_dir)
+        _eigenbases[key] = (stamp, basis)
+    return basis
+
+
+def clear_eigenbasis_cache() -> None:
+    """
+    Forget the bases loaded by this process
+    """
+    with _eigenbases_lock:
+        _eigenbases.clear()
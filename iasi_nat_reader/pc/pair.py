@@ -0,0 +1,249 @@
+"""
+iasi_nat_reader: An enhanced library to read IASI L1C, L2, and PCC files
+Copyright (C) 2024 Ronglian Zhou
+
+This library is free software; you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License as published by the Free Software Foundation; either
+version 3.0 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+
+Read the PCS and the PCR files of a granule together, to get the L1C
+radiances (reconstructed spectra plus residuals) scan line by scan line
+"""
+
+import os
+from glob import glob, escape
+from typing import Iterator
+import numpy as np
+
+from ..generic.parameters import SNOT, PN
+from .native_file import NativeFile
+from .pcc import PCC
+
+SCORE_FIELDS = [[f'PcScoresB{band}P{part}' for part in (1, 2, 3)] for band in (1, 2, 3)]
+
+
+def find_pcr(pcs_filename: os.PathLike) -> str:
+    """
+    Return the PCR file of the same granule as a PCS file: the file of the
+    same directory whose name is the one of the PCS file with PCR in place
+    of PCS, whatever its processing time
+    """
+    directory, name = os.path.split(os.fspath(pcs_filename))
+    name = name.replace('PCS', 'PCR', 1)
+    pcr_filename = os.path.join(directory, name)
+    if os.path.exists(pcr_filename):
+        return pcr_filename
+
+    # IASI_PCR_01_M01_<sensing start>_<sensing end>_<...>_<processing time>
+    granule = '_'.join(name.split('_')[:6])
+    matches = sorted(glob(os.path.join(escape(directory), escape(granule) + '_*')))
+    if len(matches) == 0:
+        raise FileNotFoundError(f'no PCR file found for {pcs_filename}')
+    return matches[-1]
+
+
+def mdr_times(native: NativeFile) -> np.ndarray:
+    """
+    The start times (in ms since 2000-01-01) of the valid MDRs of a file,
+    read from their GRH
+    """
+    index = native.mdr_index
+    return index['record_start_time_day'].astype(np.int64) * 86400000 + index[
+        'record_start_time_msec'
+    ].astype(np.int64)
+
+
+def match_times(pcs_times: np.ndarray, pcr_times: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The positions of the matched MDRs of a PCS and a PCR file, in the order
+    of the PCS file: the MDRs with the same start time, the k-th MDR of a
+    time in one file matching the k-th MDR of this time in the other one (a
+    time may be repeated, e.g. in a file holding a granule twice)
+    """
+
+    def occurrences(times: np.ndarray) -> np.ndarray:
+        # the number of previous MDRs with the same time
+        order = np.argsort(times, kind='stable')
+        first = np.searchsorted(times[order], times[order], side='left')
+        rank = np.empty(len(times), dtype=np.int64)
+        rank[order] = np.arange(len(times)) - first
+        return rank
+
+    pcs_rank, pcr_rank = occurrences(pcs_times), occurrences(pcr_times)
+    n = max(pcs_rank.max(initial=0), pcr_rank.max(initial=0)) + 1
+    _, pcs_pos, pcr_pos = np.intersect1d(
+        pcs_times * n + pcs_rank, pcr_times * n + pcr_rank, assume_unique=True, return_indices=True
+    )
+    order = np.argsort(pcs_pos)
+    return pcs_pos[order], pcr_pos[order]
+
+
+class PCPair:
+    """
+    The PCS and the PCR files of a granule, whose MDRs are matched by their
+    start time (see `match_times`). Only the headers are read when the files are opened: the
+    scores and the residuals are then read, and the radiances reconstructed,
+    a few scan lines at a time, so the scores, the residuals and the
+    radiances of the whole granule are never in memory together.
+
+    Args:
+        - *pcs_filename*: the path of the PCS file
+        - *pcr_filename*: the path of the PCR file (see `find_pcr` if None)
+        - *pcc*: the PCC used for the reconstruction (built from the GIADR
+          of the PCS file if None)
+        - *kwargs*: passed to both NativeFile (e.g. mmap or index_cache)
+
+    Example:
+        >>> with PCPair('path_to_iasi_pcs_file') as pair:
+        ...     for scan_line in pair.iter_scanlines(fields=['GGeoSondLoc']):
+        ...         rad = scan_line['radiances']  # (SNOT, PN, 8461)
+    """
+
+    def __init__(
+        self,
+        pcs_filename: os.PathLike,
+        pcr_filename: os.PathLike | None = None,
+        pcc: PCC | None = None,
+        **kwargs,
+    ) -> None:
+        if pcr_filename is None:
+            pcr_filename = find_pcr(pcs_filename)
+        kwargs['mdr_record_idx'] = []
+        self.pcs = NativeFile(os.fspath(pcs_filename), **kwargs)
+        self.pcr = NativeFile(os.fspath(pcr_filename), **kwargs)
+        if self.pcs.mdr_flag != 'PCS' or self.pcr.mdr_flag != 'PCR':
+            raise ValueError(f'{pcs_filename} and {pcr_filename} are not a PCS and a PCR file')
+        self.pcc = PCC(self.pcs.get_giadr()) if pcc is None else pcc
+
+        pcs_times = mdr_times(self.pcs)
+        # the positions of the matched MDRs among the valid MDRs of each file
+        self.__pcs_mdrs, self.__pcr_mdrs = match_times(pcs_times, mdr_times(self.pcr))
+        self.times = pcs_times[self.__pcs_mdrs]
+
+    def __enter__(self) -> 'PCPair':
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def close(self):
+        self.pcs.close()
+        self.pcr.close()
+
+    @property
+    def n_mdrs(self) -> int:
+        """
+        The number of MDRs found in both files
+        """
+        return len(self.times)
+
+    def __iter_matched(self, batch: int, fields: list[str]) -> Iterator[tuple[dict, dict]]:
+        """
+        Yield the fields of the matched MDRs of the two files (see
+        `NativeFile.iter_mdrs`), batch pairs at a time
+        """
+        if batch < 1:
+            raise ValueError(f'batch must be a positive integer, not {batch}')
+        pcs_fields = sum(SCORE_FIELDS, []) + list(fields)
+        yield from zip(
+            self.pcs.iter_mdrs(batch, pcs_fields, self.__pcs_mdrs),
+            self.pcr.iter_mdrs(batch, ['PccResidual'], self.__pcr_mdrs),
+        )
+
+    def iter_mdrs(
+        self,
+        batch: int = 1,
+        channels: np.ndarray | list | slice | None = None,
+        fields: list[str] = (),
+    ) -> Iterator[dict[str, np.ndarray]]:
+        """
+        Yield the radiances of the matched MDRs batch by batch, as a dict
+        with the radiances (reconstructed plus residuals) of shape
+        (n, SNOT, PN, n_channels), with n <= batch, and the other fields of
+        the PCS MDRs that are requested, as `NativeFile.iter_mdrs` yields
+        them (e.g. lists for the bit fields)
+
+        Args:
+            - *batch*: the number of MDRs of every batch
+            - *channels*: the channels to reconstruct (see `PCC.reconstruct`)
+            - *fields*: the names of other fields of the PCS MDRs
+        """
+        for pcs_bundle, pcr_bundle in self.__iter_matched(batch, fields):
+            scores, residual = self.__stack_bundles(pcs_bundle, pcr_bundle)
+            radiances = self.pcc.reconstruct(scores, residual, channels=channels)
+            bundle = {'radiances': radiances.reshape(-1, SNOT, PN, radiances.shape[-1])}
+            for name in fields:
+                bundle[name] = pcs_bundle[name]
+            yield bundle
+
+    def iter_scanlines(
+        self,
+        channels: np.ndarray | list | slice | None = None,
+        fields: list[str] = (),
+    ) -> Iterator[dict[str, np.ndarray]]:
+        """
+        Yield the radiances of the matched MDRs one scan line at a time, as
+        arrays of shape (SNOT, PN, n_channels) (see `iter_mdrs`)
+        """
+        for bundle in self.iter_mdrs(1, channels, fields):
+            yield {name: values[0] for name, values in bundle.items()}
+
+    def reconstruct(
+        self,
+        out: np.ndarray | os.PathLike | None = None,
+        dtype: np.dtype | None = None,
+        channels: np.ndarray | list | slice | None = None,
+        batch: int = 1,
+    ) -> np.ndarray:
+        """
+        Write the radiances of all the matched MDRs, batch MDRs at a time,
+        in an array of shape (n_mdrs * SNOT * PN, n_channels) (see
+        `PCC.reconstruct` for out and dtype)
+        """
+        n_channels = len(self.pcc.select_channels(slice(None) if channels is None else channels))
+        shape = (self.n_mdrs * SNOT * PN, n_channels)
+        if dtype is None:
+            dtype = self.pcc.dtype
+        if out is None:
+            out = np.empty(shape, dtype=dtype)
+        elif not isinstance(out, np.ndarray):
+            out = np.lib.format.open_memmap(os.fspath(out), mode='w+', dtype=dtype, shape=shape)
+        if out.shape != shape:
+            raise ValueError(f'the output must have shape {shape}, not {out.shape}')
+
+        start = 0
+        for pcs_bundle, pcr_bundle in self.__iter_matched(batch, ()):
+            scores, residual = self.__stack_bundles(pcs_bundle, pcr_bundle)
+            stop = start + len(residual)
+            self.pcc.reconstruct(scores, residual, out=out[start:stop], channels=channels)
+            start = stop
+
+        if isinstance(out, np.memmap):
+            out.flush()
+        return out
+
+    @staticmethod
+    def __stack_bundles(pcs_bundle: dict, pcr_bundle: dict) -> tuple[list, np.ndarray]:
+        """
+        The scores of every band, of shape (n_fov, n_scores), and the
+        residuals, of shape (n_fov, n_channels), of a batch of matched MDRs
+        """
+        scores = [
+            np.concatenate([pcs_bundle[name] for name in band_fields], axis=-1).reshape(
+                SNOT * PN * len(pcr_bundle['PccResidual']), -1
+            )
+            for band_fields in SCORE_FIELDS
+        ]
+        residual = pcr_bundle['PccResidual']
+        return scores, residual.reshape(-1, residual.shape[-1])
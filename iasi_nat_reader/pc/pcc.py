@@ -23,92 +23,352 @@ New features made by ronglian zhou <961836102@qq.com> on <2024/10/17>:
 Modifications made by ronglian zhou <961836102@qq.com> on <2024/10/18>:
 - Uploaded eigenvector files to `data` directory which are necessary
   for reading PC products (now only support products from MetOp B/C)
+- The radiances are reconstructed block by block of FOVs, with the
+  quantisation factors and the NEdR folded into the eigenvectors.
+- Added a float32 compute mode (dtype=np.float32) and its validation.
+- A subset of the channels can be reconstructed (channels=...).
+- The eigenvectors are loaded once per process (see `load_eigenbasis`).
+- Added `compress` to get the scores, the residuals and their RMS in one pass.
 """
 
 import os
-import sys
-from importlib.resources import path
-import traceback
 import numpy as np
-from h5py import File
 
 from .records.giadr import GIADR
+from .eigenbasis import load_eigenbasis
 
 class PCC:
-    def __init__(self, giadr: GIADR, eig_dir: os.PathLike | None = None) -> None:
+    """
+    Reconstruction of the radiances from the PC scores, and compression of
+    the radiances to PC scores, with the eigenvectors of the three bands.
+
+    Args:
+        - *giadr*: the GIADR of the PCS (or PCR) file
+        - *eig_dir*: the directory of the IASI_EV{1,2,3}_xx_Mxx files (the
+          ones shipped in the `data` directory if None)
+        - *dtype*: the dtype of the eigenvectors, of the mean and of the NEdR,
+          and of all the projections. np.float32 halves the memory in use and
+          speeds up the products: see `validate` for the difference it makes.
+        - *cache_dir*: a directory where the eigenvectors are saved and memory
+          mapped, so that all the processes using it share one copy of them
+          (see `load_eigenbasis`). The eigenvectors are always loaded only
+          once per process.
+    """
+
+    def __init__(
+        self,
+        giadr: GIADR,
+        eig_dir: os.PathLike | None = None,
+        dtype: np.dtype = np.float64,
+        cache_dir: os.PathLike | None = None,
+    ) -> None:
+        self.eig_dir = eig_dir
+        self.dtype = np.dtype(dtype)
+        self.cache_dir = cache_dir
         self.get_eig(eig_dir)
         self.giadr = giadr
         self.fc = self.giadr.FirstChannel
         self.sqf = self.giadr.ScoreQuantisationFactor
         self.rqf = self.giadr.ResidualQuantisationFactor
+        self.get_reconstruction_operator()
     
     def get_eig(self, eig_dir: os.PathLike | None):
-        # if eig_dir is None:
-        #     eig_dir = Path(__file__).joinpath('..','..').resolve().joinpath('data')
-        self.eig_val = []
-        self.eig_vec: list[np.ndarray] = []
-        mean = []
-        nedr = []
-        for i in range(1,4):
-            if eig_dir is None:
-                fn = path('iasi_nat_reader.data', f'IASI_EV{i}_xx_Mxx')
-            else:
-                fn = os.path.join(eig_dir, f'IASI_EV{i}_xx_Mxx')
-            f = File(fn)
-            self.eig_val.append(f['Eigenvalues'][:])
-            self.eig_vec.append(f['Eigenvectors'][:])
-            mean.append(f['Mean'][:])
-            nedr.append(f['Nedr'][:])
-        self.mean = np.concatenate(mean)
-        self.nedr = np.concatenate(nedr)
+        basis = load_eigenbasis(eig_dir, self.dtype, self.cache_dir)
+        self.eig_val = basis['Eigenvalues']
+        self.eig_vec: list[np.ndarray] = basis['Eigenvectors']
+        self.mean = np.concatenate(basis['Mean'])
+        self.nedr = np.concatenate(basis['Nedr'])
         
-    def reconstruct_frompcs(self, pcscores: list[np.ndarray]|np.ndarray):
+    def get_reconstruction_operator(self):
+        """
+        Fold the score quantisation factors, the NEdR and the 1e5 factor of the
+        radiances into one scale per channel, so that the radiances of band k
+        are `(scores[k] @ self.eig_vec[k]) * self.rec_scale[self.bands[k]] +
+        self.rec_mean[self.bands[k]]`. The eigenvectors are used as loaded,
+        so they stay shared between processes (see `load_eigenbasis`): only
+        vectors of n_channels values are built for every PCC.
+        """
+        bounds = np.cumsum([0] + [vec.shape[1] for vec in self.eig_vec])
+        self.bands = [slice(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:])]
+        self.rec_scale = np.concatenate(
+            [self.sqf[k] * self.nedr[band] * 1e5 for k, band in enumerate(self.bands)]
+        ).astype(self.dtype)
+        self.rec_mean = (self.mean * self.nedr * 1e5).astype(self.dtype)
+        self.res_scale = np.concatenate(
+            [self.rqf[k] * self.nedr[band] * 1e5 for k, band in enumerate(self.bands)]
+        ).astype(self.dtype)
+
+    def split_scores(self, pcscores: list[np.ndarray] | np.ndarray) -> list[np.ndarray]:
+        """
+        Return the scores of the three bands as arrays of shape (n_fov, n_scores)
+        """
         if isinstance(pcscores, np.ndarray):
-            assert pcscores.shape[-1] == 300
-            _pcscores = [pcscores[:,:90], pcscores[:,90:-90], pcscores[:,-90:]]
-        elif isinstance(pcscores, list):
-            _pcscores = pcscores
-        try:
-            rad_pc = self.mean + np.concatenate([
-                self.sqf[0] * (_pcscores[0] @ self.eig_vec[0]),
-                self.sqf[1] * (_pcscores[1] @ self.eig_vec[1]),
-                self.sqf[2] * (_pcscores[2] @ self.eig_vec[2]),
-            ], axis=-1)
-        except:
-            exc_type, exc_value, exc_traceback = sys.exc_info()
-            # to clear frames in Jupyter mode
-            traceback.clear_frames(exc_traceback)
-            # rad_pc = None
-            # gc.collect()
-            raise
-        rad_pc = self.nedr * rad_pc * 1e5
-        return rad_pc
-    
-    def reconstruct_add_residual_frompcr(self, pcscores: list[np.ndarray] | np.ndarray, residual: np.ndarray):
-        fc = self.fc
-        try:
-            rad_pc = self.reconstruct_frompcs(pcscores) - np.concatenate([
-                self.rqf[0] * residual[...,:fc[1]],
-                self.rqf[1] * residual[...,fc[1]:fc[2]],
-                self.rqf[2] * residual[...,fc[2]:],
-            ], axis=-1) * self.nedr * 1e5
-        except:
-            exc_type, exc_value, exc_traceback = sys.exc_info()
-            # to clear frames in Jupyter mode
-            traceback.clear_frames(exc_traceback)
-            # rad_pc = None
-            # gc.collect()
-            raise
-        return rad_pc
+            bounds = np.cumsum([0] + [vec.shape[0] for vec in self.eig_vec])
+            assert pcscores.shape[-1] == bounds[-1]
+            pcscores = [pcscores[..., a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+        return [np.reshape(scores, (-1, scores.shape[-1])) for scores in pcscores]
+
+    def get_channels(self) -> np.ndarray:
+        """
+        The wavenumbers (cm-1) of the channels, as `NativeFile.get_channels`
+        """
+        return np.linspace(645, 2760, self.bands[-1].stop)
+
+    def select_channels(self, channels: np.ndarray | list | slice) -> np.ndarray:
+        """
+        Return the sorted indices of a selection of channels
+
+        Args:
+            - *channels*: the indices of the channels (integers or a slice), or
+              wavenumber ranges in cm-1 as a list of (first, last) pairs, whose
+              ends are included (see `get_channels`)
+        """
+        n_channels = self.bands[-1].stop
+        if isinstance(channels, slice):
+            return np.arange(n_channels)[channels]
+
+        channels = np.asarray(channels)
+        if channels.ndim == 2:
+            wavenumbers = self.get_channels()
+            # the wavenumbers are multiples of 0.25 cm-1 up to rounding errors
+            tolerance = 1e-6
+            selected = np.zeros(n_channels, dtype=bool)
+            for first, last in channels:
+                selected |= (wavenumbers >= first - tolerance) & (wavenumbers <= last + tolerance)
+            return np.flatnonzero(selected)
+        if channels.dtype.kind not in 'iu':
+            raise TypeError(
+                'channels must be indices or a list of (first, last) wavenumber ranges'
+            )
+        return np.unique(np.arange(n_channels)[channels])
+
+    def reconstruct(
+        self,
+        pcscores: list[np.ndarray] | np.ndarray,
+        residual: np.ndarray | None = None,
+        out: np.ndarray | os.PathLike | None = None,
+        dtype: np.dtype | None = None,
+        block_size: int = 1024,
+        channels: np.ndarray | list | slice | None = None,
+    ) -> np.ndarray:
+        """
+        Reconstruct the radiances from the PC scores, and add the residuals
+        if they are given, block_size FOVs at a time. The scaling by the mean
+        and the NEdR is done in place on the block, so the only temporary
+        array has shape (block_size, n_channels) whatever the number of FOVs.
+
+        When only some channels are requested, only the columns of the
+        eigenvectors of those channels are used, so the cost of the products
+        scales with the number of channels.
+
+        Args:
+            - *pcscores*: the scores of all the bands (see `get_pcscores`), or
+              a list with the scores of every band
+            - *residual*: the residuals of the same FOVs (see `get_residual`)
+            - *out*: an array of shape (n_fov, n_channels) where the radiances
+              are written, or the path of a .npy file created and memory mapped
+              to hold them. A new array is allocated if None.
+            - *dtype*: the dtype of the output, when out is not an array (the
+              dtype of the PCC if None)
+            - *block_size*: the number of FOVs reconstructed at a time
+            - *channels*: the channels to reconstruct (all of them if None),
+              given as indices or wavenumber ranges (see `select_channels`)
+
+        Returns:
+            The radiances, of shape (n_fov, n_channels), with the channels
+            in increasing order
+        """
+        scores = self.split_scores(pcscores)
+        n_fov = len(scores[0])
+        n_channels = self.bands[-1].stop
+        if residual is not None:
+            residual = np.reshape(residual, (-1, n_channels))
+
+        if channels is None:
+            index = None
+            parts = list(zip(self.bands, self.eig_vec, scores))
+            rec_scale, rec_mean, res_scale = self.rec_scale, self.rec_mean, self.res_scale
+        else:
+            # the columns of the selected channels in every band
+            index = self.select_channels(channels)
+            parts = []
+            for band, vec, band_scores in zip(self.bands, self.eig_vec, scores):
+                first, last = np.searchsorted(index, [band.start, band.stop])
+                if last > first:
+                    columns = index[first:last] - band.start
+                    parts.append((slice(first, last), vec[:, columns], band_scores))
+            rec_scale = self.rec_scale[index]
+            rec_mean, res_scale = self.rec_mean[index], self.res_scale[index]
+
+        shape = (n_fov, len(rec_mean))
+        if dtype is None:
+            dtype = self.dtype
+        if out is None:
+            out = np.empty(shape, dtype=dtype)
+        elif not isinstance(out, np.ndarray):
+            out = np.lib.format.open_memmap(os.fspath(out), mode='w+', dtype=dtype, shape=shape)
+        if out.shape != shape:
+            raise ValueError(f'the output must have shape {shape}, not {out.shape}')
+
+        block = np.empty((min(block_size, n_fov), shape[1]), dtype=self.dtype)
+        if residual is not None:
+            scaled_residual = np.empty_like(block)
+        for start in range(0, n_fov, block_size):
+            stop = min(start + block_size, n_fov)
+            rad = block[: stop - start]
+            for columns, vec, band_scores in parts:
+                np.matmul(
+                    band_scores[start:stop].astype(self.dtype, copy=False),
+                    vec,
+                    out=rad[:, columns],
+                )
+            rad *= rec_scale
+            rad += rec_mean
+            if residual is not None:
+                block_residual = residual[start:stop]
+                if index is not None:
+                    block_residual = block_residual[:, index]
+                res = scaled_residual[: stop - start]
+                np.multiply(block_residual, res_scale, out=res)
+                rad -= res
+            out[start:stop] = rad
+
+        if isinstance(out, np.memmap):
+            out.flush()
+        return out
+
+    def validate(
+        self,
+        pcscores: list[np.ndarray] | np.ndarray,
+        residual: np.ndarray | None = None,
+        block_size: int = 1024,
+        channels: np.ndarray | list | slice | None = None,
+    ) -> float:
+        """
+        Reconstruct the radiances with the dtype of this PCC and in float64,
+        block_size FOVs at a time, and return the maximum absolute difference
+        between them (0 for a float64 PCC), over the FOVs with finite radiances
+        """
+        if self.dtype == np.float64:
+            return 0.0
+        reference = PCC(self.giadr, self.eig_dir, np.float64, self.cache_dir)
+        scores = self.split_scores(pcscores)
+        if residual is not None:
+            residual = np.reshape(residual, (-1, self.bands[-1].stop))
+
+        max_diff = 0.0
+        for start in range(0, len(scores[0]), block_size):
+            block_scores = [band_scores[start : start + block_size] for band_scores in scores]
+            block_residual = None if residual is None else residual[start : start + block_size]
+            rad = self.reconstruct(
+                block_scores, block_residual, block_size=block_size, channels=channels
+            )
+            rad64 = reference.reconstruct(
+                block_scores, block_residual, block_size=block_size, channels=channels
+            )
+            # the FOVs without scores (NaN) are left out
+            diff = np.abs(rad - rad64)
+            diff = diff[np.isfinite(diff)]
+            if diff.size:
+                max_diff = max(max_diff, float(diff.max()))
+        return max_diff
+
+    def reconstruct_frompcs(self, pcscores: list[np.ndarray]|np.ndarray, channels=None):
+        return self.reconstruct(pcscores, channels=channels)
+
+    def reconstruct_add_residual_frompcr(self, pcscores: list[np.ndarray] | np.ndarray, residual: np.ndarray, channels=None):
+        return self.reconstruct(pcscores, residual, channels=channels)
+
+    def compress(self, rad_l1c: np.ndarray, block_size: int = 1024) -> dict[str, np.ndarray]:
+        """
+        Compress L1C radiances in one pass, block_size FOVs at a time: the
+        normalised radiances of a block are projected on the eigenvectors to
+        get the scores, then reused with the reconstruction from the scores
+        to get the residuals, their RMS and their encoding. It gives the same
+        values as `compress_topcs`, `get_residual`, `get_rms` and
+        `encode_residual`, without normalising the radiances twice.
+
+        Args:
+            - *rad_l1c*: the radiances, of shape (..., n_channels), e.g.
+              (n_mdr, SNOT, PN, n_channels) for GS1cSpect
+            - *block_size*: the number of FOVs compressed at a time
+
+        Returns:
+            A dict with the scores of every band (a list of three int arrays of
+            shape (..., n_scores)), the residuals and the encoded residuals, of
+            shape (..., n_channels), and their RMS, of shape (..., 3)
+        """
+        lead = rad_l1c.shape[:-1]
+        n_channels = self.bands[-1].stop
+        rad_l1c = np.reshape(rad_l1c, (-1, n_channels))
+        n_fov = len(rad_l1c)
+        sqf = self.sqf.astype(self.dtype)
+        rqf = self.rqf.astype(self.dtype)
+
+        scores = [np.empty((n_fov, vec.shape[0]), dtype=int) for vec in self.eig_vec]
+        residual = np.empty((n_fov, n_channels), dtype=self.dtype)
+        encoded = np.empty((n_fov, n_channels), dtype=self.dtype)
+        residual_rms = np.empty((n_fov, len(self.bands)), dtype=self.dtype)
+
+        normalised = np.empty((min(block_size, n_fov), n_channels), dtype=self.dtype)
+        for start in range(0, n_fov, block_size):
+            stop = min(start + block_size, n_fov)
+            rad = normalised[: stop - start]
+            res = residual[start:stop]
+            np.multiply(rad_l1c[start:stop], 1e-5, out=rad, casting='same_kind')
+            rad /= self.nedr
+            # the centred radiances are kept in res until the scores are known
+            np.subtract(rad, self.mean, out=res)
+            for k, band in enumerate(self.bands):
+                band_scores = res[:, band] @ self.eig_vec[k].T
+                band_scores /= sqf[k]
+                scores[k][start:stop] = np.round(band_scores)
+            for k, band in enumerate(self.bands):
+                np.matmul(scores[k][start:stop].astype(self.dtype), self.eig_vec[k], out=res[:, band])
+                res[:, band] *= sqf[k]
+            # suppose that residual = Rrecon - R not R - Rrecon
+            res += self.mean
+            res -= rad
+            for k, band in enumerate(self.bands):
+                residual_rms[start:stop, k] = rms(res[:, band])
+                np.divide(res[:, band], rqf[k], out=encoded[start:stop, band])
+            np.round(encoded[start:stop], out=encoded[start:stop])
+        np.round(residual_rms, 3, out=residual_rms)
+
+        return {
+            'scores': [band_scores.reshape(lead + (-1,)) for band_scores in scores],
+            'residual': residual.reshape(lead + (n_channels,)),
+            'encoded_residual': encoded.reshape(lead + (n_channels,)),
+            'rms': residual_rms.reshape(lead + (len(self.bands),)),
+        }
+
+    def iter_compress(self, radiances, batch: int = 1, block_size: int = 1024):
+        """
+        Compress a stream of L1C radiances, yielding the result of `compress`
+        for every item of the stream
+
+        Args:
+            - *radiances*: a L1C NativeFile, whose radiances (GS1cSpect) are
+              read batch MDRs at a time (see `NativeFile.iter_mdrs`), or an
+              iterable of radiance arrays
+            - *batch*: the number of MDRs read at a time from a NativeFile
+            - *block_size*: the number of FOVs compressed at a time
+        """
+        if hasattr(radiances, 'iter_mdrs'):
+            radiances = (
+                bundle['GS1cSpect'] for bundle in radiances.iter_mdrs(batch, ['GS1cSpect'])
+            )
+        for rad_l1c in radiances:
+            yield self.compress(rad_l1c, block_size)
 
     def compress_topcs(self, rad_l1c: np.ndarray):
         fc = self.fc
         eig_vec = self.eig_vec
-        sqf = self.sqf
+        sqf = self.sqf.astype(self.dtype)
         mean = self.mean
         nedr = self.nedr
         
-        tmp = (rad_l1c*1e-5 / nedr - mean)
+        tmp = (rad_l1c.astype(self.dtype, copy=False)*1e-5 / nedr - mean)
         PcScoresB1 = np.round(tmp[...,:fc[1]] @ eig_vec[0].T / sqf[0]).astype(int)
         PcScoresB2 = np.round(tmp[...,fc[1]:fc[2]] @ eig_vec[1].T / sqf[1]).astype(int)
         PcScoresB3 = np.round(tmp[...,fc[2]:] @ eig_vec[2].T / sqf[2]).astype(int)
@@ -117,14 +377,15 @@ class PCC:
     def get_residual(self, rad_l1c: np.ndarray, PcScores: list):
         mean = self.mean
         nedr = self.nedr
-        sqf = self.sqf
+        sqf = self.sqf.astype(self.dtype)
         eig_vec = self.eig_vec
+        PcScores = [scores.astype(self.dtype, copy=False) for scores in PcScores]
         # suppose that residual = Rrecon - R not R - Rrecon
         residual = mean + np.concatenate([
             sqf[0] * (PcScores[0] @ eig_vec[0]),
             sqf[1] * (PcScores[1] @ eig_vec[1]),
             sqf[2] * (PcScores[2] @ eig_vec[2]),
-        ], axis=-1) - rad_l1c*1e-5 / nedr
+        ], axis=-1) - rad_l1c.astype(self.dtype, copy=False)*1e-5 / nedr
         return residual
     
     def get_rms(self, residual):
@@ -19,354 +19,161 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
 
 New features made by ronglian zhou <961836102@qq.com> on <2024/10/17>:
 - Added support to read IASI PCC products
+- The fields of the MDRs are decoded lazily, on first access.
 """
 
-import io, cProfile, pstats
+from functools import lru_cache
 import numpy as np
-from numpy import fromstring
 
-from ...generic.record_content import interpreted_content
+from ...generic.record_content import lazy_content
 from ...generic.grh import GRH
 from ...generic.parameters import *
-from ...generic.read import (
-    generic_read,
-    read_short_date,
-    b,
-    i1,
-    i2,
-    i4,
-    u1,
-    u2,
-    u4,
-    vi4,
-)
+from ...generic.read import RecordLayout, b, i1, i2, i4, u1, u2, u4, vi4, sd
 
 from .record import Record
 from .giadr import GIADR
-from ...l1c.utilities import read_bitfield
-
-debug = False
-
-_grh_offset = 20
-
-
-class MDR_PCR(interpreted_content):
-    def __init__(self) -> None:
-        self.DEGRADED_INST_MDR = None
-        self.DEGRADED_PROC_MDR = None
-        self.PccResidual = None
+from ...l1c.utilities import read_bitfield, read_avhrr_quality, avhrr_quality_list
+
+PCR_FIELDS = [
+    ('DEGRADED_INST_MDR', (1,), b, None),
+    ('DEGRADED_PROC_MDR', (1,), b, None),
+    ('PccResidual', (SNOT, PN, S), i1, None),
+]
+PCR_LAYOUT = RecordLayout(PCR_FIELDS)
+
+
+def pcs_fields(
+    NBS1P1: int,
+    NBS1P2: int,
+    NBS1P3: int,
+    NBS2P1: int,
+    NBS2P2: int,
+    NBS2P3: int,
+    NBS3P1: int,
+    NBS3P2: int,
+    NBS3P3: int,
+) -> list[tuple]:
+    """
+    The layout of a PCS MDR (without GRH) as a list of (name, shape, dtype,
+    scale) tuples, given the number of scores of every part of every band
+    (from the GIADR).
+
+    Bitfields are listed as raw bytes (`u1`) and are interpreted afterwards
+    by `read_bitfield`.
+    """
+    return [
+        ('DEGRADED_INST_MDR', (1,), b, None),
+        ('DEGRADED_PROC_MDR', (1,), b, None),
+        ('GEPSIasiMode', (4,), u1, None),
+        ('GEPSOPSProcessingMode', (4,), u1, None),
+        ('GEPSIdConf', (32,), u1, None),
+        ('OBT', (SNOT, 6), u1, None),
+        ('ONBoardUTC', (SNOT,), sd, None),
+        ('GEPSDatIasi', (SNOT,), sd, None),
+        ('GEPS_SP', (SNOT,), i4, None),
+        ('GQisFlagQual', (SNOT, PN, SB), b, None),
+        ('GQisFlagQualDetailed', (SNOT, PN), i2, None),
+        ('GQisQualIndex', (1,), vi4, None),
+        ('GQisQualIndexLoc', (1,), vi4, None),
+        ('GQisQualIndexRad', (1,), vi4, None),
+        ('GQisQualIndexSpect', (1,), vi4, None),
+        ('GQisSysTecSondQual', (1,), u4, None),
+        ('GGeoSondLoc', (SNOT, PN, 2), i4, 6),
+        ('GGeoSondAnglesMETOP', (SNOT, PN, 2), i4, 6),
+        ('GGeoSondAnglesSUN', (SNOT, PN, 2), i4, 6),
+        ('EARTH_SATELLITE_DISTANCE', (1,), u4, None),
+        ('IDefCcsChannelId', (NBK,), i4, None),
+        ('GCcsRadAnalNbClass', (SNOT, PN), i4, None),
+        ('GCcsRadAnalWgt', (SNOT, PN, NCL), vi4, None),
+        ('GCcsRadAnalY', (SNOT, PN, NCL), i4, 6),
+        ('GCcsRadAnalZ', (SNOT, PN, NCL), i4, 6),
+        ('GCcsRadAnalMean', (SNOT, PN, NCL, NBK), vi4, -3),  # W/* -> mW/*
+        ('GCcsRadAnalStd', (SNOT, PN, NCL, NBK), vi4, -3),  # W/* -> mW/*
+        ('GEUMAvhrr1BCldFrac', (SNOT, PN), u1, None),
+        ('GEUMAvhrr1BLandFrac', (SNOT, PN), u1, None),
+        ('GEUMAvhrr1BQual', (SNOT, PN), u1, None),
+        ('PcScoresB1P1', (SNOT, PN, NBS1P1), i4, None),
+        ('PcScoresB1P2', (SNOT, PN, NBS1P2), i2, None),
+        ('PcScoresB1P3', (SNOT, PN, NBS1P3), i1, None),
+        ('PcScoresB2P1', (SNOT, PN, NBS2P1), i4, None),
+        ('PcScoresB2P2', (SNOT, PN, NBS2P2), i2, None),
+        ('PcScoresB2P3', (SNOT, PN, NBS2P3), i1, None),
+        ('PcScoresB3P1', (SNOT, PN, NBS3P1), i4, None),
+        ('PcScoresB3P2', (SNOT, PN, NBS3P2), i2, None),
+        ('PcScoresB3P3', (SNOT, PN, NBS3P3), i1, None),
+        ('ResidualRMS', (SNOT, PN, SB), u2, 3),
+    ]
+
+
+@lru_cache(maxsize=None)
+def pcs_layout(*nbs: int) -> RecordLayout:
+    """
+    The layout of a PCS MDR, shared by all the MDRs with the same number of
+    scores (see `pcs_fields`)
+    """
+    return RecordLayout(pcs_fields(*nbs))
+
+
+PCS_BITFIELDS = ('GEPSIasiMode', 'GEPSOPSProcessingMode', 'GEPSIdConf')
+
+
+class MDR_PCR(lazy_content):
+    """
+    The MDR of a PCR (residuals) file, decoded lazily (see `lazy_content`)
+    """
+
+    fields = tuple(name for name, *_ in PCR_FIELDS)
 
     @staticmethod
     def read(record: Record, giadr: GIADR):
-        raw_data: bytes = record.content
         grh: GRH = record.grh
+        assert grh.record_size == PCR_LAYOUT.itemsize + GRH.size
 
-        mdr = MDR_PCR()
-
-        offset = 0
-
-        shape = (1,)
-        dtype = b
-        scale = None
-        mdr.DEGRADED_INST_MDR, offset = generic_read(raw_data, offset, shape, dtype, scale)
-        # assert offset+_grh_offset == 21
-
-        shape = (1,)
-        dtype = b
-        scale = None
-        mdr.DEGRADED_PROC_MDR, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, S)
-        dtype = i1
-        scale = None
-        mdr.PccResidual, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        assert grh.record_size == offset + GRH.size
-
-        return mdr
-
-
-class MDR_PCS(interpreted_content):
-    def __init__(self) -> None:
-        self.DEGRADED_INST_MDR = None
-        self.DEGRADED_PROC_MDR = None
-        self.GEPSIasiMode = None
-        self.GEPSOPSProcessingMode = None
-        self.GEPSIdConf = None
-        self.OBT = None
-        self.ONBoardUTC = None
-        self.GEPSDatIasi = None
-        self.GEPS_SP = None
-        self.GQisFlagQual = None
-        self.GQisFlagQualDetailed = None
-        self.GQisQualIndex = None
-        self.GQisQualIndexLoc = None
-        self.GQisQualIndexRad = None
-        self.GQisQualIndexSpect = None
-        self.GQisSysTecSondQual = None
-        self.GGeoSondLoc = None
-        self.GGeoSondAnglesMETOP = None
-        self.GGeoSondAnglesSUN = None
-        self.EARTH_SATELLITE_DISTANCE = None
-        self.IDefCcsChannelId = None
-        self.GCcsRadAnalNbClass = None
-        self.GCcsRadAnalWgt = None
-        self.GCcsRadAnalY = None
-        self.GCcsRadAnalZ = None
-        self.GCcsRadAnalMean = None
-        self.GCcsRadAnalStd = None
-        self.GEUMAvhrr1BCldFrac = None
-        self.GEUMAvhrr1BLandFrac = None
-        self.GEUMAvhrr1BQual = None
-        self.PcScoresB1P1 = None
-        self.PcScoresB1P2 = None
-        self.PcScoresB1P3 = None
-        self.PcScoresB2P1 = None
-        self.PcScoresB2P2 = None
-        self.PcScoresB2P3 = None
-        self.PcScoresB3P1 = None
-        self.PcScoresB3P2 = None
-        self.PcScoresB3P3 = None
-        self.ResidualRMS = None
+        return MDR_PCR(record.content.raw, PCR_LAYOUT)
+
+
+class MDR_PCS(lazy_content):
+    """
+    The MDR of a PCS (scores) file, decoded lazily (see `lazy_content`)
+    """
+
+    fields = tuple(name for name, *_ in pcs_fields(*(0,) * 9))
+    custom_fields = PCS_BITFIELDS + ('GEUMAvhrr1BQual',)
 
     @staticmethod
     def read(record: Record, giadr: GIADR):
-        if debug:
-            profile = cProfile.Profile()
-            profile.enable()
-
-        raw_data: bytes = record.content
         grh: GRH = record.grh
 
-        mdr = MDR_PCS()
-
-        NBS1P1 = giadr.NBS1P1
-        NBS1P2 = giadr.NBS1P2
-        NBS1P3 = giadr.NBS1P3
-        NBS2P1 = giadr.NBS2P1
-        NBS2P2 = giadr.NBS2P2
-        NBS2P3 = giadr.NBS2P3
-        NBS3P1 = giadr.NBS3P1
-        NBS3P2 = giadr.NBS3P2
-        NBS3P3 = giadr.NBS3P3
-
-        offset = 0
-
-        shape = (1,)
-        dtype = b
-        scale = None
-        mdr.DEGRADED_INST_MDR, offset = generic_read(raw_data, offset, shape, dtype, scale)
-        # assert offset + _grh_offset == 21
-
-        shape = (1,)
-        dtype = b
-        scale = None
-        mdr.DEGRADED_PROC_MDR, offset = generic_read(raw_data, offset, shape, dtype, scale)
-        # assert offset + _grh_offset == 22
-
-        shape = (1,)
-        increase = np.prod(shape) * 4
-        mdr.GEPSIasiMode = read_bitfield(raw_data[offset : offset + increase], 'GEPSIasiMode')
-        offset += increase
-        # assert offset + _grh_offset == 26
-
-        shape = (1,)
-        increase = np.prod(shape) * 4
-        mdr.GEPSOPSProcessingMode = read_bitfield(raw_data[offset : offset + increase], 'GEPSOPSProcessingMode')
-        offset += increase
-        # assert offset + _grh_offset == 30
-
-        shape = (1,)
-        increase = np.prod(shape) * 32
-        mdr.GEPSIdConf = read_bitfield(raw_data[offset : offset + increase], 'GEPSIdConf')
-        offset += increase
-        # assert offset + _grh_offset == 62
-
-        increase = 6 * SNOT
-        mdr.OBT = fromstring(raw_data[offset : offset + increase], dtype=u1).reshape(SNOT, 6)
-        offset += increase
-        # assert offset + _grh_offset == 242
-
-        increase = SNOT * 6
-        mdr.ONBoardUTC = read_short_date(raw_data[offset : offset + increase])
-        offset += increase
-        # assert offset + _grh_offset == 422
-
-        increase = SNOT * 6
-        mdr.GEPSDatIasi = read_short_date(raw_data[offset : offset + increase])
-        offset += increase
-        # assert offset + _grh_offset == 602
-
-        shape = (SNOT,)
-        dtype = i4
-        scale = None
-        mdr.GEPS_SP, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, SB)
-        dtype = b
-        scale = None
-        mdr.GQisFlagQual, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN)
-        dtype = i2
-        scale = None
-        mdr.GQisFlagQualDetailed, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = vi4
-        scale = None
-        mdr.GQisQualIndex, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = vi4
-        scale = None
-        mdr.GQisQualIndexLoc, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = vi4
-        scale = None
-        mdr.GQisQualIndexRad, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = vi4
-        scale = None
-        mdr.GQisQualIndexSpect, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = u4
-        scale = None
-        mdr.GQisSysTecSondQual, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, 2)
-        dtype = i4
-        scale = 6
-        mdr.GGeoSondLoc, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, 2)
-        dtype = i4
-        scale = 6
-        mdr.GGeoSondAnglesMETOP, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, 2)
-        dtype = i4
-        scale = 6
-        mdr.GGeoSondAnglesSUN, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (1,)
-        dtype = u4
-        scale = None
-        mdr.EARTH_SATELLITE_DISTANCE, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (NBK,)
-        dtype = i4
-        scale = None
-        mdr.IDefCcsChannelId, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN)
-        dtype = i4
-        scale = None
-        mdr.GCcsRadAnalNbClass, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NCL)
-        dtype = vi4
-        scale = None
-        mdr.GCcsRadAnalWgt, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NCL)
-        dtype = i4
-        scale = 6
-        mdr.GCcsRadAnalY, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NCL)
-        dtype = i4
-        scale = 6
-        mdr.GCcsRadAnalZ, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NCL, NBK)
-        dtype = vi4
-        scale = -3  # W/* -> mW/
-        mdr.GCcsRadAnalMean, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NCL, NBK)
-        dtype = vi4
-        scale = -3  #  W/* -> mW/*
-        mdr.GCcsRadAnalStd, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN)
-        dtype = u1
-        scale = None
-        mdr.GEUMAvhrr1BCldFrac, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN)
-        dtype = u1
-        scale = None
-        mdr.GEUMAvhrr1BLandFrac, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        GEUMAvhrr1BQual = []
-        shape = (SNOT, PN)
-        increase = np.prod(shape)
-        for i in range(increase):
-            GEUMAvhrr1BQual.append(read_bitfield(raw_data[offset : offset + 1], 'GEUMAvhrr1BQual'))
-            offset += 1
-        mdr.GEUMAvhrr1BQual = GEUMAvhrr1BQual
-
-        shape = (SNOT, PN, NBS1P1)
-        dtype = i4
-        scale = None
-        mdr.PcScoresB1P1, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NBS1P2)
-        dtype = i2
-        scale = None
-        mdr.PcScoresB1P2, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NBS1P3)
-        dtype = i1
-        scale = None
-        mdr.PcScoresB1P3, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NBS2P1)
-        dtype = i4
-        scale = None
-        mdr.PcScoresB2P1, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NBS2P2)
-        dtype = i2
-        scale = None
-        mdr.PcScoresB2P2, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NBS2P3)
-        dtype = i1
-        scale = None
-        mdr.PcScoresB2P3, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NBS3P1)
-        dtype = i4
-        scale = None
-        mdr.PcScoresB3P1, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NBS3P2)
-        dtype = i2
-        scale = None
-        mdr.PcScoresB3P2, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, NBS3P3)
-        dtype = i1
-        scale = None
-        mdr.PcScoresB3P3, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        shape = (SNOT, PN, SB)
-        dtype = u2
-        scale = 3
-        mdr.ResidualRMS, offset = generic_read(raw_data, offset, shape, dtype, scale)
-
-        assert grh.record_size == offset + GRH.size
-
-        if debug:
-            profile.disable()
-            s = io.StringIO()
-            ps = pstats.Stats(profile, stream=s).sort_stats('cumulative')
-            ps.print_stats()
-            print(s.getvalue())
-
-        return mdr
+        layout = pcs_layout(
+            int(giadr.NBS1P1),
+            int(giadr.NBS1P2),
+            int(giadr.NBS1P3),
+            int(giadr.NBS2P1),
+            int(giadr.NBS2P2),
+            int(giadr.NBS2P3),
+            int(giadr.NBS3P1),
+            int(giadr.NBS3P2),
+            int(giadr.NBS3P3),
+        )
+        assert grh.record_size == layout.itemsize + GRH.size
+
+        return MDR_PCS(record.content.raw, layout)
+
+    def decode(self, name: str):
+        if name in PCS_BITFIELDS:
+            return read_bitfield(self._view[name].tobytes(), name)
+
+        if name == 'GEUMAvhrr1BQual':
+            return avhrr_quality_list(self._view[name])
+
+        return super().decode(name)
+
+    @classmethod
+    def avhrr_quality(cls, mdrs: list['MDR_PCS']) -> tuple[np.ndarray, np.ndarray]:
+        """
+        GEUMAvhrr1BQual of many MDRs decoded at once, see `read_avhrr_quality`
+
+        Returns:
+            The flag and value arrays, of shape (n_mdr, SNOT, PN)
+        """
+        return read_avhrr_quality(cls.gather(mdrs, 'GEUMAvhrr1BQual'))
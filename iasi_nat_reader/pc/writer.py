@@ -0,0 +1,359 @@
+"""
+iasi_nat_reader: An enhanced library to read IASI L1C, L2, and PCC files
+Copyright (C) 2024 Ronglian Zhou
+
+This library is free software; you can redistribute it and/or
+modify it under the terms of the GNU Lesser General Public
+License as published by the Free Software Foundation; either
+version 3.0 of the License, or (at your option) any later version.
+
+This library is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+Lesser General Public License for more details.
+
+You should have received a copy of the GNU Lesser General Public
+License along with this library; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+
+Write PCS and PCR files in the EPS native format, which can be read back
+with the PC NativeFile
+"""
+
+import os
+import numpy as np
+
+from ..generic.grh import GRH, grh_dtype
+from ..generic.mphr import MPHR
+from ..generic.read import RecordLayout, numpy_dtype, short_date, sd
+from .records.giadr import GIADR
+from .records.mdr import PCR_LAYOUT, pcs_layout
+
+# (record class, instrument group, record subclass, record subclass version)
+MPHR_GRH = (1, 0, 0, 2)
+GIADR_GRH = (5, 8, 4, 1)
+MDR_GRH = {'PCS': (8, 8, 1, 1), 'PCR': (8, 8, 2, 1)}
+
+NBS_NAMES = [[f'NBS{band}P{part}' for part in (1, 2, 3)] for band in (1, 2, 3)]
+
+
+def pack_grh(
+    grh: tuple,
+    record_size: int | np.ndarray,
+    start: np.ndarray | None = None,
+    stop: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    The GRH of one or many records as an array of grh_dtype
+
+    Args:
+        - *grh*: the record class, instrument group, subclass and version
+        - *record_size*: the size of the records, GRH included
+        - *start*, *stop*: the start and stop times of the records, as
+          short_date arrays (zero if None)
+    """
+    n = 1 if start is None else len(start)
+    data = np.zeros(n, dtype=grh_dtype)
+    for name, value in zip(grh_dtype.names[:4], grh):
+        data[name] = value
+    data['record_size'] = record_size
+    if start is not None:
+        data['record_start_time_day'] = start['day']
+        data['record_start_time_msec'] = start['msec']
+    if stop is not None:
+        data['record_stop_time_day'] = stop['day']
+        data['record_stop_time_msec'] = stop['msec']
+    return data
+
+
+def update_mphr(raw: bytes, values: dict[str, object]) -> bytes:
+    """
+    Replace the values of some keywords of a MPHR (without GRH). Every new
+    value keeps the width of the old one, so the size of the MPHR does not
+    change: numbers are padded as the old value was (with zeros or spaces)
+    and texts are padded with spaces.
+    """
+    lines = raw.decode('ascii').split('\n')
+    for i, line in enumerate(lines):
+        key, sep, old = line.partition('= ')
+        key = key.strip()
+        if not sep or key not in values:
+            continue
+        new = str(values[key])
+        if old.strip().lstrip('+-').isdigit():
+            fill = '0' if len(old) > 1 and old.startswith('0') else ' '
+            new = new.rjust(len(old), fill)
+        else:
+            new = new.ljust(len(old))
+        if len(new) != len(old):
+            raise ValueError(f'{key} = {new} does not fit in {len(old)} characters')
+        lines[i] = line[: len(line) - len(old)] + new
+    return '\n'.join(lines).encode('ascii')
+
+
+def pack_giadr(giadr: GIADR) -> bytes:
+    """
+    The content of a PC GIADR (without GRH), as read by `GIADR.read`
+    """
+    values = [int(getattr(giadr, name)) for band_names in NBS_NAMES for name in band_names]
+    values += list(np.atleast_1d(giadr.FirstChannel) + 1)  # back to the 1-based convention
+    values += list(np.atleast_1d(giadr.NbrChannels))
+    values += list(np.round(np.atleast_1d(giadr.ScoreQuantisationFactor) * 100))
+    values += list(np.round(np.atleast_1d(giadr.ResidualQuantisationFactor) * 100))
+    return np.array(values, dtype='>u2').tobytes()
+
+
+def split_scores(giadr: GIADR, scores: list[np.ndarray]) -> dict[str, np.ndarray]:
+    """
+    Split the scores of every band, of shape (n, SNOT, PN, n_scores), in the
+    three parts (stored as i4, i2 and i1) of the PcScoresBxPy fields of the
+    PCS MDRs, according to the NBSxPy numbers of the GIADR
+    """
+    fields = {}
+    for band, (band_names, band_scores) in enumerate(zip(NBS_NAMES, scores), 1):
+        start = 0
+        for part, name in enumerate(band_names, 1):
+            stop = start + int(getattr(giadr, name))
+            fields[f'PcScoresB{band}P{part}'] = band_scores[..., start:stop]
+            start = stop
+        if start != band_scores.shape[-1]:
+            raise ValueError(f'band {band} has {band_scores.shape[-1]} scores, not {start}')
+    return fields
+
+
+def encode_vint(name: str, values: np.ndarray, dtype: str) -> np.ndarray:
+    """
+    Encode numbers as variable scale integers: (sf, value) pairs with the
+    largest value that fits in the integer, less its trailing zeros, so that
+    value / 10**sf keeps as many digits of the number as possible
+    """
+    target = numpy_dtype(dtype)
+    highest = np.iinfo(target['value']).max
+    if np.any(~np.isfinite(values)):
+        raise ValueError(f'{name} cannot hold NaN or infinite values')
+    magnitude = np.abs(values.astype(np.float64))
+    with np.errstate(divide='ignore'):
+        sf = np.floor(np.log10(highest / np.where(magnitude > 0, magnitude, 1)))
+    sf = np.clip(sf, np.iinfo(target['sf']).min, np.iinfo(target['sf']).max)
+    value = np.round(values * 10.0**sf)
+    # rounded up past the largest integer
+    sf = np.where(np.abs(value) > highest, sf - 1, sf)
+    value = np.round(values * 10.0**sf)
+    # e.g. 0.5 is (1, 5), not (9, 500000000)
+    for _ in range(int(sf.max(initial=0))):
+        trailing = (value % 10 == 0) & (sf > 0)
+        if not trailing.any():
+            break
+        value = np.where(trailing, value // 10, value)
+        sf = np.where(trailing, sf - 1, sf)
+    if np.any(np.abs(value) > highest):
+        raise ValueError(f'{name} has values out of the range of {dtype}')
+    encoded = np.empty(values.shape, dtype=target)
+    encoded['sf'], encoded['value'] = sf, value
+    return encoded
+
+
+def encode_field(name: str, values: np.ndarray, layout: RecordLayout) -> np.ndarray:
+    """
+    Encode the values of a field. Integer (and structured) arrays are taken
+    as already encoded, e.g. the raw values gathered from other MDRs (see
+    `lazy_content.gather`), but they cannot hold the fill value of the field,
+    which would be read as NaN. Floating point arrays are multiplied by the
+    scale factor of the field and rounded, and their NaN are replaced by the
+    fill value of the field; the ones of the variable scale integers are
+    split in (sf, value) pairs (see `encode_vint`). Dates may also be given
+    as (day, msec) pairs.
+    """
+    values = np.asarray(values)
+    shape, dtype, scale = layout.fields[name]
+    if dtype == sd and values.dtype.names is None:
+        dates = np.empty(values.shape[:-1], dtype=short_date)
+        dates['day'], dates['msec'] = values[..., 0], values[..., 1]
+        return dates
+
+    target = numpy_dtype(dtype)
+    if 'v' in dtype and values.dtype.kind in 'iuf':
+        if scale is not None:
+            values = values * 10.0**scale
+        return encode_vint(name, values, dtype)
+    if target.kind not in 'iu' or values.dtype.kind not in 'iuf':
+        return values
+
+    info = np.iinfo(target)
+    lowest, highest = info.min, info.max
+    # the fill value (the lowest signed, the highest unsigned) is read as NaN
+    fill = info.min if target.kind == 'i' else info.max
+    valid = values
+    if values.dtype.kind == 'f':
+        if scale is not None:
+            values = values * 10.0**scale
+        values = np.round(values)
+        nan = np.isnan(values)
+        valid = values[~nan]
+        if target.itemsize > 1:
+            lowest, highest = (lowest + 1, highest) if target.kind == 'i' else (lowest, highest - 1)
+            values = np.where(nan, fill, values)
+        elif np.any(nan):
+            raise ValueError(f'{name} cannot hold NaN')
+    elif target.itemsize > 1:
+        if np.any(values == fill):
+            raise ValueError(
+                f'{name} holds its fill value {fill}, give the missing values as NaN'
+            )
+    if valid.size and (valid.min() < lowest or valid.max() > highest):
+        raise ValueError(f'{name} has values out of the range of {dtype}')
+    return values
+
+
+class NativeWriter:
+    """
+    Write a PCS or a PCR file (depending on its name, as `NativeFile`): a
+    MPHR, the GIADR and the MDRs, which are appended batch by batch with
+    `write_mdrs`. The totals of the MPHR are updated when the file is closed.
+    The file is removed if it cannot be completed (see `close` and `discard`).
+
+    Args:
+        - *filename*: the path of the file to write
+        - *mphr*: the MPHR to copy (e.g. the one of the compressed file), or
+          its raw content
+        - *giadr*: the GIADR of the PC product, which sets the number of
+          scores of every part
+        - *mphr_values*: other keywords of the MPHR to change (e.g.
+          PRODUCT_NAME), see `update_mphr`
+
+    Example:
+        >>> with NativeWriter('IASI_PCS_01_M01_xxx.nat', mphr, giadr) as writer:
+        ...     writer.write_mdrs({**split_scores(giadr, scores), 'ResidualRMS': rms},
+        ...                       times=gepsdatiasi)
+    """
+
+    def __init__(
+        self,
+        filename: os.PathLike,
+        mphr: MPHR | bytes,
+        giadr: GIADR,
+        mphr_values: dict[str, object] | None = None,
+    ) -> None:
+        filename = os.fspath(filename)
+        if 'PCS' in os.path.basename(filename):
+            self.mdr_flag = 'PCS'
+            self.layout = pcs_layout(
+                *(int(getattr(giadr, name)) for band_names in NBS_NAMES for name in band_names)
+            )
+        elif 'PCR' in os.path.basename(filename):
+            self.mdr_flag = 'PCR'
+            self.layout = PCR_LAYOUT
+        else:
+            raise ValueError(f'{filename} is not the name of a PCS or a PCR file')
+
+        self.__mphr = mphr.raw if isinstance(mphr, MPHR) else bytes(mphr)
+        self.__mphr_values = dict(mphr_values or {})
+        self.filename = filename
+        self.__file = open(filename, 'wb')
+        self.n_mdrs = 0
+
+        # the MPHR is written again with the totals when closing
+        self.__write_record(MPHR_GRH, self.__mphr)
+        self.__write_record(GIADR_GRH, pack_giadr(giadr))
+        self.__record_dtype = np.dtype([('grh', grh_dtype), ('mdr', self.layout.dtype)])
+
+    def __enter__(self) -> 'NativeWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def __write_record(self, grh: tuple, content: bytes) -> None:
+        self.__file.write(pack_grh(grh, len(content) + GRH.size).tobytes())
+        self.__file.write(content)
+
+    def write_mdrs(
+        self, fields: dict[str, np.ndarray], times: np.ndarray | None = None
+    ) -> None:
+        """
+        Append MDRs to the file. They are packed in one preallocated buffer,
+        GRH included, and written at once.
+
+        Args:
+            - *fields*: the values of the fields of the MDRs, as arrays of
+              n MDRs (e.g. the scores of shape (n * SNOT * PN, n_scores)),
+              see `encode_field`. The fields which are not given are zero.
+            - *times*: the GEPSDatIasi of the MDRs (their raw short_date
+              values, of shape (n, SNOT)), from which the start and stop times
+              of their GRH are taken. If None, the GEPSDatIasi field is used.
+        """
+        if not fields:
+            raise ValueError('no field given, the number of MDRs is unknown')
+        unknown = set(fields) - set(self.layout.fields)
+        if unknown:
+            raise ValueError(f'{sorted(unknown)} are not fields of the {self.mdr_flag} MDRs')
+        fields = {name: encode_field(name, values, self.layout) for name, values in fields.items()}
+        name, values = next(iter(fields.items()))
+        n = values.size // int(np.prod(self.layout.dtype[name].shape))
+
+        if times is None and 'GEPSDatIasi' in fields:
+            times = fields['GEPSDatIasi']
+        if times is not None:
+            times = encode_field('GEPSDatIasi', times, pcs_layout(*(0,) * 9)).reshape(n, -1)
+
+        records = np.zeros(n, dtype=self.__record_dtype)
+        records['grh'] = pack_grh(
+            MDR_GRH[self.mdr_flag],
+            self.__record_dtype.itemsize,
+            None if times is None else times[:, 0],
+            None if times is None else times[:, -1],
+        )
+        mdr = records['mdr']
+        for name, values in fields.items():
+            mdr[name] = values.reshape(mdr[name].shape)
+
+        self.__file.write(records.tobytes())
+        self.n_mdrs += n
+
+    def close(self) -> None:
+        """
+        Write the MPHR again with the totals of the file, and close it. If
+        the MPHR cannot be updated (e.g. a total does not fit in the width
+        of its keyword), the file is removed and the error is raised.
+        """
+        if self.__file.closed:
+            return
+        done = False
+        try:
+            self.__finalize()
+            done = True
+        finally:
+            self.__file.close()
+            if not done:
+                os.remove(self.filename)
+
+    def discard(self) -> None:
+        """
+        Close and remove the file, e.g. when writing the MDRs failed
+        """
+        if not self.__file.closed:
+            self.__file.close()
+            os.remove(self.filename)
+
+    def __finalize(self) -> None:
+        size = self.__file.tell()
+        values = {
+            'TOTAL_RECORDS': self.n_mdrs + 2,
+            'TOTAL_MPHR': 1,
+            'TOTAL_SPHR': 0,
+            'TOTAL_IPR': 0,
+            'TOTAL_GEADR': 0,
+            'TOTAL_GIADR': 1,
+            'TOTAL_VEADR': 0,
+            'TOTAL_VIADR': 0,
+            'TOTAL_MDR': self.n_mdrs,
+            'ACTUAL_PRODUCT_SIZE': size,
+            **self.__mphr_values,
+        }
+        mphr = update_mphr(self.__mphr, values)
+        self.__file.seek(0)
+        self.__write_record(MPHR_GRH, mphr)
@@ -15,6 +15,9 @@ setup(
         "numpy>=1.26.4",
         "h5py>=3.11.0",
     ],
+    extras_require={
+        "parquet": ["pyarrow"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: GNU Lesser General Public License v3 (LGPLv3)",
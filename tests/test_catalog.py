@@ -0,0 +1,52 @@
+import numpy as np
+
+from iasi_nat_reader.catalog import Catalog, file_dtype, mdr_dtype
+
+
+def make_catalog() -> Catalog:
+    """
+    A catalog of two files without reading any: the first one has a MDR
+    around Europe and a MDR across the antimeridian, the second one a MDR
+    over the Atlantic
+    """
+    boxes = [
+        (0, 0, '2024-01-01T00:00:00', (-10.0, 35.0, 5.0, 45.0)),
+        (0, 1, '2024-01-01T00:00:08', (170.0, -10.0, -170.0, 10.0)),
+        (1, 0, '2024-01-02T00:00:00', (-40.0, 10.0, -20.0, 30.0)),
+    ]
+    mdrs = np.zeros(len(boxes), dtype=mdr_dtype)
+    for entry, (file, mdr, start, box) in zip(mdrs, boxes):
+        entry['file'], entry['mdr'] = file, mdr
+        entry['start'] = np.datetime64(start, 'ms')
+        entry['stop'] = entry['start'] + np.timedelta64(8000, 'ms')
+        entry['lon_min'], entry['lat_min'], entry['lon_max'], entry['lat_max'] = box
+    return Catalog(['a.nat', 'b.nat'], np.zeros(2, dtype=file_dtype), mdrs)
+
+
+def found(result: dict) -> dict:
+    return {filename: mdrs.tolist() for filename, mdrs in result.items()}
+
+
+def test_full_longitude_span():
+    catalog = make_catalog()
+    everything = {'a.nat': [0, 1], 'b.nat': [0]}
+    assert found(catalog.query(bbox=(-180, -90, 180, 90))) == everything
+    assert found(catalog.query(bbox=(0, -90, 360, 90))) == everything
+    assert found(catalog.query(bbox=(-190, -90, 190, 90))) == everything
+
+
+def test_box_across_antimeridian():
+    catalog = make_catalog()
+    assert found(catalog.query(bbox=(175, -5, -175, 5))) == {'a.nat': [1]}
+    assert found(catalog.query(bbox=(179, -5, 181, 5))) == {'a.nat': [1]}
+    assert found(catalog.query(bbox=(160, -5, 165, 5))) == {}
+
+
+def test_ordinary_box_and_time_window():
+    catalog = make_catalog()
+    assert found(catalog.query(bbox=(0, 40, 10, 50))) == {'a.nat': [0]}
+    assert found(catalog.query(bbox=(-50, -90, 0, 90))) == {'a.nat': [0], 'b.nat': [0]}
+    assert found(catalog.query(bbox=(-50, -90, 0, 90), start='2024-01-02')) == {'b.nat': [0]}
+    assert found(catalog.query(start='2024-01-01T00:00:09', stop='2024-01-01T00:00:10')) == {
+        'a.nat': [1]
+    }